@@ -1,10 +1,23 @@
-import requests
+import asyncio
+import json
+import logging
 import os
 import time
+from collections import Counter
+from urllib.parse import urlsplit
+
 from dotenv import load_dotenv
 
+from app.captcha.providers import CaptchaProvider, create_captcha_provider
+from app.helpers.rate_limiter import domain_of
+from app.helpers.snapshot_store import atomic_write
+
 load_dotenv()
-api_key_2captcha = os.getenv('API_KEY_2CAPTCHA')
+
+CAPTCHA_MAX_CONCURRENT_SOLVES = int(os.getenv('CAPTCHA_MAX_CONCURRENT_SOLVES', 8))
+CAPTCHA_SESSION_TTL = float(os.getenv('CAPTCHA_SESSION_TTL', 1800))
+CAPTCHA_SESSION_DIR = os.getenv('CAPTCHA_SESSION_DIR', "app/cache/captcha_sessions")
+
 
 async def get_site_key(page):
     # Busca el elemento que contiene el site_key
@@ -15,38 +28,154 @@ async def get_site_key(page):
     return site_key
 
 
+async def captcha_present(page) -> bool:
+    return await page.evaluate("() => !!document.querySelector('.g-recaptcha')")
+
+
+class CaptchaSessionStore:
+    """
+    Cookies de la sesión obtenida al resolver un CAPTCHA, por dominio.
+
+    Se guardan en un archivo por dominio para que los demás workers las
+    reutilicen hasta que vencen (`ttl`).
+    """
+
+    def __init__(self, directory: str = CAPTCHA_SESSION_DIR, ttl: float = CAPTCHA_SESSION_TTL):
+        self.directory = directory
+        self.ttl = ttl
+
+    def path(self, domain: str) -> str:
+        return os.path.join(self.directory, f"{domain}.json")
+
+    def load(self, domain: str):
+        """Devuelve las cookies vigentes del dominio, o None."""
+        try:
+            with open(self.path(domain), "r") as file:
+                session = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if session["expires_at"] <= time.time():
+            return None
+        return session["cookies"]
+
+    def save(self, domain: str, cookies: list):
+        os.makedirs(self.directory, exist_ok=True)
+        session = {"domain": domain, "cookies": cookies, "expires_at": time.time() + self.ttl}
+        atomic_write(self.path(domain), json.dumps(session).encode())
+
+    def invalidate(self, domain: str):
+        if os.path.exists(self.path(domain)):
+            os.remove(self.path(domain))
+
+
+def cookie_matches(cookie: dict, host: str) -> bool:
+    domain = cookie.get("domain", "").lstrip(".")
+    return host == domain or host.endswith("." + domain)
+
+
+class CaptchaSolver:
+    """
+    Resolución asíncrona de reCAPTCHA.
+
+    Hasta `max_concurrent_solves` CAPTCHAs se resuelven a la vez con el
+    proveedor configurado, sin bloquear el event loop. Por dominio solo hay una
+    resolución en curso: las demás páginas del mismo dominio esperan y
+    reutilizan las cookies de la sesión resuelta, que también se aplican a los
+    contextos y descargas HTTP siguientes.
+    """
+
+    def __init__(self, provider: CaptchaProvider = None, max_concurrent_solves: int = CAPTCHA_MAX_CONCURRENT_SOLVES,
+                 session_store: CaptchaSessionStore = None):
+        self.provider = provider or create_captcha_provider()
+        self.max_concurrent_solves = max_concurrent_solves
+        self.sessions = session_store or CaptchaSessionStore()
+        self.stats = Counter()
+        self._semaphore = None
+        # dominio -> futuro que se completa cuando termina la resolución en curso
+        self._solving = {}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent_solves)
+        return self._semaphore
+
+    async def apply_session(self, context, url: str) -> bool:
+        """Agrega al contexto las cookies de una sesión resuelta del dominio. Devuelve si había sesión."""
+        cookies = self.sessions.load(domain_of(url))
+        if not cookies:
+            return False
+        await context.add_cookies(cookies)
+        return True
+
+    def cookie_header(self, url: str):
+        """Cabecera Cookie con la sesión resuelta del dominio para descargas HTTP, o None."""
+        cookies = self.sessions.load(domain_of(url)) or []
+        host = urlsplit(url).hostname or ""
+        pairs = [f"{cookie['name']}={cookie['value']}" for cookie in cookies if cookie_matches(cookie, host)]
+        return "; ".join(pairs) or None
+
+    async def solve_token(self, site_key: str, page_url: str) -> str:
+        async with self.semaphore:
+            start = time.perf_counter()
+            token = await self.provider.solve_recaptcha(site_key, page_url)
+        self.stats["solves"] += 1
+        logging.info(f"CAPTCHA de {page_url} resuelto con {self.provider.name} en {time.perf_counter() - start:.1f}s")
+        return token
+
+    async def solve(self, page):
+        """Resuelve el CAPTCHA de la página, o reutiliza la sesión si otra página del dominio ya lo resolvió."""
+        domain = domain_of(page.url)
+        # Un solo CAPTCHA en curso por dominio: si el de otra página falla, uno de los que esperaban toma el relevo
+        while (pending := self._solving.get(domain)) is not None:
+            self.stats["waited"] += 1
+            await asyncio.shield(pending)
+            if await self.apply_session(page.context, page.url):
+                await page.reload(wait_until="domcontentloaded")
+                if not await captcha_present(page):
+                    self.stats["reused_sessions"] += 1
+                    return
+
+        done = asyncio.get_running_loop().create_future()
+        self._solving[domain] = done
+        try:
+            await self._solve_page(page, domain)
+        finally:
+            if self._solving.get(domain) is done:
+                del self._solving[domain]
+            if not done.done():
+                done.set_result(None)
+
+    async def _solve_page(self, page, domain: str):
+        # Intentar obtener el site_key
+        site_key = await get_site_key(page=page)
+        if not site_key:
+            raise Exception("No se encontró el CAPTCHA")
+
+        token = await self.solve_token(site_key, page.url)
+
+        # Inyectar el token en el formulario de reCAPTCHA y enviarlo
+        await page.evaluate("(token) => { document.getElementById('g-recaptcha-response').innerHTML = token; }", token)
+        async with page.expect_navigation():
+            await page.click("input[type='submit']")
+
+        # Guardar la sesión para las siguientes páginas y descargas del dominio
+        self.sessions.save(domain, await page.context.cookies())
+
+    def metrics(self) -> dict:
+        return {"provider": self.provider.name, "solving": len(self._solving), **self.stats}
+
+
+_captcha_solver = None
+
+
+def get_captcha_solver() -> CaptchaSolver:
+    """Devuelve el solucionador de CAPTCHAs del proceso actual."""
+    global _captcha_solver
+    if _captcha_solver is None:
+        _captcha_solver = CaptchaSolver()
+    return _captcha_solver
+
+
 async def solve_captcha(page):
-    # Intentar obtener el site_key
-    site_key = await get_site_key(page=page)
-
-    if not site_key:
-        raise Exception("No se encontró el CAPTCHA")
-
-    # Resolver el CAPTCHA utilizando 2Captcha
-    captcha_solution = solve_recaptcha(site_key, page.url)
-
-    # Inyectar el token en el formulario de reCAPTCHA
-    await page.evaluate(f"document.getElementById('g-recaptcha-response').innerHTML='{captcha_solution}';")
-    await page.click("input[type='submit']")  # Simular el envío del formulario una vez resuelto
-    await page.wait_for_navigation()
-
-def solve_recaptcha(site_key, page_url):
-    # Enviar solicitud a 2Captcha para resolver el CAPTCHA
-    url = "http://2captcha.com/in.php"
-    params = {
-        'key': api_key_2captcha,
-        'method': 'userrecaptcha',
-        'googlekey': site_key,  # El site_key del CAPTCHA de Google reCAPTCHA
-        'pageurl': page_url,
-        'json': 1
-    }
-    response = requests.post(url, data=params)
-    captcha_id = response.json().get('request')
-
-    # Esperar a que el CAPTCHA sea resuelto
-    solve_url = f"http://2captcha.com/res.php?key={api_key_2captcha}&action=get&id={captcha_id}&json=1"
-    while True:
-        result = requests.get(solve_url).json()
-        if result.get('status') == 1:
-            return result.get('request')  # Esta es la solución del CAPTCHA
-        time.sleep(5)  # Esperar 5 segundos antes de volver a intentarlo
\ No newline at end of file
+    await get_captcha_solver().solve(page)
@@ -0,0 +1,105 @@
+import asyncio
+import itertools
+import os
+
+from dotenv import load_dotenv
+
+from app.helpers.http_client import get_http_client
+
+load_dotenv()
+
+api_key_2captcha = os.getenv('API_KEY_2CAPTCHA')
+CAPTCHA_PROVIDER = os.getenv('CAPTCHA_PROVIDER', '2captcha')
+CAPTCHA_API_URL = os.getenv('CAPTCHA_API_URL', "http://2captcha.com")
+CAPTCHA_POLL_INTERVAL = float(os.getenv('CAPTCHA_POLL_INTERVAL', 5))
+CAPTCHA_SOLVE_TIMEOUT = float(os.getenv('CAPTCHA_SOLVE_TIMEOUT', 180))
+
+
+class CaptchaError(Exception):
+    """El proveedor rechazó el CAPTCHA o no lo resolvió a tiempo."""
+
+
+class CaptchaProvider:
+    """Interfaz de los servicios que resuelven reCAPTCHA a partir del site_key."""
+
+    name = "base"
+
+    async def solve_recaptcha(self, site_key: str, page_url: str) -> str:
+        """Devuelve el token de respuesta (g-recaptcha-response)."""
+        raise NotImplementedError
+
+
+class TwoCaptchaProvider(CaptchaProvider):
+    """
+    Proveedor 2Captcha con envío y consulta asíncronos.
+
+    El envío (`in.php`) y las consultas (`res.php`) usan el cliente HTTP
+    compartido y `asyncio.sleep`, así que mientras se espera la solución el
+    event loop sigue atendiendo otras descargas y otros CAPTCHAs.
+    """
+
+    name = "2captcha"
+
+    def __init__(self, api_key: str = api_key_2captcha, api_url: str = CAPTCHA_API_URL,
+                 poll_interval: float = CAPTCHA_POLL_INTERVAL, timeout: float = CAPTCHA_SOLVE_TIMEOUT):
+        self.api_key = api_key
+        self.api_url = api_url.rstrip("/")
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+
+    async def submit(self, site_key: str, page_url: str) -> str:
+        response = await get_http_client().post(f"{self.api_url}/in.php", data={
+            'key': self.api_key,
+            'method': 'userrecaptcha',
+            'googlekey': site_key,  # El site_key del CAPTCHA de Google reCAPTCHA
+            'pageurl': page_url,
+            'json': 1,
+        })
+        result = response.json()
+        if result.get('status') != 1:
+            raise CaptchaError(f"2Captcha rechazó el CAPTCHA de {page_url}: {result.get('request')}")
+        return result['request']
+
+    async def poll(self, captcha_id: str) -> str:
+        params = {'key': self.api_key, 'action': 'get', 'id': captcha_id, 'json': 1}
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            result = (await get_http_client().get(f"{self.api_url}/res.php", params=params)).json()
+            if result.get('status') == 1:
+                return result['request']  # Esta es la solución del CAPTCHA
+            if result.get('request') != 'CAPCHA_NOT_READY':
+                raise CaptchaError(f"2Captcha no pudo resolver el CAPTCHA {captcha_id}: {result.get('request')}")
+
+    async def solve_recaptcha(self, site_key: str, page_url: str) -> str:
+        captcha_id = await self.submit(site_key, page_url)
+        try:
+            return await asyncio.wait_for(self.poll(captcha_id), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise CaptchaError(f"El CAPTCHA {captcha_id} no se resolvió en {self.timeout}s")
+
+
+class FakeCaptchaProvider(CaptchaProvider):
+    """Proveedor local para pruebas: devuelve un token tras `delay` segundos sin llamar a ningún servicio."""
+
+    name = "fake"
+
+    def __init__(self, delay: float = 0.0, token_prefix: str = "fake-token"):
+        self.delay = delay
+        self.token_prefix = token_prefix
+        self.solves = 0
+        self._counter = itertools.count(1)
+
+    async def solve_recaptcha(self, site_key: str, page_url: str) -> str:
+        await asyncio.sleep(self.delay)
+        self.solves += 1
+        return f"{self.token_prefix}-{next(self._counter)}"
+
+
+CAPTCHA_PROVIDERS = {
+    TwoCaptchaProvider.name: TwoCaptchaProvider,
+    FakeCaptchaProvider.name: FakeCaptchaProvider,
+}
+
+
+def create_captcha_provider(name: str = CAPTCHA_PROVIDER) -> CaptchaProvider:
+    return CAPTCHA_PROVIDERS[name]()
@@ -1,9 +1,17 @@
-import asyncio
 import os
 import logging
 from celery import Celery
+from celery.signals import worker_init, worker_process_init, worker_process_shutdown, worker_shutdown
 from dotenv import load_dotenv
+from app.helpers.async_runner import AsyncRunner
+from app.helpers.browser_pool import get_browser_pool
+from app.helpers.http_client import close_http_client
+from app.helpers.metrics import get_metrics, start_metrics_server
+from app.helpers.pdf_extraction import get_pdf_extraction_service
 from app.helpers.scrape import scrape_page_async, scrape_pdf_async
+from app.helpers.scrape_results import STATUS_ERROR, scrape_result
+from app.helpers.shard_writer import close_shard_writers
+from app.helpers.url_publisher import URL_QUEUE_MAX_PRIORITY
 
 load_dotenv()
 
@@ -12,9 +20,25 @@ rabbitmq_password = os.getenv('RABBITMQ_DEFAULT_PASS')
 rabbitmq_host = os.getenv('RABBITMQ_HOST')
 rabbitmq_port = os.getenv('RABBITMQ_PORT')
 
+# Pool "threads": cada hilo de Celery espera su corrutina y todas se ejecutan en el loop compartido del proceso
+CELERY_WORKER_POOL = os.getenv('CELERY_WORKER_POOL', 'threads')
+CELERY_WORKER_CONCURRENCY = int(os.getenv('CELERY_WORKER_CONCURRENCY', 32))
+# Corrutinas de scraping simultáneas por proceso
+WORKER_ASYNC_CONCURRENCY = int(os.getenv('WORKER_ASYNC_CONCURRENCY', CELERY_WORKER_CONCURRENCY))
+WORKER_TASK_TIMEOUT = float(os.getenv('WORKER_TASK_TIMEOUT', 900))
+# Cola de las tareas de scraping, declarada con prioridades AMQP (una cola existente no puede cambiar sus argumentos)
+CELERY_TASK_QUEUE = os.getenv('CELERY_TASK_QUEUE', 'scraping_tasks')
+# Con pocos mensajes reservados por proceso las prioridades se respetan en el orden de ejecución
+CELERY_PREFETCH_MULTIPLIER = int(os.getenv('CELERY_PREFETCH_MULTIPLIER', 1))
+
 celery = Celery(__name__)
 celery.conf.broker_url = os.environ.get("CELERY_BROKER_URL", f"amqp://{rabbitmq_user}:{rabbitmq_password}@{rabbitmq_host}")
 celery.conf.result_backend = os.environ.get("CELERY_RESULT_BACKEND", "rpc://")
+celery.conf.worker_pool = CELERY_WORKER_POOL
+celery.conf.worker_concurrency = CELERY_WORKER_CONCURRENCY
+celery.conf.task_default_queue = CELERY_TASK_QUEUE
+celery.conf.task_queue_max_priority = URL_QUEUE_MAX_PRIORITY
+celery.conf.worker_prefetch_multiplier = CELERY_PREFETCH_MULTIPLIER
 
 # Configuración de logging
 celery.conf.update(
@@ -33,10 +57,70 @@ formatter = logging.Formatter("[%(asctime)s: %(levelname)s] %(message)s")
 console_handler.setFormatter(formatter)
 logger.addHandler(console_handler)
 
-@celery.task(name="scrape_page")
-def scrape_page(url):
-    asyncio.run(scrape_page_async(url))
+# Event loop del proceso en un hilo propio: el pool de navegadores y el cliente HTTP quedan ligados a él entre tareas
+async_runner = AsyncRunner(concurrency=WORKER_ASYNC_CONCURRENCY)
+
+def get_event_loop():
+    return async_runner.start()
+
+def run_async(coro):
+    return async_runner.run(coro, timeout=WORKER_TASK_TIMEOUT)
+
+@worker_process_init.connect
+def start_browser_pool(**kwargs):
+    # Con el pool prefork se lanza el navegador una sola vez por proceso, después del fork;
+    # con el pool threads se inicia con la primera tarea
+    run_async(get_browser_pool().start())
+    # Endpoint /metrics (METRICS_PORT) en el proceso que ejecuta las tareas; solo el primero obtiene el puerto
+    start_metrics_server()
+
+@worker_init.connect
+def start_metrics(**kwargs):
+    # Con el pool threads las tareas se ejecutan en el proceso principal del worker
+    if CELERY_WORKER_POOL != "prefork":
+        start_metrics_server()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def stop_async_resources(**kwargs):
+    async_runner.stop(get_browser_pool().close, close_http_client)
+    get_pdf_extraction_service().shutdown()
+    close_shard_writers()
+    get_metrics().close()
+
+def run_scrape_task(task, url, coroutine, enqueued_at=None) -> dict:
+    """
+    Ejecuta la corrutina de scraping de la tarea y devuelve su resultado
+    compacto (con los segundos de la tarea), que el despachador recibe por el
+    backend de resultados y usa para el reporte y el planificador de re-scraping.
+
+    Con `chunks` (DISPATCH_CHUNK_SIZE > 1) Celery llama a la tarea
+    directamente, sin id propio: los errores se devuelven como resultado en
+    lugar de propagarse para que el resto del chunk se ejecute.
+    """
+    name = task.name
+    in_chunk = task.request.id is None
+    span = get_metrics().span(f"task_{name}", url=url)
+    result = None
+    try:
+        with span:
+            result = run_async(coroutine)
+            span.set(status=result["status"])
+    except Exception as e:
+        result = scrape_result(url, STATUS_ERROR, error=repr(e))
+        if not in_chunk:
+            raise
+    finally:
+        get_metrics().observe_task(name, enqueued_at, url=url)
+        if result is not None:
+            result["seconds"] = span.seconds
+    return result
+
+@celery.task(name="scrape_page", bind=True)
+def scrape_page(self, url, enqueued_at=None):
+    return run_scrape_task(self, url, scrape_page_async(url), enqueued_at=enqueued_at)
 
-@celery.task(name="scrape_pdf")
-def scrape_pdf(base_url, url, subsites):
-    asyncio.run(scrape_pdf_async(pdf_url=url, base_url=base_url, subsites=subsites))
+@celery.task(name="scrape_pdf", bind=True)
+def scrape_pdf(self, base_url, url, subsites, enqueued_at=None):
+    coroutine = scrape_pdf_async(pdf_url=url, base_url=base_url, subsites=subsites)
+    return run_scrape_task(self, url, coroutine, enqueued_at=enqueued_at)
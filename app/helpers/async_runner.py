@@ -0,0 +1,80 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+
+class AsyncRunner:
+    """
+    Event loop de larga duración en un hilo propio del proceso.
+
+    Los hilos que ejecutan tareas (p. ej. el pool `threads` de Celery) envían
+    sus corrutinas con `run` y esperan el resultado; todas comparten el mismo
+    loop, así que el pool de navegadores, el cliente HTTP y demás recursos
+    asíncronos se reutilizan entre tareas y muchas descargas avanzan a la vez.
+    Como máximo `concurrency` corrutinas se ejecutan simultáneamente.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = concurrency
+        self.loop = None
+        self.thread = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.loop is not None and self.thread.is_alive()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Inicia el loop y su hilo si no están corriendo (idempotente)."""
+        with self._lock:
+            if not self.running:
+                self.loop = asyncio.new_event_loop()
+                self._semaphore = None
+                self.thread = threading.Thread(target=self._run_forever, name="async-runner", daemon=True)
+                self.thread.start()
+            return self.loop
+
+    def _run_forever(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _limited(self, coro):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            return await coro
+
+    def run(self, coro, timeout: float = None):
+        """
+        Ejecuta la corrutina en el loop del proceso y bloquea el hilo actual hasta su resultado.
+
+        Si se supera `timeout` la corrutina se cancela y se lanza TimeoutError.
+        """
+        future = asyncio.run_coroutine_threadsafe(self._limited(coro), self.start())
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def stop(self, *cleanups, timeout: float = 30):
+        """
+        Ejecuta las funciones de limpieza asíncronas, detiene el loop y espera al hilo.
+
+        Args:
+        - *cleanups: Funciones sin argumentos que devuelven una corrutina (p. ej. `pool.close`).
+        """
+        with self._lock:
+            if not self.running:
+                return
+            for cleanup in cleanups:
+                try:
+                    asyncio.run_coroutine_threadsafe(cleanup(), self.loop).result(timeout)
+                except Exception as e:
+                    logging.warning(f"Error al liberar recursos asíncronos: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            self.loop.close()
+            self.loop = None
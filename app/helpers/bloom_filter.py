@@ -0,0 +1,264 @@
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import tempfile
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BLOOM_FILTER_DIR = os.getenv('BLOOM_FILTER_DIR', "app/cache/bloom")
+BLOOM_INITIAL_CAPACITY = int(os.getenv('BLOOM_INITIAL_CAPACITY', 1_000_000))
+BLOOM_ERROR_RATE = float(os.getenv('BLOOM_ERROR_RATE', 0.001))
+
+# magic, capacidad, tasa de error, bits, funciones hash, elementos insertados
+HEADER = struct.Struct("<8sQdQIQ")
+HEADER_SIZE = 64
+MAGIC = b"BLOOM001"
+# Dentro del espacio libre del encabezado: URLs del registro ya cargadas en el filtro (solo en la primera capa)
+WATERMARK = struct.Struct("<Q")
+WATERMARK_OFFSET = 48
+# Cada capa nueva duplica la capacidad y reduce a la mitad su tasa de error
+GROWTH_FACTOR = 2
+TIGHTENING_RATIO = 0.5
+
+
+def bloom_hashes(item: str):
+    digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+
+class BloomFilter:
+    """
+    Filtro de Bloom de capacidad fija guardado en un archivo mapeado en memoria.
+
+    Solo se cargan en RAM las páginas del archivo que se consultan, por lo que
+    un filtro de millones de URLs ocupa pocos MB por proceso.
+    """
+
+    def __init__(self, path: str, capacity: int = BLOOM_INITIAL_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        self.path = path
+        if not os.path.exists(path):
+            self._create(path, capacity, error_rate)
+
+        self._file = open(path, "r+b")
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        magic, self.capacity, self.error_rate, self.num_bits, self.num_hashes, _ = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Archivo de filtro de Bloom inválido: {path}")
+
+    @staticmethod
+    def _create(path: str, capacity: int, error_rate: float):
+        num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        # Temporal con nombre único: dos procesos que crean la misma capa no escriben el mismo archivo
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(HEADER.pack(MAGIC, capacity, error_rate, num_bits, num_hashes, 0).ljust(HEADER_SIZE, b"\0"))
+                file.truncate(HEADER_SIZE + (num_bits + 7) // 8)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    @property
+    def count(self) -> int:
+        return HEADER.unpack_from(self._mmap, 0)[5]
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._mmap)
+
+    @property
+    def watermark(self) -> int:
+        return WATERMARK.unpack_from(self._mmap, WATERMARK_OFFSET)[0]
+
+    @watermark.setter
+    def watermark(self, value: int):
+        WATERMARK.pack_into(self._mmap, WATERMARK_OFFSET, value)
+
+    def _positions(self, item: str):
+        h1, h2 = bloom_hashes(item)
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, item: str) -> bool:
+        mm = self._mmap
+        return all(mm[HEADER_SIZE + bit // 8] & (1 << (bit % 8)) for bit in self._positions(item))
+
+    def add(self, item: str) -> bool:
+        """Agrega el elemento. Devuelve False si ya estaba (o era un falso positivo)."""
+        mm = self._mmap
+        added = False
+        for bit in self._positions(item):
+            index = HEADER_SIZE + bit // 8
+            mask = 1 << (bit % 8)
+            if not mm[index] & mask:
+                mm[index] |= mask
+                added = True
+        if added:
+            struct.pack_into("<Q", mm, HEADER.size - 8, self.count + 1)
+        return added
+
+    def estimated_false_positive_rate(self) -> float:
+        """Tasa de falsos positivos esperada con el número actual de elementos."""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def flush(self):
+        self._mmap.flush()
+
+    def close(self):
+        self._mmap.close()
+        self._file.close()
+
+
+class ScalableBloomFilter:
+    """
+    Filtro de Bloom escalable persistido en un directorio (una capa por archivo).
+
+    Cuando la última capa llega a su capacidad se crea otra con el doble de
+    capacidad y la mitad de tasa de error, de modo que la tasa total queda
+    acotada por `error_rate` sin conocer de antemano el número de URLs.
+    """
+
+    def __init__(self, directory: str, initial_capacity: int = BLOOM_INITIAL_CAPACITY, error_rate: float = BLOOM_ERROR_RATE):
+        self.directory = directory
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        os.makedirs(directory, exist_ok=True)
+
+        self.layers = []
+        self._load_layers()
+        if not self.layers:
+            # Crear la primera capa bajo el bloqueo: otro proceso puede estar creándola a la vez
+            with self._locked():
+                self._load_layers()
+                if not self.layers:
+                    self._add_layer()
+
+        # Métricas de uso: consultas, positivos del filtro y positivos descartados por el registro
+        self.checks = 0
+        self.positives = 0
+        self.false_positives = 0
+
+    def reload(self):
+        """Abre las capas creadas por otros procesos desde la última lectura."""
+        self._load_layers()
+
+    def _load_layers(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith(".bloom"))
+        for name in names[len(self.layers):]:
+            self.layers.append(BloomFilter(os.path.join(self.directory, name)))
+
+    def _add_layer(self):
+        level = len(self.layers)
+        capacity = self.initial_capacity * GROWTH_FACTOR ** level
+        # La primera capa usa la mitad de la tasa objetivo para que la suma de todas las capas no la supere
+        error_rate = self.error_rate * TIGHTENING_RATIO * TIGHTENING_RATIO ** level
+        path = os.path.join(self.directory, f"layer_{level:03d}.bloom")
+        self.layers.append(BloomFilter(path, capacity=capacity, error_rate=error_rate))
+
+    @property
+    def count(self) -> int:
+        return sum(layer.count for layer in self.layers)
+
+    @property
+    def watermark(self) -> int:
+        """Cantidad de URLs del registro que el filtro ya contiene según la última sincronización."""
+        return self.layers[0].watermark
+
+    @contextmanager
+    def _locked(self):
+        # Bloqueo del archivo para que dos procesos no pisen los mismos bytes del mmap
+        with open(os.path.join(self.directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def might_contain(self, item: str) -> bool:
+        self.checks += 1
+        found = any(item in layer for layer in self.layers)
+        if found:
+            self.positives += 1
+        return found
+
+    def record_false_positive(self, count: int = 1):
+        """Registra positivos del filtro que el registro autoritativo no confirmó."""
+        self.false_positives += count
+
+    def add_many(self, items, watermark: int = None):
+        """Agrega los elementos; con `watermark` registra además hasta dónde quedó sincronizado con el registro."""
+        with self._locked():
+            self._load_layers()
+            for item in items:
+                if any(item in layer for layer in self.layers[:-1]):
+                    continue
+                if self.layers[-1].count >= self.layers[-1].capacity:
+                    self._add_layer()
+                self.layers[-1].add(item)
+            if watermark is not None:
+                self.layers[0].watermark = watermark
+
+    def advance_watermark(self, count: int):
+        """
+        Suma al watermark las URLs que se agregaron al filtro y al registro a la vez.
+
+        Con `count` negativo descuenta las URLs quitadas del registro: siguen en
+        el filtro, pero un positivo de más solo cuesta una consulta al registro.
+        """
+        with self._locked():
+            self.layers[0].watermark = max(0, self.layers[0].watermark + count)
+
+    def metrics(self) -> dict:
+        count = self.count
+        size_bytes = sum(layer.size_bytes for layer in self.layers)
+        negatives = self.checks - self.positives
+        true_positives = self.positives - self.false_positives
+        return {
+            "layers": len(self.layers),
+            "count": count,
+            "size_bytes": size_bytes,
+            "bytes_per_million_urls": size_bytes / sum(layer.capacity for layer in self.layers) * 1_000_000,
+            "estimated_false_positive_rate": 1 - math.prod(1 - layer.estimated_false_positive_rate() for layer in self.layers),
+            "observed_false_positive_rate": self.false_positives / (self.false_positives + negatives)
+            if self.false_positives + negatives else 0.0,
+            "checks": self.checks,
+            "skipped_lookups": negatives,
+            "confirmed_positives": true_positives,
+        }
+
+    def flush(self):
+        for layer in self.layers:
+            layer.flush()
+
+    def close(self):
+        for layer in self.layers:
+            layer.close()
+
+
+def subsite_bloom_filter(site: str, subsite_key: str, subsite_value: str, tree_scraped, directory: str = BLOOM_FILTER_DIR) -> ScalableBloomFilter:
+    """
+    Abre el filtro de Bloom de un site/subsite y lo sincroniza con el registro.
+
+    Si el número de URLs del registro difiere del watermark del filtro (URLs
+    registradas sin el filtro, p. ej. con DISCOVERY_BLOOM_FILTER desactivado
+    o por otro flujo), se vuelven a cargar todas: agregar es idempotente y un
+    negativo del filtro se toma como URL nueva con certeza.
+
+    Args:
+    - tree_scraped (TreeScraped): Registro autoritativo de URLs.
+    """
+    key = hashlib.md5(f"{site}|{subsite_key}|{subsite_value}".encode()).hexdigest()
+    bloom_filter = ScalableBloomFilter(os.path.join(directory, key))
+    # Contar antes de recorrer: si otro proceso registra URLs entretanto, el watermark queda atrás y se resincroniza
+    registered = tree_scraped.count_urls(site, subsite_key, subsite_value)
+    if registered != bloom_filter.watermark:
+        bloom_filter.add_many(tree_scraped.iter_urls(site, subsite_key, subsite_value), watermark=registered)
+        bloom_filter.flush()
+    return bloom_filter
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
+import psutil
+from dotenv import load_dotenv
+from playwright.async_api import async_playwright
+
+from app.helpers.metrics import get_metrics
+
+load_dotenv()
+
+BROWSER_POOL_MAX_CONTEXTS = int(os.getenv('BROWSER_POOL_MAX_CONTEXTS', 4))
+BROWSER_POOL_MAX_PAGES = int(os.getenv('BROWSER_POOL_MAX_PAGES', 200))
+BROWSER_POOL_MAX_MEMORY_MB = int(os.getenv('BROWSER_POOL_MAX_MEMORY_MB', 1024))
+BROWSER_POOL_HEADLESS = os.getenv('BROWSER_POOL_HEADLESS', 'true').lower() != 'false'
+
+# Cada cuántos contextos entregados se mide la memoria del navegador
+MEMORY_CHECK_INTERVAL = 10
+# Procesos de Chromium (navegador, renderers, GPU, etc.); el resto de hijos del worker no cuenta
+BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell")
+
+BROWSER_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+    "--disable-gpu",
+    "--disable-dev-shm-usage",
+    "--disable-web-security",
+    "--disable-features=IsolateOrigins,site-per-process",
+    "--start-maximized"
+]
+
+DEFAULT_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
+
+
+class BrowserPool:
+    """
+    Pool de navegadores por proceso de worker.
+
+    Mantiene un único Chromium abierto y entrega un contexto aislado por tarea,
+    limitando la cantidad de contextos simultáneos. El navegador se recicla
+    después de `max_pages` contextos entregados o cuando su memoria supera
+    `max_memory_mb`; el navegador viejo se cierra cuando terminan sus contextos.
+    """
+
+    def __init__(self,
+                 max_contexts: int = BROWSER_POOL_MAX_CONTEXTS,
+                 max_pages: int = BROWSER_POOL_MAX_PAGES,
+                 max_memory_mb: int = BROWSER_POOL_MAX_MEMORY_MB,
+                 headless: bool = BROWSER_POOL_HEADLESS):
+        self.max_contexts = max_contexts
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.headless = headless
+
+        self._playwright = None
+        self._browser = None
+        self._semaphore = None
+        self._lock = None
+        # Serializa el arranque en frío: con el pool `threads` las primeras tareas llegan a la vez
+        self._start_lock = asyncio.Lock()
+        self._pages_served = 0
+        self._leases = {}
+
+    @property
+    def started(self) -> bool:
+        return self._playwright is not None
+
+    async def start(self):
+        """
+        Inicia Playwright y lanza el primer navegador (idempotente).
+
+        Las llamadas simultáneas esperan al mismo arranque; el pool solo queda
+        iniciado cuando el navegador ya está lanzado.
+        """
+        if self.started:
+            return
+        async with self._start_lock:
+            if self.started:
+                return
+            playwright = await async_playwright().start()
+            try:
+                browser = await self._launch(playwright)
+            except Exception:
+                await playwright.stop()
+                raise
+            self._semaphore = asyncio.Semaphore(self.max_contexts)
+            self._lock = asyncio.Lock()
+            self._browser = browser
+            self._playwright = playwright
+        logging.info(f"Browser pool iniciado (max_contexts={self.max_contexts}, max_pages={self.max_pages})")
+
+    async def close(self):
+        """Cierra todos los navegadores y detiene Playwright."""
+        async with self._start_lock:
+            if not self.started:
+                return
+            browsers = set(self._leases)
+            if self._browser is not None:
+                browsers.add(self._browser)
+            for browser in browsers:
+                await self._close_browser(browser)
+            self._leases = {}
+            self._browser = None
+            await self._playwright.stop()
+            self._playwright = None
+        # El lock queda ligado al loop que lo usó; un nuevo arranque puede ocurrir en otro loop
+        self._start_lock = asyncio.Lock()
+        logging.info("Browser pool cerrado")
+
+    async def _launch(self, playwright):
+        self._pages_served = 0
+        with get_metrics().span("browser_launch"):
+            return await playwright.chromium.launch(headless=self.headless, args=BROWSER_ARGS)
+
+    async def _close_browser(self, browser):
+        try:
+            await browser.close()
+        except Exception as e:
+            logging.warning(f"Error al cerrar el navegador: {e}")
+
+    def _browser_memory_mb(self) -> float:
+        # Chromium corre bajo el driver de Playwright; los demás hijos del worker (p. ej. el pool de extracción de PDF) no cuentan
+        rss = 0
+        for child in psutil.Process().children(recursive=True):
+            try:
+                if child.name().startswith(BROWSER_PROCESS_NAMES):
+                    rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss / (1024 * 1024)
+
+    def _needs_recycle(self) -> bool:
+        if not self._browser.is_connected():
+            return True
+        if self._pages_served >= self.max_pages:
+            return True
+        if self._pages_served and self._pages_served % MEMORY_CHECK_INTERVAL == 0:
+            return self._browser_memory_mb() > self.max_memory_mb
+        return False
+
+    async def _acquire_browser(self):
+        async with self._lock:
+            if self._needs_recycle():
+                old_browser = self._browser
+                logging.info(f"Reciclando navegador después de {self._pages_served} páginas")
+                self._browser = await self._launch(self._playwright)
+                if not self._leases.get(old_browser):
+                    self._leases.pop(old_browser, None)
+                    await self._close_browser(old_browser)
+            self._pages_served += 1
+            self._leases[self._browser] = self._leases.get(self._browser, 0) + 1
+            return self._browser
+
+    async def _release_browser(self, browser):
+        self._leases[browser] -= 1
+        # El navegador reciclado se cierra cuando su último contexto termina
+        if browser is not self._browser and self._leases[browser] == 0:
+            del self._leases[browser]
+            await self._close_browser(browser)
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """
+        Entrega un contexto de navegador aislado y lo cierra al terminar.
+
+        Args:
+        - **context_options: Opciones para `browser.new_context` (user_agent, etc.).
+        """
+        await self.start()
+        async with self._semaphore:
+            browser = await self._acquire_browser()
+            try:
+                context = await browser.new_context(**context_options)
+                try:
+                    yield context
+                finally:
+                    await context.close()
+            finally:
+                await self._release_browser(browser)
+
+    @asynccontextmanager
+    async def page(self, **context_options):
+        """Entrega una página nueva dentro de un contexto aislado."""
+        async with self.context(**context_options) as context:
+            yield await context.new_page()
+
+
+_browser_pool = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """Devuelve el pool de navegadores del proceso actual."""
+    global _browser_pool
+    if _browser_pool is None:
+        _browser_pool = BrowserPool()
+    return _browser_pool
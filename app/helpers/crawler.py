@@ -0,0 +1,170 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from app.helpers.browser_pool import get_browser_pool, DEFAULT_USER_AGENT
+from app.helpers.links import extract_links, normalize_url
+from app.helpers.load_profiles import get_load_profile
+from app.helpers.metrics import get_metrics
+from app.helpers.text_extraction import get_text_extractor
+
+load_dotenv()
+
+CRAWL_CONCURRENCY = int(os.getenv('CRAWL_CONCURRENCY', 4))
+CRAWL_MAX_PAGES = int(os.getenv('CRAWL_MAX_PAGES', 500))
+CRAWL_MAX_DEPTH = int(os.getenv('CRAWL_MAX_DEPTH', 3))
+CRAWL_POLITENESS_DELAY = float(os.getenv('CRAWL_POLITENESS_DELAY', 1.0))
+CRAWL_OUTPUT_DIR = os.getenv('CRAWL_OUTPUT_DIR', "app/cache/crawls")
+
+# Enlaces a archivos que no son páginas HTML
+SKIPPED_EXTENSIONS = (".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".zip", ".gz", ".tar", ".mp4", ".mp3", ".css", ".js")
+
+
+class HostPoliteness:
+    """Espacia las peticiones a un mismo host al menos `delay` segundos."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._next_slot = {}
+
+    async def wait(self, url: str):
+        if self.delay <= 0:
+            return
+        host = urlsplit(url).hostname
+        now = asyncio.get_running_loop().time()
+        # Cada llamada reserva el siguiente turno del host antes de dormir
+        slot = max(now, self._next_slot.get(host, now))
+        self._next_slot[host] = slot + self.delay
+        await asyncio.sleep(slot - now)
+
+
+class JsonlWriter:
+    """Escribe un resultado por línea a medida que se obtienen, sin acumularlos en memoria."""
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SiteCrawler:
+    """
+    Crawler asíncrono de un sitio con Playwright.
+
+    La frontera es una cola de prioridad por profundidad (recorrido en anchura)
+    y las URLs se deduplican al encolarlas. `concurrency` tareas comparten un
+    mismo contexto del navegador, cada una con su propia página, respetando
+    `max_depth`, `max_pages` y una pausa mínima entre peticiones al mismo host.
+
+    Args:
+    - base_url (str): URL inicial; solo se siguen enlaces del mismo host.
+    - output_path (str): Archivo JSONL donde se escribe cada página.
+    """
+
+    def __init__(self, base_url: str, output_path: str, concurrency: int = CRAWL_CONCURRENCY,
+                 max_pages: int = CRAWL_MAX_PAGES, max_depth: int = CRAWL_MAX_DEPTH,
+                 politeness_delay: float = CRAWL_POLITENESS_DELAY, link_selector: str = "a[href]"):
+        self.start_url = normalize_url(base_url, base_url)
+        self.host = urlsplit(self.start_url).hostname
+        self.output_path = output_path
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.max_depth = max_depth
+        self.link_selector = link_selector
+        self.politeness = HostPoliteness(politeness_delay)
+
+        self.frontier = asyncio.PriorityQueue()
+        self.seen = set()
+        self._order = itertools.count()
+        self.stats = {"pages": 0, "errors": 0, "enqueued": 0}
+
+    def should_follow(self, url: str) -> bool:
+        parts = urlsplit(url)
+        return parts.hostname == self.host and not parts.path.lower().endswith(SKIPPED_EXTENSIONS)
+
+    def enqueue(self, url: str, depth: int):
+        """Agrega la URL a la frontera si es nueva y queda presupuesto."""
+        if url in self.seen or depth > self.max_depth or len(self.seen) >= self.max_pages:
+            return
+        self.seen.add(url)
+        self.stats["enqueued"] += 1
+        self.frontier.put_nowait((depth, next(self._order), url))
+
+    async def fetch(self, context, url: str):
+        """Carga la página y devuelve su texto visible y sus enlaces."""
+        page = await context.new_page()
+        try:
+            with get_metrics().span("page_load", url=url) as span:
+                load = await get_load_profile(url).load(page, url)
+                span.set(bytes=load["bytes"], status=load["status"])
+            with get_metrics().span("text_extract", url=url, pages=1):
+                text_content = await get_text_extractor().extract_page(page)
+            links = await extract_links(page, self.link_selector)
+        finally:
+            await page.close()
+        return text_content, links
+
+    async def worker(self, context, writer: JsonlWriter):
+        while True:
+            depth, _, url = await self.frontier.get()
+            try:
+                await self.politeness.wait(url)
+                text_content, links = await self.fetch(context, url)
+                for link in links:
+                    if self.should_follow(link):
+                        self.enqueue(link, depth + 1)
+                writer.write({
+                    "url": url,
+                    "depth": depth,
+                    "text": text_content,
+                    "links": len(links),
+                    "scraped_at": datetime.now(timezone.utc).isoformat(),
+                })
+                self.stats["pages"] += 1
+            except Exception as e:
+                logging.error(f"An error occurred while crawling {url}: {e}")
+                writer.write({"url": url, "depth": depth, "error": str(e)})
+                self.stats["errors"] += 1
+            finally:
+                self.frontier.task_done()
+
+    async def run(self) -> dict:
+        start = time.perf_counter()
+        self.enqueue(self.start_url, 0)
+        writer = JsonlWriter(self.output_path)
+        try:
+            async with get_browser_pool().context(user_agent=DEFAULT_USER_AGENT) as context:
+                workers = [asyncio.create_task(self.worker(context, writer)) for _ in range(self.concurrency)]
+                try:
+                    # La frontera queda vacía cuando ninguna tarea tiene páginas en curso
+                    await self.frontier.join()
+                finally:
+                    for task in workers:
+                        task.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+        finally:
+            writer.close()
+
+        seconds = time.perf_counter() - start
+        return {**self.stats, "output": self.output_path, "seconds": seconds,
+                "pages_per_second": self.stats["pages"] / seconds if seconds else 0.0}
+
+
+def default_output_path(base_url: str) -> str:
+    host = urlsplit(base_url).hostname or "site"
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+    return os.path.join(CRAWL_OUTPUT_DIR, f"{host}_{timestamp}.jsonl")
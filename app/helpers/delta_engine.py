@@ -0,0 +1,187 @@
+"""
+Estrategias para calcular el delta (0 = sin cambios, 1 = cambio total) entre dos textos.
+
+Todas empiezan comparando ambos textos por igualdad: si son idénticos el
+delta es 0 sin más trabajo (`text_hash` permite hacer la misma comprobación
+contra un hash guardado). Compromisos de cada estrategia:
+
+- `exact`: solo la comparación de igualdad. O(n), devuelve 0 o 1, sin matices.
+- `minhash`: similitud de Jaccard estimada con un sketch bottom-k de shingles
+  de palabras. O(n log k); error típico ~1/sqrt(k) (~6% con k=256). Su
+  firma es pequeña y se puede guardar para comparar sin releer el texto.
+  Crece en proporción a las palabras editadas (~5x con shingles de 5), estén
+  juntas o dispersas. Estrategia por defecto (DELTA_STRATEGY).
+- `simhash`: distancia de Hamming entre huellas de 64 bits de los shingles,
+  reescalada para que dos textos sin relación (~32 bits distintos) den 1.
+  O(n) vectorizado con numpy; muy compacta pero gruesa, sirve para detectar
+  cambios grandes más que para medir cambios pequeños.
+- `chunks`: división del texto en bloques definidos por el contenido (hash
+  de palabras), comparados por hash. O(n); exacta a nivel de bloque y
+  además informa qué regiones del texto nuevo cambiaron. Con cambios
+  dispersos por todo el documento sobrestima mucho el delta (cada bloque
+  tocado cuenta entero: ~0.45 con el 1% de las palabras editadas); con
+  ediciones localizadas es precisa. Sirve para ubicar las regiones cambiadas
+  más que como score.
+- `sequence`: `difflib.SequenceMatcher` sobre líneas (implementación anterior).
+  Cuadrática en el peor caso; con textos de una sola línea solo distingue igual/distinto.
+"""
+import difflib
+import hashlib
+import heapq
+import zlib
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+MINHASH_SIZE = 256
+# Número medio de palabras por bloque en la estrategia `chunks`
+CHUNK_AVERAGE_WORDS = 32
+CHUNK_MIN_WORDS = 8
+CHUNK_MAX_WORDS = 256
+
+STRATEGIES = ("exact", "minhash", "simhash", "chunks", "sequence")
+# Identifica la función de `hash64`; las firmas MinHash guardadas con otra no son comparables
+SHINGLE_HASH = "blake2b-64"
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def hash64(data: bytes) -> int:
+    """Hash estable de 64 bits (no depende de PYTHONHASHSEED)."""
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Conjunto de hashes de los shingles de `size` palabras del texto."""
+    words = text.split()
+    if len(words) <= size:
+        return {hash64(" ".join(words).encode())} if words else set()
+    return {hash64(" ".join(words[i:i + size]).encode()) for i in range(len(words) - size + 1)}
+
+
+def minhash_signature(text: str, size: int = MINHASH_SIZE) -> list:
+    """Sketch bottom-k: los `size` hashes de shingles más pequeños, ordenados."""
+    return heapq.nsmallest(size, shingle_hashes(text))
+
+
+def minhash_similarity(signature_a: list, signature_b: list, size: int = MINHASH_SIZE) -> float:
+    """Estimación de la similitud de Jaccard a partir de dos sketches bottom-k."""
+    if not signature_a and not signature_b:
+        return 1.0
+    set_a, set_b = set(signature_a), set(signature_b)
+    union = heapq.nsmallest(size, set_a | set_b)
+    shared = sum(1 for value in union if value in set_a and value in set_b)
+    return shared / len(union)
+
+
+def simhash(text: str) -> int:
+    """Huella SimHash de 64 bits a partir de los shingles del texto."""
+    hashes = np.fromiter(shingle_hashes(text), dtype=np.uint64)
+    if hashes.size == 0:
+        return 0
+    fingerprint = 0
+    for bit in range(64):
+        ones = int(np.count_nonzero((hashes >> np.uint64(bit)) & np.uint64(1)))
+        if ones * 2 > hashes.size:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def split_chunks(text: str) -> list:
+    """
+    Divide el texto en bloques definidos por el contenido.
+
+    Un bloque termina después de una palabra cuyo hash es múltiplo de
+    `CHUNK_AVERAGE_WORDS`, de modo que una inserción solo altera los bloques
+    cercanos. No depende de saltos de línea (`clean_text` los elimina).
+
+    Returns:
+    - list: Tuplas (inicio, fin, hash) con offsets de caracteres en `text`.
+    """
+    chunks = []
+    start = None
+    words = 0
+    position = 0
+    for word in text.split(" "):
+        if start is None:
+            start = position
+        position += len(word) + 1
+        words += 1
+        boundary = zlib.crc32(word.encode()) % CHUNK_AVERAGE_WORDS == 0
+        if (boundary and words >= CHUNK_MIN_WORDS) or words >= CHUNK_MAX_WORDS:
+            end = position - 1
+            chunks.append((start, end, hash64(text[start:end].encode())))
+            start, words = None, 0
+    if start is not None and start < len(text):
+        chunks.append((start, len(text), hash64(text[start:].encode())))
+    return chunks
+
+
+def chunk_diff(old_text: str, new_text: str) -> dict:
+    """
+    Compara dos textos bloque a bloque.
+
+    Returns:
+    - dict: `delta` (fracción de caracteres en bloques no compartidos) y
+      `changed_regions` (rangos (inicio, fin) del texto nuevo que cambiaron).
+    """
+    if old_text == new_text:
+        return {"delta": 0.0, "changed_regions": []}
+
+    old_counts = {}
+    for start, end, chunk_hash in split_chunks(old_text):
+        old_counts[chunk_hash] = old_counts.get(chunk_hash, 0) + 1
+
+    shared_chars = 0
+    changed_regions = []
+    for start, end, chunk_hash in split_chunks(new_text):
+        if old_counts.get(chunk_hash):
+            old_counts[chunk_hash] -= 1
+            shared_chars += end - start
+        elif changed_regions and changed_regions[-1][1] + 1 >= start:
+            changed_regions[-1] = (changed_regions[-1][0], end)
+        else:
+            changed_regions.append((start, end))
+
+    total_chars = len(old_text) + len(new_text)
+    delta = 1 - (2 * shared_chars / total_chars) if total_chars else 0.0
+    return {"delta": max(0.0, min(1.0, delta)), "changed_regions": changed_regions}
+
+
+def sequence_delta(old_text: str, new_text: str) -> float:
+    diff = difflib.SequenceMatcher(None, old_text.splitlines(), new_text.splitlines())
+    return 1 - diff.ratio()
+
+
+def compute_delta(old_text: str, new_text: str, strategy: str = "minhash") -> float:
+    """
+    Calcula el delta entre dos textos con la estrategia indicada.
+
+    Args:
+    - old_text (str): Texto anterior.
+    - new_text (str): Texto nuevo.
+    - strategy (str): Una de `STRATEGIES`.
+
+    Returns:
+    - float: 0 indica que no hay cambios, 1 que cambió todo.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Estrategia de delta desconocida: {strategy}")
+
+    if old_text == new_text:
+        return 0.0
+    if not old_text or not new_text:
+        return 1.0
+
+    if strategy == "exact":
+        return 1.0
+    if strategy == "minhash":
+        return 1 - minhash_similarity(minhash_signature(old_text), minhash_signature(new_text))
+    if strategy == "simhash":
+        # Textos independientes difieren en la mitad de los bits: 32 de 64 ya es un cambio total
+        return min(1.0, 2 * bin(simhash(old_text) ^ simhash(new_text)).count("1") / 64)
+    if strategy == "chunks":
+        return chunk_diff(old_text, new_text)["delta"]
+    return sequence_delta(old_text, new_text)
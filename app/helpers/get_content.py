@@ -2,10 +2,22 @@ import requests
 import logging
 import re
 import os
+import io
+import hashlib
+import tempfile
 import fitz
 from fastapi import HTTPException
-from urllib.parse import urlparse
+from datetime import datetime, timezone
 from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
+from app.helpers.shard_writer import get_shard_writer, site_name
+
+# Límites para descargar y extraer PDFs con memoria acotada
+PDF_CHUNK_SIZE = 64 * 1024
+PDF_MEMORY_THRESHOLD = int(os.getenv('PDF_MEMORY_THRESHOLD', 8 * 1024 * 1024))
+PDF_MAX_BYTES = int(os.getenv('PDF_MAX_BYTES', 200 * 1024 * 1024))
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 2000))
+PDF_MAX_CHARS = int(os.getenv('PDF_MAX_CHARS', 20 * 1024 * 1024))
+PDF_TMP_DIR = os.getenv('PDF_TMP_DIR') or None
 
 
 def create_directory_structure(base_url: str, subsite: str) -> str:
@@ -48,49 +60,163 @@ def clean_text(text):
 
     return text
 
-def download_pdf_via_requests(pdf_url: str, download_path: str = 'app/cache/download.pdf') -> str:
-    response = requests.get(pdf_url)
-    if response.status_code == 200:
-        with open(download_path, "wb") as pdf_file:
-            pdf_file.write(response.content)
-        logging.info(f"PDF descargado y guardado en {download_path}")
-    else:
+class PdfBuffer:
+    """
+    Buffer para descargar un PDF con memoria acotada.
+
+    Mantiene el contenido en memoria hasta `memory_threshold` bytes y después
+    lo vuelca a un archivo temporal único. Calcula el SHA-256 mientras recibe
+    los bloques y rechaza documentos mayores que `max_bytes`.
+    """
+
+    def __init__(self, memory_threshold: int = PDF_MEMORY_THRESHOLD, max_bytes: int = PDF_MAX_BYTES):
+        self.memory_threshold = memory_threshold
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.path = None
+        self._hash = hashlib.sha256()
+        self._buffer = io.BytesIO()
+        self._file = None
+
+    def check_length(self, content_length):
+        """Rechaza el documento antes de descargarlo si su Content-Length supera `max_bytes`."""
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            raise ValueError(f"El PDF ({content_length} bytes) supera el tamaño máximo de {self.max_bytes} bytes")
+
+    def write(self, chunk: bytes):
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise ValueError(f"El PDF supera el tamaño máximo de {self.max_bytes} bytes")
+        self._hash.update(chunk)
+
+        if self._file is None and self.size > self.memory_threshold:
+            # Volcar lo acumulado a un archivo temporal propio de esta descarga
+            self._file = tempfile.NamedTemporaryFile(prefix="download_", suffix=".pdf", dir=PDF_TMP_DIR, delete=False)
+            self.path = self._file.name
+            self._file.write(self._buffer.getvalue())
+            self._buffer = None
+
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def head(self) -> bytes:
+        """Primeros bytes del contenido (para detectar la cabecera %PDF)."""
+        if self._buffer is not None:
+            return self._buffer.getbuffer()[:1024].tobytes()
+        self._file.flush()
+        with open(self.path, "rb") as file:
+            return file.read(1024)
+
+    @property
+    def source(self):
+        """Contenido listo para `fitz.open`: bytes en memoria o la ruta del archivo temporal."""
+        if self._file is not None:
+            self._file.flush()
+            return self.path
+        return self._buffer.getvalue()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._file = None
+        self._buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def download_pdf_via_requests(pdf_url: str) -> str:
+    response = requests.get(pdf_url, stream=True)
+    if response.status_code != 200:
         raise HTTPException(status_code=500, detail="No se pudo descargar el PDF")
 
-    # Verificar si el archivo existe y no está vacío
-    if not os.path.exists(download_path) or os.path.getsize(download_path) == 0:
-        raise HTTPException(status_code=500, detail=f"El archivo PDF no se descargó correctamente o está vacío: {download_path}")
+    with response, PdfBuffer() as buffer:
+        for chunk in response.iter_content(chunk_size=PDF_CHUNK_SIZE):
+            buffer.write(chunk)
+
+        # Verificar que el archivo no está vacío
+        if buffer.size == 0:
+            raise HTTPException(status_code=500, detail=f"El archivo PDF no se descargó correctamente o está vacío: {pdf_url}")
+        logging.info(f"PDF descargado ({buffer.size} bytes): {pdf_url}")
+
+        # Extraer el texto del PDF descargado
+        text = extract_text_from_pdf(buffer.source)
 
-    # Extraer el texto del PDF descargado
-    with fitz.open(download_path) as pdf:
-        text = ""
-        for page in pdf:
-            text += page.get_text()
-    
-    text = clean_text(text=text)
     logging.info(f"Text extracted succesfully from : {pdf_url}")
     return text
 
-def save_scraped_content(url, content):
+def open_pdf(source):
+    """Abre un PDF desde una ruta o desde su contenido en bytes."""
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
 
-    parsed_url = urlparse(url)
-    site_name = parsed_url.netloc.replace("www.", "")  # Remove 'www.' if present
+def count_pdf_pages(source) -> int:
+    with open_pdf(source) as pdf:
+        return len(pdf)
 
-    # Define the file name using the site name
-    file_name = f"{site_name}_scraped_content.txt"
+def iter_pdf_pages_text(source, max_pages: int = PDF_MAX_PAGES, max_chars: int = PDF_MAX_CHARS, start_page: int = 0):
+    """
+    Genera el texto limpio de un PDF página por página.
 
-    # Ensure the directory exists where the file will be saved
-    if not os.path.exists("scraped_sites"):
-        os.makedirs("scraped_sites")
+    Args:
+    - source (str | bytes): Ruta del archivo PDF o su contenido en bytes.
+    - max_pages (int): Número máximo de páginas a extraer.
+    - max_chars (int): Número máximo de caracteres a extraer en total.
+    - start_page (int): Primera página a extraer (para dividir documentos grandes por rangos).
 
-    # Full path to the file
-    file_path = os.path.join("scraped_sites", file_name)
+    Yields:
+    - str: El texto limpio de cada página (las páginas vacías se omiten).
+    """
+    with open_pdf(source) as pdf:
+        total_chars = 0
+        for page_number in range(start_page, min(len(pdf), max_pages)):
+            page_text = clean_text(pdf[page_number].get_text())
+            if not page_text:
+                continue
+            if total_chars + len(page_text) > max_chars:
+                yield page_text[:max_chars - total_chars]
+                return
+            total_chars += len(page_text)
+            yield page_text
+
+def extract_text_from_pdf(source, max_pages: int = PDF_MAX_PAGES, max_chars: int = PDF_MAX_CHARS) -> str:
+    """
+    Extrae y limpia el texto de un PDF.
+
+    Args:
+    - source (str | bytes): Ruta del archivo PDF o su contenido en bytes.
+
+    Returns:
+    - str: El texto limpio del PDF.
+    """
+    return " ".join(iter_pdf_pages_text(source, max_pages=max_pages, max_chars=max_chars))
 
-    # Write the content to the file, including the URL as a header
-    with open(file_path, "a", encoding="utf-8") as f:
-        f.write(f"\n\nURL: {url}\n")
-        f.write(f"Content:\n{content}\n")
-        f.write("-" * 80)  # Separator between pages for readability
+def save_scraped_content(url, content):
+    """
+    Guarda el texto de la página como un registro JSONL en los shards del sitio.
+
+    Args:
+    - url (str): URL de la página.
+    - content (str): Texto extraído.
+    """
+    get_shard_writer(site_name(url)).write({
+        "url": url,
+        "scraped_at": datetime.now(timezone.utc).isoformat(),
+        "content": content,
+    })
 
 async def check_and_click_pagination(page: Page, next_selector: str) -> bool:
     """
@@ -111,9 +237,9 @@ async def check_and_click_pagination(page: Page, next_selector: str) -> bool:
             # Verificar si el botón es visible antes de hacer clic
             is_visible = await pagination_button.is_visible()
             if is_visible:
-                # Hacer clic en el botón y esperar a que la nueva página cargue
-                await pagination_button.click()
-                await page.wait_for_selector("body")  # Espera a que el contenido cargue
+                # Hacer clic en el botón y esperar a que termine la navegación a la nueva página
+                async with page.expect_navigation(wait_until="domcontentloaded"):
+                    await pagination_button.click()
                 return True
             else:
                 return False
@@ -1,6 +1,9 @@
 import os
-import difflib
 import hashlib
+from app.helpers.delta_engine import compute_delta
+
+# MinHash por defecto: proporcional al cambio y con firma guardada; `chunks` sobrestima las ediciones dispersas
+DELTA_STRATEGY = os.getenv('DELTA_STRATEGY', 'minhash')
 
 class GetDelta:
 
@@ -13,12 +16,9 @@ class GetDelta:
         with open(filename, "w") as file:
             file.write(text)
 
-    def calculate_text_delta(self, old_text: str, new_text: str) -> float:
-        """Calculates the delta between two texts in the range of 0 to 1."""
-        old_lines = old_text.splitlines()
-        new_lines = new_text.splitlines()
-        diff = difflib.SequenceMatcher(None, old_lines, new_lines)
-        return 1 - diff.ratio()  # 0 indicates no change, 1 indicates complete change
+    def calculate_text_delta(self, old_text: str, new_text: str, strategy: str = DELTA_STRATEGY) -> float:
+        """Calculates the delta between two texts in the range of 0 to 1 (see app.helpers.delta_engine)."""
+        return compute_delta(old_text, new_text, strategy=strategy)  # 0 indicates no change, 1 indicates complete change
 
     def get_existing_text(self, filename: str) -> str:
         """Retrieves the existing text from a file if it exists."""
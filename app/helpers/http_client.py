@@ -0,0 +1,108 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+import httpx
+from dotenv import load_dotenv
+
+from app.helpers.browser_pool import DEFAULT_USER_AGENT
+
+load_dotenv()
+
+HTTP_MAX_CONNECTIONS = int(os.getenv('HTTP_MAX_CONNECTIONS', 100))
+HTTP_MAX_CONNECTIONS_PER_HOST = int(os.getenv('HTTP_MAX_CONNECTIONS_PER_HOST', 8))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 30))
+
+# HTTP/2 solo si el paquete h2 está instalado (httpx[http2])
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HttpClient:
+    """
+    Cliente HTTP asíncrono compartido por event loop.
+
+    Reutiliza conexiones keep-alive (y HTTP/2 cuando está disponible) y limita
+    las conexiones simultáneas por host con un semáforo por dominio.
+    """
+
+    def __init__(self,
+                 max_connections: int = HTTP_MAX_CONNECTIONS,
+                 max_connections_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+                 timeout: float = HTTP_TIMEOUT):
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout = timeout
+        self._client = None
+        self._host_semaphores = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+                timeout=self.timeout,
+                headers={"User-Agent": DEFAULT_USER_AGENT},
+                follow_redirects=True,
+            )
+        return self._client
+
+    def _host_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(self.max_connections_per_host)
+        return self._host_semaphores[host]
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """Hace un GET respetando el límite de conexiones del host."""
+        async with self._host_semaphore(url):
+            return await self._get_client().get(url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """Hace un POST respetando el límite de conexiones del host."""
+        async with self._host_semaphore(url):
+            return await self._get_client().post(url, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs):
+        """Abre una respuesta en streaming respetando el límite de conexiones del host."""
+        async with self._host_semaphore(url):
+            async with self._get_client().stream(method, url, **kwargs) as response:
+                yield response
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+http_clients = {}
+
+
+def get_http_client() -> HttpClient:
+    """
+    Devuelve el cliente HTTP del event loop actual.
+
+    El pool de conexiones de httpx y los semáforos por host quedan ligados al
+    loop en el que se usan por primera vez (p. ej. el de Prefect y el del
+    AsyncRunner de Celery), así que cada loop tiene su propio cliente.
+    """
+    loop = asyncio.get_running_loop()
+    # Descartar los clientes de loops ya cerrados
+    for closed_loop in [key for key in http_clients if key.is_closed()]:
+        del http_clients[closed_loop]
+    if loop not in http_clients:
+        http_clients[loop] = HttpClient()
+    return http_clients[loop]
+
+
+async def close_http_client():
+    """Cierra el cliente HTTP del event loop actual."""
+    client = http_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
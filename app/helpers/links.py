@@ -0,0 +1,102 @@
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from bs4 import BeautifulSoup
+from playwright.async_api import Page
+
+# Parámetros de seguimiento que no cambian el contenido de la página
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid", "_ga", "_gl"}
+TRACKING_PREFIXES = ("utm_",)
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# Una sola llamada al navegador devuelve todos los href y la URL base del documento (respeta <base href>)
+EXTRACT_LINKS_JS = """
+(elements) => ({
+    base: document.baseURI,
+    hrefs: elements.map((element) => element.getAttribute("href")),
+})
+"""
+
+
+def is_tracking_param(name: str) -> bool:
+    name = name.lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+
+def canonicalize_url(url: str, strip_trailing_slash: bool = True):
+    """
+    Forma canónica de una URL absoluta para deduplicar.
+
+    Quita el fragmento y los parámetros de seguimiento, pasa el esquema y el
+    host a minúsculas, elimina el puerto por defecto y la barra final (salvo
+    en la raíz). El resto de la query se conserva tal cual, sin reordenar ni
+    recodificar.
+
+    Args:
+    - url (str): URL absoluta.
+    - strip_trailing_slash (bool): Si se elimina la barra final del path.
+
+    Returns:
+    - str | None: URL canónica, o None si no es una URL http(s) válida.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS or not parts.hostname:
+        return None
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+
+    host = f"[{parts.hostname}]" if ":" in parts.hostname else parts.hostname
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+
+    path = parts.path or "/"
+    if strip_trailing_slash and path != "/" and path.endswith("/"):
+        path = path.rstrip("/") or "/"
+
+    query = "&".join(
+        param for param in parts.query.split("&")
+        if param and not is_tracking_param(param.split("=", 1)[0])
+    )
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def normalize_url(href: str, base_url: str, strip_trailing_slash: bool = True):
+    """Resuelve el href respecto a `base_url` y lo canoniza. Devuelve None para enlaces no navegables."""
+    if not href:
+        return None
+    href = href.strip()
+    if not href or href.startswith("#"):
+        return None
+    return canonicalize_url(urljoin(base_url, href), strip_trailing_slash=strip_trailing_slash)
+
+
+def normalize_urls(hrefs, base_url: str, strip_trailing_slash: bool = True) -> list:
+    """Normaliza los hrefs y elimina duplicados conservando el orden."""
+    urls = (normalize_url(href, base_url, strip_trailing_slash) for href in hrefs)
+    return list(dict.fromkeys(url for url in urls if url))
+
+
+async def extract_links(page: Page, selector: str, base_url: str = None) -> list:
+    """
+    Extrae en una sola evaluación en el navegador los links que coinciden con el selector.
+
+    Args:
+    - page (Page): Página de Playwright ya cargada.
+    - selector (str): Selector CSS de los enlaces (p. ej. "a[href*='pdf']").
+    - base_url (str): Base para resolver hrefs relativos; por defecto la del documento.
+
+    Returns:
+    - list: URLs absolutas, canónicas y sin duplicados, en orden de aparición.
+    """
+    result = await page.eval_on_selector_all(selector, EXTRACT_LINKS_JS)
+    return normalize_urls(result["hrefs"], base_url or result["base"] or page.url)
+
+
+def extract_links_from_html(html: str, selector: str, base_url: str) -> list:
+    """Equivalente a `extract_links` para HTML descargado sin navegador."""
+    soup = BeautifulSoup(html, 'lxml')
+    base = soup.find("base", href=True)
+    if base is not None:
+        base_url = urljoin(base_url, base["href"])
+    return normalize_urls((link.get("href") for link in soup.select(selector)), base_url)
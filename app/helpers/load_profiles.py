@@ -0,0 +1,244 @@
+"""
+Perfiles de carga de páginas para Playwright.
+
+Cada perfil decide qué recursos se bloquean con `page.route`, hasta qué evento
+se espera en `goto` y cómo se detecta que la página terminó de cargar:
+
+- `fast`: solo HTML y scripts propios; bloquea imágenes, media, fuentes, CSS y
+  trackers. Espera a `domcontentloaded` y al `body`. Para páginas estáticas.
+- `dynamic`: bloquea imágenes, media, fuentes y trackers. Espera a que el DOM
+  deje de cambiar y hace scroll incremental mientras la página siga creciendo
+  (listas con carga diferida).
+- `full`: sin bloqueos, espera a `networkidle` y hace scroll como `dynamic`.
+  Equivale al comportamiento original sin la espera fija de 2 segundos.
+
+Cada carga registra tiempo, peticiones y bytes transferidos por sitio y perfil
+(`load_profile_report`) para elegir el perfil más barato de cada sitio en
+`SITE_LOAD_PROFILES`.
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, defaultdict
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+from playwright.async_api import Page
+
+load_dotenv()
+
+PAGE_LOAD_PROFILE = os.getenv('PAGE_LOAD_PROFILE', 'dynamic')
+PAGE_LOAD_TIMEOUT_MS = int(os.getenv('PAGE_LOAD_TIMEOUT_MS', 30000))
+
+# Dominios de analítica y publicidad que no aportan contenido
+TRACKER_DOMAINS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "connect.facebook.com", "hotjar.com", "segment.io", "segment.com",
+    "mixpanel.com", "newrelic.com", "nr-data.net", "scorecardresearch.com", "quantserve.com",
+)
+
+# Resuelve cuando el DOM pasa `quietMs` sin mutaciones, o a los `timeoutMs` como máximo
+DOM_STABLE_JS = """
+({quietMs, timeoutMs}) => new Promise((resolve) => {
+    let timer;
+    const done = () => {
+        observer.disconnect();
+        clearTimeout(timer);
+        clearTimeout(cap);
+        resolve();
+    };
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(done, quietMs);
+    });
+    observer.observe(document.documentElement, {childList: true, subtree: true, characterData: true});
+    timer = setTimeout(done, quietMs);
+    const cap = setTimeout(done, timeoutMs);
+})
+"""
+
+# Scroll de a una pantalla hasta llegar al final sin que la página crezca; devuelve los pasos dados
+INCREMENTAL_SCROLL_JS = """
+async ({delayMs, maxSteps}) => {
+    let lastHeight = 0;
+    for (let step = 1; step <= maxSteps; step++) {
+        window.scrollBy(0, window.innerHeight);
+        await new Promise((resolve) => setTimeout(resolve, delayMs));
+        const height = document.body.scrollHeight;
+        if (window.scrollY + window.innerHeight >= height && height === lastHeight) {
+            return step;
+        }
+        lastHeight = height;
+    }
+    return maxSteps;
+}
+"""
+
+# Estadísticas acumuladas por (host, perfil)
+load_profile_stats = defaultdict(Counter)
+
+
+def is_blocked_domain(url: str, domains) -> bool:
+    host = urlsplit(url).hostname or ""
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+
+class LoadProfile:
+    """
+    Estrategia de carga de una página.
+
+    Args:
+    - name (str): Nombre del perfil.
+    - block_resource_types (tuple): Tipos de recurso de Playwright a abortar ("image", "font", ...).
+    - block_domains (tuple): Dominios (y subdominios) a abortar.
+    - wait_until (str): Evento que espera `page.goto`.
+    - wait_for_selector (str): Selector que indica que el contenido ya está en la página.
+    - wait_for_dom_stable (bool): Esperar a que el DOM deje de cambiar.
+    - scroll (bool): Hacer scroll incremental para cargar contenido diferido.
+    """
+
+    def __init__(self, name: str, block_resource_types: tuple = (), block_domains: tuple = (),
+                 wait_until: str = "domcontentloaded", wait_for_selector: str = "body",
+                 wait_for_dom_stable: bool = False, scroll: bool = False,
+                 dom_quiet_ms: int = 500, dom_stable_timeout_ms: int = 5000,
+                 scroll_delay_ms: int = 250, max_scroll_steps: int = 20,
+                 timeout_ms: int = PAGE_LOAD_TIMEOUT_MS):
+        self.name = name
+        self.block_resource_types = set(block_resource_types)
+        self.block_domains = tuple(block_domains)
+        self.wait_until = wait_until
+        self.wait_for_selector = wait_for_selector
+        self.wait_for_dom_stable = wait_for_dom_stable
+        self.scroll = scroll
+        self.dom_quiet_ms = dom_quiet_ms
+        self.dom_stable_timeout_ms = dom_stable_timeout_ms
+        self.scroll_delay_ms = scroll_delay_ms
+        self.max_scroll_steps = max_scroll_steps
+        self.timeout_ms = timeout_ms
+
+    def with_options(self, **options) -> "LoadProfile":
+        """Copia del perfil con opciones cambiadas (p. ej. el selector de un sitio)."""
+        return LoadProfile(**{**self.__dict__, **options})
+
+    @property
+    def blocks_requests(self) -> bool:
+        return bool(self.block_resource_types or self.block_domains)
+
+    def should_block(self, request) -> bool:
+        return request.resource_type in self.block_resource_types or is_blocked_domain(request.url, self.block_domains)
+
+    async def wait_for_dom(self, page: Page):
+        await page.evaluate(DOM_STABLE_JS, {"quietMs": self.dom_quiet_ms, "timeoutMs": self.dom_stable_timeout_ms})
+
+    async def load(self, page: Page, url: str) -> dict:
+        """
+        Navega a la URL con este perfil y espera a que el contenido esté listo.
+
+        Returns:
+        - dict: Perfil, estado HTTP, segundos, peticiones, peticiones bloqueadas, bytes transferidos y pasos de scroll.
+        """
+        stats = Counter()
+        sizes = []
+
+        async def handle_route(route):
+            if self.should_block(route.request):
+                stats["blocked"] += 1
+                await route.abort()
+            else:
+                await route.continue_()
+
+        def on_request_finished(request):
+            stats["requests"] += 1
+            sizes.append(asyncio.ensure_future(request.sizes()))
+
+        # Sin bloqueos no se instala la ruta: interceptar desactiva la caché HTTP del navegador
+        if self.blocks_requests:
+            await page.route("**/*", handle_route)
+        page.on("requestfinished", on_request_finished)
+
+        start = time.perf_counter()
+        try:
+            response = await page.goto(url, wait_until=self.wait_until, timeout=self.timeout_ms)
+            if self.wait_for_selector:
+                await page.wait_for_selector(self.wait_for_selector, timeout=self.timeout_ms)
+            if self.wait_for_dom_stable:
+                await self.wait_for_dom(page)
+            if self.scroll:
+                stats["scroll_steps"] = await page.evaluate(
+                    INCREMENTAL_SCROLL_JS, {"delayMs": self.scroll_delay_ms, "maxSteps": self.max_scroll_steps}
+                )
+                await self.wait_for_dom(page)
+        finally:
+            seconds = time.perf_counter() - start
+            page.remove_listener("requestfinished", on_request_finished)
+
+        for size in await asyncio.gather(*sizes, return_exceptions=True):
+            if isinstance(size, dict):
+                stats["bytes"] += size["responseHeadersSize"] + size["responseBodySize"]
+
+        result = {"profile": self.name, "status": response.status if response else None, "seconds": seconds,
+                  "requests": stats["requests"], "blocked": stats["blocked"], "bytes": stats["bytes"],
+                  "scroll_steps": stats["scroll_steps"]}
+        record_load(url, result)
+        return result
+
+
+LOAD_PROFILES = {
+    "fast": LoadProfile(
+        "fast",
+        block_resource_types=("image", "media", "font", "stylesheet", "texttrack", "eventsource", "websocket", "manifest", "other"),
+        block_domains=TRACKER_DOMAINS,
+    ),
+    "dynamic": LoadProfile(
+        "dynamic",
+        block_resource_types=("image", "media", "font"),
+        block_domains=TRACKER_DOMAINS,
+        wait_for_dom_stable=True,
+        scroll=True,
+    ),
+    "full": LoadProfile(
+        "full",
+        wait_until="networkidle",
+        scroll=True,
+    ),
+}
+
+# Perfil por host, elegido con `load_profile_report`; el resto usa PAGE_LOAD_PROFILE
+SITE_LOAD_PROFILES = {
+    "arxiv.org": LOAD_PROFILES["fast"],
+}
+
+
+def get_load_profile(url: str) -> LoadProfile:
+    host = urlsplit(url).hostname or ""
+    if host.startswith("www."):
+        host = host[4:]
+    return SITE_LOAD_PROFILES.get(host, LOAD_PROFILES[PAGE_LOAD_PROFILE])
+
+
+def record_load(url: str, result: dict):
+    stats = load_profile_stats[(urlsplit(url).hostname or "", result["profile"])]
+    stats["pages"] += 1
+    stats["milliseconds"] += int(result["seconds"] * 1000)
+    for key in ("requests", "blocked", "bytes"):
+        stats[key] += result[key]
+    logging.info(f"Página {url} cargada con el perfil {result['profile']}: {result['seconds']:.2f}s, "
+                 f"{result['requests']} peticiones ({result['blocked']} bloqueadas), {result['bytes']} bytes")
+
+
+def load_profile_report() -> list:
+    """Promedios por sitio y perfil, del más barato al más caro en tiempo."""
+    report = []
+    for (host, profile), stats in load_profile_stats.items():
+        pages = stats["pages"]
+        report.append({
+            "host": host,
+            "profile": profile,
+            "pages": pages,
+            "avg_seconds": stats["milliseconds"] / pages / 1000,
+            "avg_requests": stats["requests"] / pages,
+            "avg_blocked": stats["blocked"] / pages,
+            "avg_bytes": stats["bytes"] / pages,
+        })
+    return sorted(report, key=lambda row: (row["host"], row["avg_seconds"]))
@@ -0,0 +1,322 @@
+"""
+Métricas del pipeline discover → cola → Celery → descarga → extracción → delta.
+
+Cada etapa se mide con `get_metrics().span("etapa")` (o el decorador
+`timed`). Los valores se acumulan en memoria con el formato de Prometheus y
+se exportan de dos formas:
+
+- `start_metrics_server(port)`: endpoint `/metrics` compatible con Prometheus
+  (METRICS_PORT; 0 lo desactiva).
+- Una traza JSONL por proceso en METRICS_TRACE_DIR con un evento por span,
+  muestra de cola y latencia de tarea, para perfilar una ejecución sin
+  servicios externos. Está desactivada por defecto porque crece con cada
+  span; se activa solo mientras se perfila:
+
+      METRICS_TRACE_DIR=app/cache/traces ...
+      python -m app.helpers.metrics app/cache/traces/*.jsonl
+"""
+import functools
+import inspect
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+# Directorio vacío (por defecto): sin traza JSONL
+METRICS_TRACE_DIR = os.getenv('METRICS_TRACE_DIR', "")
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900)
+
+# nombre -> (tipo, descripción)
+METRICS = {
+    "scraping_stage_seconds": ("histogram", "Duración de cada etapa del pipeline."),
+    "scraping_stage_errors_total": ("counter", "Etapas terminadas con una excepción."),
+    "scraping_bytes_downloaded_total": ("counter", "Bytes descargados por modo de descarga."),
+    "scraping_pages_extracted_total": ("counter", "Páginas de texto extraídas (PDF o HTML)."),
+    "scraping_urls_published_total": ("counter", "URLs nuevas publicadas en la cola de descubrimiento."),
+    "scraping_tasks_dispatched_total": ("counter", "Tareas enviadas a Celery."),
+    "scraping_queue_depth": ("gauge", "Mensajes pendientes en la cola."),
+    "scraping_task_latency_seconds": ("histogram", "Tiempo desde que la tarea se encola en Celery hasta que termina."),
+    "scraping_domain_rate": ("gauge", "Peticiones por segundo permitidas por el limitador de cada dominio."),
+    "scraping_domain_concurrency": ("gauge", "Peticiones simultáneas permitidas por el limitador de cada dominio."),
+    "scraping_domain_in_flight": ("gauge", "Peticiones en curso por dominio, de todos los procesos que comparten el limitador."),
+}
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: tuple) -> str:
+    pairs = [f'{key}="{escape_label(value)}"' for key, value in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Span:
+    """
+    Intervalo medido de una etapa. `set` agrega atributos al evento de la traza;
+    al salir del `with`, `seconds` tiene la duración.
+    """
+
+    def __init__(self, metrics, stage: str, attributes: dict):
+        self.metrics = metrics
+        self.stage = stage
+        self.attributes = attributes
+        self.seconds = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = self.seconds = time.perf_counter() - self._start
+        self.metrics.observe("scraping_stage_seconds", seconds, stage=self.stage)
+        if exc_type is not None:
+            self.metrics.inc("scraping_stage_errors_total", stage=self.stage)
+        self.metrics.trace({
+            "type": "span", "stage": self.stage, "ts": self.started_at, "seconds": seconds,
+            "ok": exc_type is None, **self.attributes,
+        })
+        return False
+
+
+class Metrics:
+    """
+    Registro de contadores, gauges e histogramas del proceso.
+
+    Es seguro entre hilos: lo usan a la vez el loop compartido del worker y los
+    hilos del pool de Celery.
+    """
+
+    def __init__(self, trace_directory: str = METRICS_TRACE_DIR):
+        self._values = {}
+        self._lock = threading.Lock()
+        self.trace_directory = trace_directory
+        self.trace_path = None
+        self._trace_file = None
+        self._trace_pid = None
+
+    def _key(self, name: str, labels: dict) -> tuple:
+        if name not in METRICS:
+            raise KeyError(f"Métrica no registrada: {name}")
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._values[key] = value
+        self.trace({"type": "gauge", "name": name, "ts": time.time(), "value": value, **labels})
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._values.get(key)
+            if histogram is None:
+                histogram = self._values[key] = Histogram()
+            histogram.observe(value)
+
+    def span(self, stage: str, **attributes) -> Span:
+        """Mide la etapa dentro de un `with` (también alrededor de `await`)."""
+        return Span(self, stage, attributes)
+
+    def observe_task(self, task: str, enqueued_at: float, **attributes):
+        """Registra la latencia desde que la tarea se encoló (`time.time()` al publicarla) hasta ahora."""
+        if enqueued_at is None:
+            return
+        latency = time.time() - enqueued_at
+        self.observe("scraping_task_latency_seconds", latency, task=task)
+        self.trace({"type": "task", "task": task, "ts": time.time(), "latency": latency, **attributes})
+
+    def trace(self, event: dict):
+        if not self.trace_directory:
+            return
+        pid = os.getpid()
+        line = json.dumps({"pid": pid, **event}, default=str) + "\n"
+        with self._lock:
+            # Un archivo por proceso, también en los hijos creados con fork después de importar el módulo
+            if self._trace_pid != pid:
+                os.makedirs(self.trace_directory, exist_ok=True)
+                self.trace_path = os.path.join(self.trace_directory, f"trace-{socket.gethostname()}-{pid}.jsonl")
+                self._trace_file = open(self.trace_path, "a", buffering=1, encoding="utf-8")
+                self._trace_pid = pid
+            self._trace_file.write(line)
+
+    def render(self) -> str:
+        """Valores actuales en el formato de texto de Prometheus."""
+        with self._lock:
+            items = sorted(self._values.items(), key=lambda item: item[0])
+            lines = []
+            current = None
+            for (name, labels), value in items:
+                kind, description = METRICS[name]
+                if name != current:
+                    lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+                    current = name
+                if kind != "histogram":
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip(value.buckets, value.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {value.count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {value.sum}")
+                lines.append(f"{name}_count{format_labels(labels)} {value.count}")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        with self._lock:
+            if self._trace_file is not None:
+                self._trace_file.close()
+                self._trace_file = None
+                self._trace_pid = None
+
+
+_metrics = None
+
+
+def get_metrics() -> Metrics:
+    """Devuelve el registro de métricas del proceso actual."""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
+
+
+def timed(stage: str):
+    """Decorador que mide cada llamada a la función (síncrona o asíncrona) como un span."""
+    def decorator(function):
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with get_metrics().span(stage):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with get_metrics().span(stage):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = get_metrics().render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port: int = METRICS_PORT, host: str = "0.0.0.0"):
+    """Sirve `/metrics` en un hilo del proceso. Devuelve el servidor, o None si está desactivado o el puerto está ocupado."""
+    if not port:
+        return None
+    try:
+        httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        # Con varios procesos por worker solo el primero obtiene el puerto
+        logging.warning(f"No se pudo iniciar el endpoint de métricas en el puerto {port}: {e}")
+        return None
+    threading.Thread(target=httpd.serve_forever, name="metrics-server", daemon=True).start()
+    logging.info(f"Métricas de Prometheus en http://{host}:{port}/metrics")
+    return httpd
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def summarize_trace(paths: list) -> dict:
+    """
+    Resume una o varias trazas JSONL: por etapa, cantidad, errores, tiempos y
+    bytes/páginas; por tarea, latencia de cola; por cola, la profundidad máxima.
+    """
+    stages, tasks, queues = {}, {}, {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                event = json.loads(line)
+                if event["type"] == "span":
+                    stage = stages.setdefault(event["stage"], {"seconds": [], "errors": 0, "bytes": 0, "pages": 0})
+                    stage["seconds"].append(event["seconds"])
+                    stage["errors"] += not event["ok"]
+                    stage["bytes"] += event.get("bytes", 0)
+                    stage["pages"] += event.get("pages", 0)
+                elif event["type"] == "task":
+                    tasks.setdefault(event["task"], []).append(event["latency"])
+                elif event["type"] == "gauge" and event["name"] == "scraping_queue_depth":
+                    queues[event["queue"]] = max(queues.get(event["queue"], 0), event["value"])
+
+    summary = {"stages": {}, "tasks": {}, "max_queue_depth": queues}
+    for name, stage in stages.items():
+        seconds = stage.pop("seconds")
+        summary["stages"][name] = {
+            "count": len(seconds), "total": sum(seconds), "mean": sum(seconds) / len(seconds),
+            "p50": percentile(seconds, 0.5), "p95": percentile(seconds, 0.95), "max": max(seconds), **stage,
+        }
+    for name, latencies in tasks.items():
+        summary["tasks"][name] = {
+            "count": len(latencies), "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95), "max": max(latencies),
+        }
+    return summary
+
+
+def print_summary(summary: dict):
+    print(f"{'etapa':<20} {'n':>7} {'total s':>9} {'media s':>9} {'p50 s':>8} {'p95 s':>8} {'errores':>8} {'MB':>8} {'páginas':>8}")
+    for name, stage in sorted(summary["stages"].items(), key=lambda item: -item[1]["total"]):
+        print(f"{name:<20} {stage['count']:>7} {stage['total']:9.2f} {stage['mean']:9.3f} {stage['p50']:8.3f} "
+              f"{stage['p95']:8.3f} {stage['errors']:>8} {stage['bytes'] / 1e6:8.1f} {stage['pages']:>8}")
+    for name, task in summary["tasks"].items():
+        print(f"latencia de {name}: n={task['count']} p50={task['p50']:.2f}s p95={task['p95']:.2f}s máx={task['max']:.2f}s")
+    for queue, depth in summary["max_queue_depth"].items():
+        print(f"profundidad máxima de {queue}: {depth}")
+
+
+if __name__ == "__main__":
+    print_summary(summarize_trace(sys.argv[1:]))
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import os
+import re
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+from dotenv import load_dotenv
+from playwright.async_api import Page
+
+from app.helpers.get_content import check_and_click_pagination
+from app.helpers.http_client import get_http_client
+from app.helpers.links import extract_links, extract_links_from_html
+from app.helpers.metrics import get_metrics
+from app.helpers.rate_limiter import get_rate_limiter
+
+load_dotenv()
+
+PAGINATION_CONCURRENCY = int(os.getenv('PAGINATION_CONCURRENCY', 4))
+
+
+def set_query_param(url: str, name: str, value) -> str:
+    parsed = urlparse(url)
+    query = [(key, val) for key, val in parse_qsl(parsed.query, keep_blank_values=True) if key != name]
+    query.append((name, str(value)))
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+
+class PaginationStrategy:
+    """
+    Estrategia para recorrer las páginas de resultados de un sitio.
+
+    `iter_page_links` recibe la página de Playwright ya cargada en la URL de
+    búsqueda y genera, en orden, la lista de URLs absolutas y normalizadas de
+    cada página de resultados.
+    """
+
+    async def iter_page_links(self, page: Page, search_url: str, selector: str):
+        yield await extract_links(page, selector)
+
+
+class ClickNextPagination(PaginationStrategy):
+    """Paginación en serie haciendo clic en el botón "Next" hasta que desaparece."""
+
+    def __init__(self, next_selector: str):
+        self.next_selector = next_selector
+
+    async def iter_page_links(self, page: Page, search_url: str, selector: str):
+        while True:
+            yield await extract_links(page, selector)
+            if not await check_and_click_pagination(page, next_selector=self.next_selector):
+                break
+
+
+class OffsetPagination(PaginationStrategy):
+    """
+    Paginación por parámetro de desplazamiento (p. ej. `start=` en arXiv).
+
+    Lee el total de resultados de la primera página, calcula las URLs de las
+    demás y las descarga en paralelo por HTTP (hasta `concurrency` a la vez),
+    entregando los links en el orden de las páginas. Si no encuentra el total
+    recurre a `fallback` (normalmente el clic en "Next").
+    """
+
+    def __init__(self, offset_param: str, size_param: str, total_pattern: str,
+                 default_page_size: int, fallback: PaginationStrategy = None,
+                 concurrency: int = PAGINATION_CONCURRENCY):
+        self.offset_param = offset_param
+        self.size_param = size_param
+        self.total_pattern = re.compile(total_pattern)
+        self.default_page_size = default_page_size
+        self.fallback = fallback or PaginationStrategy()
+        self.concurrency = concurrency
+
+    def page_size(self, search_url: str) -> int:
+        query = dict(parse_qsl(urlparse(search_url).query))
+        return int(query.get(self.size_param, self.default_page_size))
+
+    def total_results(self, text: str):
+        match = self.total_pattern.search(text)
+        return int(match.group(1).replace(",", "")) if match else None
+
+    def page_urls(self, search_url: str, total: int) -> list:
+        page_size = self.page_size(search_url)
+        return [set_query_param(search_url, self.offset_param, offset) for offset in range(page_size, total, page_size)]
+
+    async def fetch_page_links(self, url: str, selector: str, semaphore: asyncio.Semaphore) -> list:
+        async with semaphore, get_rate_limiter().limit(url) as lease:
+            with get_metrics().span("discover_page", url=url) as span:
+                response = await get_http_client().get(url)
+                span.set(bytes=len(response.content), status=response.status_code)
+            lease.report_status(response.status_code, response.headers.get("retry-after"))
+        get_metrics().inc("scraping_bytes_downloaded_total", len(response.content), mode="discover")
+        response.raise_for_status()
+        return extract_links_from_html(response.text, selector, base_url=str(response.url))
+
+    async def iter_page_links(self, page: Page, search_url: str, selector: str):
+        total = self.total_results(await page.inner_text("body"))
+        if total is None:
+            logging.warning(f"No se encontró el total de resultados en {search_url}; se usa la paginación de respaldo")
+            async for urls in self.fallback.iter_page_links(page, search_url, selector):
+                yield urls
+            return
+
+        yield await extract_links(page, selector)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.create_task(self.fetch_page_links(url, selector, semaphore))
+                 for url in self.page_urls(search_url, total)]
+        try:
+            # Las páginas se descargan en paralelo pero se entregan en orden
+            for task in tasks:
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+# Estrategia de paginación por sitio; los sitios no registrados recorren una sola página
+PAGINATION_STRATEGIES = {
+    "https://arxiv.org/": OffsetPagination(
+        offset_param="start",
+        size_param="size",
+        total_pattern=r"of\s+([\d,]+)\s+results",
+        default_page_size=50,
+        fallback=ClickNextPagination(next_selector="a.pagination-next"),
+    ),
+}
+
+
+def get_pagination_strategy(base_url: str, pagination: bool) -> PaginationStrategy:
+    if not pagination:
+        return PaginationStrategy()
+    return PAGINATION_STRATEGIES.get(base_url, PaginationStrategy())
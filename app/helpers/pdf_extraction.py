@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+from app.helpers.get_content import PDF_MAX_CHARS, PDF_MAX_PAGES, count_pdf_pages, iter_pdf_pages_text
+from app.helpers.metrics import get_metrics
+
+load_dotenv()
+
+PDF_EXTRACTION_WORKERS = int(os.getenv('PDF_EXTRACTION_WORKERS', os.cpu_count() or 1))
+# Los documentos con más páginas que este valor se reparten por rangos entre los procesos
+PDF_SPLIT_PAGES = int(os.getenv('PDF_SPLIT_PAGES', 200))
+
+
+def extract_page_range(source, start_page: int, stop_page: int, max_chars: int) -> str:
+    """Extrae el texto limpio de las páginas [start_page, stop_page). Se ejecuta en el pool de procesos."""
+    return " ".join(iter_pdf_pages_text(source, max_pages=stop_page, max_chars=max_chars, start_page=start_page))
+
+
+def extract_small_document(source, split_pages: int, max_pages: int, max_chars: int):
+    """
+    Extrae el documento completo si no supera `split_pages` páginas.
+
+    Returns:
+    - tuple: (número de páginas, texto o None si el documento debe dividirse por rangos).
+    """
+    page_count = count_pdf_pages(source)
+    if split_pages > 0 and min(page_count, max_pages) > split_pages:
+        return page_count, None
+    return page_count, extract_page_range(source, 0, max_pages, max_chars)
+
+
+class PdfExtractionService:
+    """
+    Extracción de texto de PDFs fuera del event loop.
+
+    Usa un `ProcessPoolExecutor` compartido por todas las tareas del proceso,
+    de modo que PyMuPDF y `clean_text` no bloquean el loop y varios documentos
+    se extraen en paralelo. Los PDFs con más de `split_pages` páginas se
+    dividen en rangos que se extraen en paralelo.
+    """
+
+    def __init__(self,
+                 max_workers: int = PDF_EXTRACTION_WORKERS,
+                 split_pages: int = PDF_SPLIT_PAGES,
+                 max_pages: int = PDF_MAX_PAGES,
+                 max_chars: int = PDF_MAX_CHARS):
+        self.max_workers = max_workers
+        self.split_pages = split_pages
+        self.max_pages = max_pages
+        self.max_chars = max_chars
+        self._executor = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn evita heredar los hilos de Playwright y del event loop del worker
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def page_ranges(self, page_count: int) -> list:
+        """Divide las páginas del documento en rangos de `split_pages` páginas."""
+        page_count = min(page_count, self.max_pages)
+        if self.split_pages <= 0 or page_count <= self.split_pages:
+            return [(0, page_count)]
+        return [(start, min(start + self.split_pages, page_count)) for start in range(0, page_count, self.split_pages)]
+
+    async def extract(self, source) -> dict:
+        """
+        Extrae el texto limpio de un PDF en el pool de procesos.
+
+        Args:
+        - source (str | bytes): Ruta del archivo PDF o su contenido en bytes.
+
+        Returns:
+        - dict: `text` con el texto limpio, `pages` con el número de páginas y `seconds` con el tiempo de extracción.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        start_time = time.perf_counter()
+
+        with get_metrics().span("pdf_extract") as span:
+            # Los documentos normales se extraen con un solo envío al pool
+            page_count, text = await loop.run_in_executor(executor, extract_small_document, source,
+                                                          self.split_pages, self.max_pages, self.max_chars)
+            ranges = self.page_ranges(page_count)
+            if text is None:
+                parts = await asyncio.gather(*(
+                    loop.run_in_executor(executor, extract_page_range, source, start_page, stop_page, self.max_chars)
+                    for start_page, stop_page in ranges
+                ))
+                text = " ".join(part for part in parts if part)[:self.max_chars]
+            span.set(pages=page_count, ranges=len(ranges))
+
+        seconds = time.perf_counter() - start_time
+        logging.info(f"PDF extraído: {page_count} páginas en {len(ranges)} rangos, {seconds:.2f}s")
+        get_metrics().inc("scraping_pages_extracted_total", page_count, kind="pdf")
+        return {"text": text, "pages": page_count, "seconds": seconds}
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+_pdf_extraction_service = None
+
+
+def get_pdf_extraction_service() -> PdfExtractionService:
+    """Devuelve el servicio de extracción del proceso actual."""
+    global _pdf_extraction_service
+    if _pdf_extraction_service is None:
+        _pdf_extraction_service = PdfExtractionService()
+    return _pdf_extraction_service
@@ -0,0 +1,314 @@
+import asyncio
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from app.helpers.metrics import get_metrics
+
+load_dotenv()
+
+RATE_LIMIT_DB_PATH = os.getenv('RATE_LIMIT_DB_PATH', "app/cache/rate_limits.db")
+RATE_LIMIT_INITIAL_RATE = float(os.getenv('RATE_LIMIT_INITIAL_RATE', 2.0))
+RATE_LIMIT_MIN_RATE = float(os.getenv('RATE_LIMIT_MIN_RATE', 0.1))
+RATE_LIMIT_MAX_RATE = float(os.getenv('RATE_LIMIT_MAX_RATE', 20.0))
+RATE_LIMIT_BURST = float(os.getenv('RATE_LIMIT_BURST', 5))
+RATE_LIMIT_INITIAL_CONCURRENCY = float(os.getenv('RATE_LIMIT_INITIAL_CONCURRENCY', 4))
+RATE_LIMIT_MAX_CONCURRENCY = float(os.getenv('RATE_LIMIT_MAX_CONCURRENCY', 32))
+# AIMD: cada éxito suma `increase` peticiones/s; cada bloqueo multiplica por `decrease`
+RATE_LIMIT_INCREASE = float(os.getenv('RATE_LIMIT_INCREASE', 0.05))
+RATE_LIMIT_DECREASE = float(os.getenv('RATE_LIMIT_DECREASE', 0.5))
+
+# Respuestas que indican que el sitio nos está limitando
+THROTTLE_STATUS = {429, 503}
+OUTCOME_SUCCESS = "success"
+OUTCOME_THROTTLED = "throttled"
+OUTCOME_ERROR = "error"
+
+# Un permiso no liberado (p. ej. si el proceso muere) deja de contar pasado este tiempo
+LEASE_TTL = 300
+# Espera entre reintentos cuando el límite es de concurrencia y no de tasa
+CONCURRENCY_POLL_INTERVAL = 0.2
+MAX_RETRY_AFTER = 600
+
+
+def parse_retry_after(value) -> float:
+    """Segundos indicados por la cabecera Retry-After (número o fecha HTTP)."""
+    if not value:
+        return 0.0
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return 0.0
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+def domain_of(url: str) -> str:
+    host = urlsplit(url).hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+class RateLimitLease:
+    """Permiso para una petición; quien lo usa informa si el sitio respondió con un bloqueo."""
+
+    def __init__(self, domain: str, lease_id: str):
+        self.domain = domain
+        self.lease_id = lease_id
+        self.outcome = None
+        self.retry_after = 0.0
+
+    def report_status(self, status_code: int, retry_after=None):
+        if status_code in THROTTLE_STATUS:
+            self.report_throttled(retry_after)
+        elif self.outcome is None:
+            self.outcome = OUTCOME_SUCCESS
+
+    def report_throttled(self, retry_after=None):
+        """Respuesta 429/503 o CAPTCHA detectado."""
+        self.outcome = OUTCOME_THROTTLED
+        self.retry_after = max(self.retry_after, parse_retry_after(retry_after))
+
+
+class DomainRateLimiter:
+    """
+    Token bucket por dominio compartido entre procesos mediante SQLite (modo WAL).
+
+    Cada dominio tiene una tasa (tokens por segundo), una ráfaga máxima y un
+    límite de peticiones simultáneas. Ambos se ajustan con AIMD: crecen de a
+    poco con cada éxito y se reducen a la mitad ante un 429/503 o un CAPTCHA,
+    que además vacía el bucket y respeta el Retry-After.
+    Todos los workers que usan el mismo archivo comparten los límites.
+
+    La conexión se comparte entre los hilos del proceso (p. ej. el loop de
+    Prefect y el del AsyncRunner de Celery) y cada transacción se serializa
+    con un lock.
+    """
+
+    def __init__(self, db_path: str = RATE_LIMIT_DB_PATH,
+                 initial_rate: float = RATE_LIMIT_INITIAL_RATE, min_rate: float = RATE_LIMIT_MIN_RATE,
+                 max_rate: float = RATE_LIMIT_MAX_RATE, burst: float = RATE_LIMIT_BURST,
+                 initial_concurrency: float = RATE_LIMIT_INITIAL_CONCURRENCY,
+                 max_concurrency: float = RATE_LIMIT_MAX_CONCURRENCY,
+                 increase: float = RATE_LIMIT_INCREASE, decrease: float = RATE_LIMIT_DECREASE):
+        self.db_path = db_path
+        self.initial_rate = initial_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        self.initial_concurrency = initial_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self._connection = None
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            # Sin transacciones implícitas: cada operación abre su BEGIN IMMEDIATE
+            self._connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS domain_limits (
+                    domain TEXT PRIMARY KEY,
+                    rate REAL NOT NULL,
+                    tokens REAL NOT NULL,
+                    concurrency REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    blocked_until REAL NOT NULL DEFAULT 0,
+                    successes INTEGER NOT NULL DEFAULT 0,
+                    throttles INTEGER NOT NULL DEFAULT 0,
+                    errors INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS domain_leases (
+                    lease_id TEXT PRIMARY KEY,
+                    domain TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS domain_leases_domain ON domain_leases (domain, expires_at);
+            """)
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            connection = self.connection
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+
+    def _export_metrics(self, domain: str, rate: float, concurrency: float, in_flight: int):
+        # Gauges de /metrics (METRICS_PORT) con el estado compartido del dominio tras cada cambio
+        metrics = get_metrics()
+        metrics.set_gauge("scraping_domain_rate", rate, domain=domain)
+        metrics.set_gauge("scraping_domain_concurrency", concurrency, domain=domain)
+        metrics.set_gauge("scraping_domain_in_flight", in_flight, domain=domain)
+
+    def _load(self, connection, domain: str, now: float) -> dict:
+        row = connection.execute(
+            "SELECT rate, tokens, concurrency, updated_at, blocked_until FROM domain_limits WHERE domain = ?", (domain,)
+        ).fetchone()
+        if row is None:
+            connection.execute(
+                "INSERT INTO domain_limits (domain, rate, tokens, concurrency, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (domain, self.initial_rate, self.burst, self.initial_concurrency, now),
+            )
+            row = (self.initial_rate, self.burst, self.initial_concurrency, now, 0.0)
+        rate, tokens, concurrency, updated_at, blocked_until = row
+        # Recargar el bucket con el tiempo transcurrido
+        tokens = min(self.burst, tokens + max(0.0, now - updated_at) * rate)
+        return {"rate": rate, "tokens": tokens, "concurrency": concurrency, "blocked_until": blocked_until}
+
+    def try_acquire(self, domain: str):
+        """
+        Intenta tomar un token y un lugar de concurrencia para el dominio.
+
+        Returns:
+        - tuple: (id del permiso o None, segundos a esperar antes de reintentar).
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            state = self._load(connection, domain, now)
+            connection.execute("DELETE FROM domain_leases WHERE domain = ? AND expires_at <= ?", (domain, now))
+            in_flight = connection.execute("SELECT COUNT(*) FROM domain_leases WHERE domain = ?", (domain,)).fetchone()[0]
+
+            lease_id = None
+            if state["blocked_until"] > now:
+                wait = state["blocked_until"] - now
+            elif in_flight >= max(1, math.floor(state["concurrency"])):
+                wait = CONCURRENCY_POLL_INTERVAL
+            elif state["tokens"] < 1:
+                wait = (1 - state["tokens"]) / state["rate"]
+            else:
+                wait = 0.0
+                state["tokens"] -= 1
+                lease_id = uuid.uuid4().hex
+                connection.execute("INSERT INTO domain_leases (lease_id, domain, expires_at) VALUES (?, ?, ?)",
+                                   (lease_id, domain, now + LEASE_TTL))
+
+            connection.execute("UPDATE domain_limits SET tokens = ?, updated_at = ? WHERE domain = ?",
+                               (state["tokens"], now, domain))
+        self._export_metrics(domain, state["rate"], state["concurrency"], in_flight + (lease_id is not None))
+        return lease_id, wait
+
+    async def acquire(self, domain: str) -> str:
+        while True:
+            # BEGIN IMMEDIATE puede esperar el lock de otro proceso hasta `timeout`: fuera del event loop
+            lease_id, wait = await asyncio.to_thread(self.try_acquire, domain)
+            if lease_id is not None:
+                return lease_id
+            await asyncio.sleep(wait)
+
+    def release(self, domain: str, lease_id: str, outcome: str = OUTCOME_SUCCESS, retry_after: float = 0.0):
+        """Libera el permiso y ajusta tasa y concurrencia del dominio según el resultado (AIMD)."""
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute("DELETE FROM domain_leases WHERE lease_id = ?", (lease_id,))
+            state = self._load(connection, domain, now)
+            rate, concurrency, tokens, blocked_until = state["rate"], state["concurrency"], state["tokens"], state["blocked_until"]
+
+            if outcome == OUTCOME_SUCCESS:
+                rate = min(self.max_rate, rate + self.increase)
+                # Como en TCP: +1 de concurrencia por cada "ventana" completa de éxitos
+                concurrency = min(self.max_concurrency, concurrency + 1 / concurrency)
+                counter = "successes"
+            elif outcome == OUTCOME_THROTTLED:
+                rate = max(self.min_rate, rate * self.decrease)
+                concurrency = max(1.0, concurrency * self.decrease)
+                tokens = min(tokens, 0.0)
+                blocked_until = max(blocked_until, now + retry_after)
+                counter = "throttles"
+            else:
+                counter = "errors"
+
+            connection.execute(
+                f"UPDATE domain_limits SET rate = ?, concurrency = ?, tokens = ?, blocked_until = ?, updated_at = ?, "
+                f"{counter} = {counter} + 1 WHERE domain = ?",
+                (rate, concurrency, tokens, blocked_until, now, domain),
+            )
+            in_flight = connection.execute(
+                "SELECT COUNT(*) FROM domain_leases WHERE domain = ? AND expires_at > ?", (domain, now)
+            ).fetchone()[0]
+        self._export_metrics(domain, rate, concurrency, in_flight)
+
+        if outcome == OUTCOME_THROTTLED:
+            logging.warning(f"Límite de {domain} reducido a {rate:.2f} req/s y concurrencia {concurrency:.1f}"
+                            + (f" (Retry-After {retry_after:.0f}s)" if retry_after else ""))
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        """
+        Espera un permiso para el dominio de la URL y lo libera al terminar.
+
+        Si el bloque lanza una excepción sin haber informado un bloqueo, el
+        resultado cuenta como error y no modifica los límites.
+        """
+        domain = domain_of(url)
+        lease = RateLimitLease(domain, await self.acquire(domain))
+        try:
+            yield lease
+        except BaseException:
+            if lease.outcome != OUTCOME_THROTTLED:
+                lease.outcome = OUTCOME_ERROR
+            raise
+        finally:
+            await asyncio.to_thread(self.release, domain, lease.lease_id, lease.outcome or OUTCOME_SUCCESS, lease.retry_after)
+
+    def metrics(self) -> dict:
+        """Tasa, concurrencia y contadores actuales por dominio."""
+        now = time.time()
+        with self._lock:
+            rows = self.connection.execute("""
+                SELECT l.domain, l.rate, l.tokens, l.concurrency, l.updated_at, l.blocked_until,
+                       l.successes, l.throttles, l.errors,
+                       (SELECT COUNT(*) FROM domain_leases d WHERE d.domain = l.domain AND d.expires_at > ?)
+                FROM domain_limits l
+            """, (now,)).fetchall()
+        return {
+            domain: {
+                "rate": rate,
+                "tokens": min(self.burst, tokens + max(0.0, now - updated_at) * rate),
+                "concurrency": concurrency,
+                "in_flight": in_flight,
+                "blocked_for": max(0.0, blocked_until - now),
+                "successes": successes,
+                "throttles": throttles,
+                "errors": errors,
+            }
+            for domain, rate, tokens, concurrency, updated_at, blocked_until, successes, throttles, errors, in_flight in rows
+        }
+
+
+_rate_limiter = None
+
+
+def get_rate_limiter() -> DomainRateLimiter:
+    """Devuelve el limitador del proceso actual (los límites se comparten por el archivo SQLite)."""
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = DomainRateLimiter()
+    return _rate_limiter
@@ -0,0 +1,282 @@
+"""
+Planificador de re-scraping según la frecuencia de cambio de cada URL.
+
+Por cada URL ya scrapeada se guarda `change_score`, una media móvil
+exponencial (EWMA) de los deltas observados, y la próxima fecha en que toca
+revisarla:
+
+- Un documento que cambia mucho (score alto) se revisa cada
+  RECRAWL_MIN_INTERVAL; uno que nunca cambia se aleja hasta
+  RECRAWL_MAX_INTERVAL. Entre ambos el intervalo es geométrico.
+- Tras una revisión sin cambios el intervalo crece como mucho
+  RECRAWL_BACKOFF veces; un cambio lo acorta de inmediato.
+
+`take_due` elige las URLs vencidas más urgentes (score alto y más atrasadas)
+sin superar RECRAWL_PAGES_PER_HOUR, un presupuesto global compartido por
+todos los procesos que usan el mismo archivo SQLite, y les asigna la
+prioridad AMQP con la que se publican en la cola del subsite.
+"""
+import json
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+from app.helpers.scrape_results import SCRAPE_CHANGE_THRESHOLD, STATUS_ERROR, STATUS_SAVED
+from app.helpers.url_publisher import URL_QUEUE_MAX_PRIORITY
+
+load_dotenv()
+
+RECRAWL_DB_PATH = os.getenv('RECRAWL_DB_PATH', "app/cache/recrawl_schedule.db")
+RECRAWL_MIN_INTERVAL = float(os.getenv('RECRAWL_MIN_INTERVAL', 6 * 3600))
+RECRAWL_MAX_INTERVAL = float(os.getenv('RECRAWL_MAX_INTERVAL', 30 * 24 * 3600))
+# Intervalo tras la primera descarga, cuando todavía no hay historial
+RECRAWL_INITIAL_INTERVAL = float(os.getenv('RECRAWL_INITIAL_INTERVAL', 24 * 3600))
+RECRAWL_BACKOFF = float(os.getenv('RECRAWL_BACKOFF', 2.0))
+# Peso de la última observación en el EWMA de los deltas
+RECRAWL_EWMA_ALPHA = float(os.getenv('RECRAWL_EWMA_ALPHA', 0.3))
+# Score a partir del cual la URL se revisa con el intervalo mínimo
+RECRAWL_HOT_SCORE = float(os.getenv('RECRAWL_HOT_SCORE', 0.2))
+RECRAWL_PAGES_PER_HOUR = int(os.getenv('RECRAWL_PAGES_PER_HOUR', 1000))
+
+BUDGET_WINDOW = 3600
+# Las URLs nuevas del descubrimiento usan la prioridad máxima; las revisiones, las inferiores
+NEW_URL_PRIORITY = URL_QUEUE_MAX_PRIORITY
+RECRAWL_MAX_PRIORITY = URL_QUEUE_MAX_PRIORITY - 1
+
+
+def recrawl_interval(change_score: float) -> float:
+    """Intervalo objetivo: RECRAWL_MAX_INTERVAL con score 0, RECRAWL_MIN_INTERVAL desde RECRAWL_HOT_SCORE."""
+    heat = min(change_score / RECRAWL_HOT_SCORE, 1.0)
+    return RECRAWL_MAX_INTERVAL * (RECRAWL_MIN_INTERVAL / RECRAWL_MAX_INTERVAL) ** heat
+
+
+def recrawl_priority(urgency: float) -> int:
+    """Prioridad AMQP a partir de la urgencia de `take_due` (0 a 2)."""
+    return min(RECRAWL_MAX_PRIORITY, math.floor(RECRAWL_MAX_PRIORITY * urgency / 2 + 0.5))
+
+
+class RecrawlScheduler:
+    """
+    Próxima revisión de cada URL (SQLite en modo WAL), con la misma clave
+    (site, subsite_key, subsite_value, url) que el registro de `TreeScraped`.
+
+    Los despachadores del flujo registran con `observe` cada resultado que
+    reciben de Celery; el flujo de re-scraping toma las URLs vencidas con
+    `take_due`. Ambos corren del lado de Prefect, sobre el mismo archivo.
+    """
+
+    def __init__(self, db_path: str = RECRAWL_DB_PATH, pages_per_hour: int = RECRAWL_PAGES_PER_HOUR):
+        self.db_path = db_path
+        self.pages_per_hour = pages_per_hour
+        self._connection = None
+        # La usan a la vez los despachadores que corren en hilos del flujo
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            # Sin transacciones implícitas: cada operación abre su BEGIN IMMEDIATE
+            self._connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS recrawl_schedule (
+                    site TEXT NOT NULL,
+                    subsite_key TEXT NOT NULL,
+                    subsite_value TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    extract TEXT NOT NULL,
+                    change_score REAL NOT NULL DEFAULT 0,
+                    interval REAL NOT NULL,
+                    next_due_at REAL NOT NULL,
+                    last_checked_at REAL,
+                    last_delta REAL,
+                    content_hash TEXT,
+                    checks INTEGER NOT NULL DEFAULT 0,
+                    changes INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (site, subsite_key, subsite_value, url)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS recrawl_schedule_due ON recrawl_schedule (next_due_at);
+                CREATE TABLE IF NOT EXISTS recrawl_budget (
+                    enqueued_at REAL NOT NULL,
+                    pages INTEGER NOT NULL
+                );
+            """)
+        return self._connection
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _transaction(self):
+        connection = self.connection
+        connection.execute("BEGIN IMMEDIATE")
+        return connection
+
+    def seed(self, site, subsite_key, subsite_value, extract: str, urls) -> int:
+        """
+        Agrega las URLs que todavía no tienen planificación, repartiendo su
+        primera revisión al azar dentro de RECRAWL_INITIAL_INTERVAL para no
+        revisarlas todas a la vez. Devuelve cuántas eran nuevas.
+        """
+        now = time.time()
+        rows = ((site, subsite_key or "", subsite_value or "", url, extract, RECRAWL_INITIAL_INTERVAL,
+                 now + random.random() * RECRAWL_INITIAL_INTERVAL) for url in urls)
+        with self._lock:
+            connection = self._transaction()
+            try:
+                cursor = connection.executemany(
+                    "INSERT OR IGNORE INTO recrawl_schedule (site, subsite_key, subsite_value, url, extract, interval, next_due_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", rows,
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def observe(self, site, subsite_key, subsite_value, extract: str, result: dict) -> float:
+        """
+        Actualiza el score y la próxima revisión de la URL con el resultado de
+        `app.helpers.scrape_results`. Devuelve la próxima fecha (epoch).
+        """
+        now = time.time()
+        key = (site, subsite_key or "", subsite_value or "", result["url"])
+        with self._lock:
+            connection = self._transaction()
+            try:
+                row = connection.execute(
+                    "SELECT change_score, interval, content_hash, checks, changes FROM recrawl_schedule"
+                    " WHERE site = ? AND subsite_key = ? AND subsite_value = ? AND url = ?", key,
+                ).fetchone()
+                change_score, interval, content_hash, checks, changes = row or (0.0, RECRAWL_INITIAL_INTERVAL, None, 0, 0)
+
+                delta, retry_in = None, None
+                if result["status"] == STATUS_ERROR:
+                    # Reintentar pronto sin tocar el historial de cambios ni el intervalo
+                    retry_in = RECRAWL_MIN_INTERVAL
+                elif checks == 0:
+                    # Primera descarga: el delta es respecto a nada y no dice cuánto cambia el documento
+                    interval = RECRAWL_INITIAL_INTERVAL
+                else:
+                    if result["status"] == STATUS_SAVED:
+                        # Las páginas HTML no tienen delta: se compara el hash del texto
+                        delta = float(result["content_hash"] != content_hash)
+                    else:
+                        delta = result["delta"] or 0.0
+                    change_score = RECRAWL_EWMA_ALPHA * delta + (1 - RECRAWL_EWMA_ALPHA) * change_score
+                    target = recrawl_interval(change_score)
+                    interval = target if target <= interval else min(target, interval * RECRAWL_BACKOFF)
+
+                checked = result["status"] != STATUS_ERROR
+                changed = delta is not None and delta > SCRAPE_CHANGE_THRESHOLD
+                next_due_at = now + (retry_in or interval)
+                connection.execute(
+                    "INSERT INTO recrawl_schedule (site, subsite_key, subsite_value, url, extract, change_score, interval,"
+                    " next_due_at, last_checked_at, last_delta, content_hash, checks, changes)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (site, subsite_key, subsite_value, url) DO UPDATE SET"
+                    " change_score = excluded.change_score, interval = excluded.interval, next_due_at = excluded.next_due_at,"
+                    " last_checked_at = excluded.last_checked_at, last_delta = excluded.last_delta,"
+                    " content_hash = excluded.content_hash, checks = excluded.checks, changes = excluded.changes",
+                    (*key, extract, change_score, interval, next_due_at, now, delta,
+                     result["content_hash"] or content_hash, checks + checked, changes + changed),
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return next_due_at
+
+    def remaining_budget(self, connection, now: float) -> int:
+        connection.execute("DELETE FROM recrawl_budget WHERE enqueued_at <= ?", (now - BUDGET_WINDOW,))
+        used = connection.execute("SELECT COALESCE(SUM(pages), 0) FROM recrawl_budget").fetchone()[0]
+        return max(self.pages_per_hour - used, 0)
+
+    def take_due(self, limit: int = None) -> list:
+        """
+        Toma las URLs vencidas más urgentes que entran en el presupuesto de la
+        última hora y las marca como en curso hasta RECRAWL_MIN_INTERVAL (si
+        la tarea se pierde, vuelven a vencer).
+
+        La urgencia suma el calor del score (0 a 1) y el atraso relativo a su
+        intervalo (0 a 1).
+
+        Returns:
+        - list: dicts con site, subsite_key, subsite_value, url, extract y priority.
+        """
+        now = time.time()
+        with self._lock:
+            connection = self._transaction()
+            try:
+                budget = self.remaining_budget(connection, now)
+                if limit is not None:
+                    budget = min(budget, limit)
+                rows = connection.execute(
+                    "SELECT site, subsite_key, subsite_value, url, extract,"
+                    " MIN(change_score / ?, 1.0) + MIN((? - next_due_at) / interval, 1.0) AS urgency"
+                    " FROM recrawl_schedule WHERE next_due_at <= ? ORDER BY urgency DESC LIMIT ?",
+                    (RECRAWL_HOT_SCORE, now, now, budget),
+                ).fetchall()
+                connection.executemany(
+                    "UPDATE recrawl_schedule SET next_due_at = ?"
+                    " WHERE site = ? AND subsite_key = ? AND subsite_value = ? AND url = ?",
+                    ((now + RECRAWL_MIN_INTERVAL, *row[:4]) for row in rows),
+                )
+                if rows:
+                    connection.execute("INSERT INTO recrawl_budget (enqueued_at, pages) VALUES (?, ?)", (now, len(rows)))
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return [
+            {"site": site, "subsite_key": subsite_key, "subsite_value": subsite_value, "url": url,
+             "extract": extract, "priority": recrawl_priority(urgency)}
+            for site, subsite_key, subsite_value, url, extract, urgency in rows
+        ]
+
+    def metrics(self) -> dict:
+        now = time.time()
+        with self._lock:
+            total, due, mean_interval, changes, checks = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(next_due_at <= ?), 0), AVG(interval), COALESCE(SUM(changes), 0),"
+                " COALESCE(SUM(checks), 0) FROM recrawl_schedule", (now,),
+            ).fetchone()
+            connection = self._transaction()
+            try:
+                budget = self.remaining_budget(connection, now)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return {"urls": total, "due": due, "mean_interval_hours": (mean_interval or 0) / 3600,
+                "checks": checks, "changes": changes, "remaining_budget": budget}
+
+
+_recrawl_scheduler = None
+
+
+def get_recrawl_scheduler() -> RecrawlScheduler:
+    """Devuelve el planificador del proceso actual (la planificación se comparte por el archivo SQLite)."""
+    global _recrawl_scheduler
+    if _recrawl_scheduler is None:
+        _recrawl_scheduler = RecrawlScheduler()
+    return _recrawl_scheduler
+
+
+def close_recrawl_scheduler():
+    if _recrawl_scheduler is not None:
+        _recrawl_scheduler.close()
+
+
+if __name__ == "__main__":
+    print(json.dumps(get_recrawl_scheduler().metrics(), indent=2))
@@ -1,145 +1,284 @@
-from playwright.sync_api import sync_playwright
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
-from app.captcha.captcha_solver import solve_captcha
-from app.helpers.get_content import download_pdf_via_requests, save_scraped_content, create_directory_structure
-from app.helpers.get_delta import GetDelta
+import asyncio
+import time
+from collections import Counter
+from playwright.async_api import Error as PlaywrightError
+from app.captcha.captcha_solver import captcha_present, get_captcha_solver, solve_captcha
+from app.helpers.browser_pool import get_browser_pool, DEFAULT_USER_AGENT
+from app.helpers.crawler import SiteCrawler, default_output_path
+from app.helpers.get_content import PdfBuffer, PDF_CHUNK_SIZE, save_scraped_content, create_directory_structure
+from app.helpers.delta_engine import text_hash
+from app.helpers.get_delta import GetDelta, DELTA_STRATEGY
+from app.helpers.http_client import get_http_client
+from app.helpers.load_profiles import get_load_profile
+from app.helpers.metrics import get_metrics
+from app.helpers.pdf_extraction import get_pdf_extraction_service
+from app.helpers.rate_limiter import get_rate_limiter
+from app.helpers.scrape_results import (STATUS_CHANGED, STATUS_ERROR, STATUS_NOT_MODIFIED, STATUS_SAVED,
+                                        STATUS_UNCHANGED, scrape_result)
+from app.helpers.snapshot_store import SnapshotStore
+from app.helpers.text_extraction import get_text_extractor
+from app.helpers.url_metadata import UrlMetadataStore
 
 import logging
 
 
-async def run_playwright_scraper(base_url: str):
-    pages_to_scrape = ["/"]
-    visited_pages = set()
-    scraped_content = {}
+async def run_playwright_scraper(base_url: str, output_path: str = None, **crawler_options) -> dict:
+    """
+    Recorre el sitio desde `base_url` y escribe el texto de cada página en un archivo JSONL.
 
-    with sync_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+    Args:
+    - base_url (str): URL inicial del sitio.
+    - output_path (str): Archivo de salida; por defecto uno nuevo en CRAWL_OUTPUT_DIR.
+    - **crawler_options: concurrency, max_pages, max_depth, politeness_delay (ver `SiteCrawler`).
 
-        while pages_to_scrape:
-            current_page = pages_to_scrape.pop(0)
-            if current_page in visited_pages:
-                continue
-            
-            url = base_url + current_page
-            page.goto(url)
-            html_content = page.content()
+    Returns:
+    - dict: Páginas escritas, errores, archivo de salida y tiempo total.
+    """
+    crawler = SiteCrawler(base_url, output_path or default_output_path(base_url), **crawler_options)
+    return await crawler.run()
 
-            # Extract just visible text
-            soup = BeautifulSoup(html_content, 'html.parser')
-            text_content = soup.get_text(separator="\n", strip=True)
-            scraped_content[url] = text_content
-            visited_pages.add(current_page)
 
-            # Find all internal links to add to pages_to_scrape
-            links = page.query_selector_all("a[href^='/']")
-            for link in links:
-                href = link.get_attribute("href")
-                if href and href not in visited_pages:
-                    pages_to_scrape.append(href)
+async def scrape_page_async(url) -> dict:
+    """
+    Carga la página, extrae su texto y lo guarda en los shards del sitio.
 
-        browser.close()
-    return scraped_content
-
-
-async def scrape_page_async(url):
+    Returns:
+    - dict: Resultado de `scrape_result` con estado "saved" o "error".
+    """
     try:
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
-
-            # Esperar a que se cargue completamente la página
-            await page.goto(url, wait_until='networkidle')
-
-            # Esperar a que se cargue el cuerpo de la página
-            await page.wait_for_selector("body")
-
-            # Scroll para cargar contenido dinámico
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-            await page.wait_for_timeout(2000)  # Espera adicional después del scroll
-
-            # Obtener el contenido HTML y texto visible
-            html_content = await page.content()
-            soup = BeautifulSoup(html_content, 'html.parser')
-            text_content = soup.get_text(separator="\n", strip=True)
+        # Respetar el límite de peticiones del dominio, compartido por todos los workers
+        async with get_rate_limiter().limit(url) as lease, get_browser_pool().page() as page:
+            # Cargar la página con el perfil del sitio (bloqueo de recursos, esperas y scroll)
+            with get_metrics().span("page_load", url=url) as load_span:
+                load = await get_load_profile(url).load(page, url)
+                load_span.set(bytes=load["bytes"], status=load["status"])
+            lease.report_status(load["status"])
+            get_metrics().inc("scraping_bytes_downloaded_total", load["bytes"], mode="page")
 
-            await browser.close()
+            # Obtener el texto visible con el extractor configurado (TEXT_EXTRACTOR)
+            with get_metrics().span("text_extract", url=url, pages=1) as extract_span:
+                text_content = await get_text_extractor().extract_page(page)
+            get_metrics().inc("scraping_pages_extracted_total", kind="html")
+        timings = {"page_load": load_span.seconds, "text_extract": extract_span.seconds}
 
         # Guardar el contenido extraído
         try:
             save_scraped_content(url, text_content)
         except Exception as e:
             logging.error(f"Error saving content for {url}: {e}")
-            return False
+            return scrape_result(url, STATUS_ERROR, bytes=load["bytes"], timings=timings, error=str(e))
 
-        return True  # Scraping successful
+        return scrape_result(url, STATUS_SAVED, bytes=load["bytes"], content_hash=text_hash(text_content),
+                             fetch_mode=FETCH_MODE_BROWSER, timings=timings)
 
     except Exception as e:
         logging.error(f"An error occurred while scraping {url}: {e}")
-        return False
+        return scrape_result(url, STATUS_ERROR, error=str(e))
     
 
-async def scrape_pdf_async(pdf_url: str, base_url: str, subsites: str) -> float:
-    getdelta = GetDelta()
-    
-    subsite = list(subsites.values())[0]
-    # Crear la estructura de directorios
-    directory = create_directory_structure(base_url, subsite=subsite)
-    
-    # Limpiar la URL para usarla como nombre de archivo
-    filename = f"{directory}/{getdelta.sanitize_filename(pdf_url)}"
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=False, args=[
-            "--disable-blink-features=AutomationControlled",
-            "--no-sandbox",
-            "--disable-gpu",
-            "--disable-dev-shm-usage",
-            "--disable-web-security",
-            "--disable-features=IsolateOrigins,site-per-process",
-            "--start-maximized"
-        ])
-        context = await browser.new_context(user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36")
-        page = await context.new_page()
+# Modo con el que se obtuvo cada PDF: "http" (camino rápido), "not_modified" (304) o "browser" (Playwright)
+FETCH_MODE_HTTP = "http"
+FETCH_MODE_NOT_MODIFIED = "not_modified"
+FETCH_MODE_BROWSER = "browser"
+fetch_mode_stats = Counter()
+
+# Respuestas que indican bloqueo o límite de tasa y requieren el navegador
+BROWSER_FALLBACK_STATUS = {403, 429}
+
+
+def needs_browser(status_code: int, content_type: str, head: bytes) -> bool:
+    """
+    Decide si la respuesta HTTP obliga a usar Playwright.
+
+    Args:
+    - status_code (int): Código HTTP de la respuesta.
+    - content_type (str): Cabecera Content-Type.
+    - head (bytes): Primeros bytes del cuerpo.
+
+    Returns:
+    - bool: True si la respuesta es HTML (p. ej. un CAPTCHA), 403/429 o no es un PDF.
+    """
+    if status_code in BROWSER_FALLBACK_STATUS:
+        return True
+    if "html" in content_type.lower():
+        return True
+    return not head.lstrip().startswith(b"%PDF")
+
+
+def get_validators(headers) -> dict:
+    """Extrae ETag y Last-Modified de las cabeceras de una respuesta."""
+    return {"etag": headers.get("etag"), "last_modified": headers.get("last-modified")}
+
+
+async def read_pdf_stream(response) -> PdfBuffer:
+    """Lee la respuesta en streaming a un PdfBuffer, rechazando por tamaño antes y durante la descarga."""
+    buffer = PdfBuffer()
+    buffer.check_length(response.headers.get("content-length"))
+    try:
+        async for chunk in response.aiter_bytes(PDF_CHUNK_SIZE):
+            buffer.write(chunk)
+    except Exception:
+        buffer.close()
+        raise
+    return buffer
+
+
+async def fetch_pdf_http(pdf_url: str, headers: dict = None):
+    """
+    Descarga el PDF en streaming con el cliente HTTP compartido.
 
+    Returns:
+    - tuple | None: (PdfBuffer, o None si respondió 304, y validadores), o None si hace falta el navegador.
+    """
+    # Reutilizar la sesión de un CAPTCHA ya resuelto del dominio
+    cookie = get_captcha_solver().cookie_header(pdf_url)
+    if cookie:
+        headers = {**(headers or {}), "Cookie": cookie}
+
+    async with get_rate_limiter().limit(pdf_url) as lease, \
+            get_http_client().stream("GET", pdf_url, headers=headers) as response:
+        lease.report_status(response.status_code, response.headers.get("retry-after"))
+        validators = get_validators(response.headers)
+        if response.status_code == 304:
+            return None, validators
+        if needs_browser(response.status_code, response.headers.get("content-type", ""), b"%PDF"):
+            # Un 403 o una página HTML en lugar del PDF (p. ej. un CAPTCHA) es un bloqueo: reducir la tasa del dominio
+            lease.report_throttled(response.headers.get("retry-after"))
+            return None
+        response.raise_for_status()
+        buffer = await read_pdf_stream(response)
+
+        if needs_browser(response.status_code, "", buffer.head):
+            lease.report_throttled()
+            buffer.close()
+            return None
+    return buffer, validators
+
+
+async def fetch_pdf_browser(pdf_url: str):
+    """Descarga el PDF con Playwright, resolviendo el CAPTCHA si aparece. Devuelve (PdfBuffer, validadores)."""
+    async with get_rate_limiter().limit(pdf_url) as lease, get_browser_pool().page(user_agent=DEFAULT_USER_AGENT) as page:
+        await get_captcha_solver().apply_session(page.context, pdf_url)
         try:
             # Intentar navegar a la página del PDF
             response = await page.goto(pdf_url, wait_until='networkidle', timeout=60000)
-
-            if response is None or response.status != 200:
-                logging.error(f"Error al navegar a {pdf_url}: Status {response.status if response else 'None'}")
-                return 0.0
-            
+            if response is not None:
+                lease.report_status(response.status, response.headers.get("retry-after"))
+        except PlaywrightError as e:
+            # En modo headless Chromium descarga el PDF en lugar de mostrarlo
+            if "Download is starting" not in str(e):
+                raise
+        else:
             # Comprobar si aparece un CAPTCHA
-            captcha_present = await page.evaluate('''() => {
-                return !!document.querySelector('.g-recaptcha');
-            }''')
-
-            if captcha_present:
+            if await captcha_present(page):
+                # Un CAPTCHA indica que el sitio nos está limitando: reducir la tasa del dominio
+                lease.report_throttled()
                 logging.info("CAPTCHA detectado, intentando resolverlo...")
                 await solve_captcha(page)
                 logging.info("CAPTCHA resuelto, continuando con el scraping...")
+            elif response is None or response.status != 200:
+                raise Exception(f"Error al navegar a {pdf_url}: Status {response.status if response else 'None'}")
 
-            text = download_pdf_via_requests(pdf_url=pdf_url)
+        # Descargar el PDF en streaming con las cookies del contexto (incluida la sesión del CAPTCHA);
+        # la API de peticiones de Playwright solo entrega el cuerpo completo en memoria
+        cookies = await page.context.cookies(pdf_url)
+        headers = {"Cookie": "; ".join(f"{cookie['name']}={cookie['value']}" for cookie in cookies)} if cookies else None
+        async with get_http_client().stream("GET", pdf_url, headers=headers) as pdf_response:
+            if pdf_response.status_code != 200:
+                raise Exception(f"No se pudo descargar el PDF {pdf_url}: Status {pdf_response.status_code}")
+            return await read_pdf_stream(pdf_response), get_validators(pdf_response.headers)
 
-        except Exception as e:
-            logging.error(f"Error al intentar scrapeo: {e}")
-            return 0.0  # En caso de error, no se detecta cambio
-        finally:
-            await browser.close()
-
-    # Guardar el texto del PDF en un archivo
-    getdelta.save_pdf_text_to_file(text, filename)
-    logging.info(f"Text file saved succesfully: {filename}")
+
+async def fetch_pdf(pdf_url: str, headers: dict = None):
+    """
+    Obtiene el PDF por HTTP y usa el navegador solo como respaldo.
+
+    Args:
+    - pdf_url (str): URL del PDF.
+    - headers (dict): Cabeceras condicionales (If-None-Match / If-Modified-Since).
+
+    Returns:
+    - tuple: (PdfBuffer con el PDF o None si no cambió, modo utilizado, validadores ETag/Last-Modified).
+    """
+    metrics = get_metrics()
+    with metrics.span("download_http", url=pdf_url) as span:
+        result = await fetch_pdf_http(pdf_url, headers=headers)
+        if result is not None and result[0] is not None:
+            span.set(bytes=result[0].size)
+    if result is None:
+        with metrics.span("download_browser", url=pdf_url) as span:
+            pdf_buffer, validators = await fetch_pdf_browser(pdf_url)
+            span.set(bytes=pdf_buffer.size)
+        fetch_mode = FETCH_MODE_BROWSER
+    else:
+        pdf_buffer, validators = result
+        fetch_mode = FETCH_MODE_HTTP if pdf_buffer is not None else FETCH_MODE_NOT_MODIFIED
+    if pdf_buffer is not None:
+        metrics.inc("scraping_bytes_downloaded_total", pdf_buffer.size, mode=fetch_mode)
+
+    fetch_mode_stats[fetch_mode] += 1
+    hit_rate = 1 - fetch_mode_stats[FETCH_MODE_BROWSER] / sum(fetch_mode_stats.values())
+    logging.info(f"PDF fetch mode={fetch_mode} url={pdf_url} (fast path hit rate {hit_rate:.0%})")
+    return pdf_buffer, fetch_mode, validators
+
+
+async def scrape_pdf_async(pdf_url: str, base_url: str, subsites: str) -> dict:
+    """
+    Descarga el PDF, extrae su texto y guarda una revisión nueva si cambió.
+
+    Returns:
+    - dict: Resultado de `scrape_result`: estado, delta respecto a la revisión
+      anterior, bytes descargados, SHA-256 del PDF y tiempos de cada etapa.
+    """
+    getdelta = GetDelta()
+    
+    subsite = list(subsites.values())[0]
+    # Crear la estructura de directorios
+    directory = create_directory_structure(base_url, subsite=subsite)
     
-    # Obtener el texto anterior si existe
-    old_text = getdelta.get_existing_text(filename)
+    # Revisiones del texto; el archivo plano anterior (<md5>.txt) se migra la primera vez
+    snapshot_store = SnapshotStore(directory)
+    snapshot_store.migrate_legacy(pdf_url, f"{directory}/{getdelta.sanitize_filename(pdf_url)}")
+
+    # Metadatos de la descarga anterior para el GET condicional
+    metadata_store = UrlMetadataStore(directory)
+    metadata = metadata_store.load(pdf_url)
+
+    timings = {}
+    try:
+        download_start = time.perf_counter()
+        pdf_buffer, fetch_mode, validators = await fetch_pdf(pdf_url, headers=metadata_store.conditional_headers(metadata))
+        timings["download"] = time.perf_counter() - download_start
+        if pdf_buffer is None:
+            logging.info(f"PDF sin cambios (304): {pdf_url}")
+            return scrape_result(pdf_url, STATUS_NOT_MODIFIED, delta=0.0, content_hash=metadata.get("sha256"),
+                                 fetch_mode=fetch_mode, timings=timings)
+
+        with pdf_buffer:
+            # Si el contenido es idéntico al anterior no hace falta extraer ni comparar
+            content_hash, size = pdf_buffer.sha256, pdf_buffer.size
+            if content_hash == metadata.get("sha256"):
+                metadata_store.save(pdf_url, content_length=size, sha256=content_hash, **validators)
+                logging.info(f"PDF sin cambios (mismo SHA-256): {pdf_url}")
+                return scrape_result(pdf_url, STATUS_UNCHANGED, delta=0.0, bytes=size, content_hash=content_hash,
+                                     fetch_mode=fetch_mode, timings=timings)
 
-    # Calcular el delta entre el texto viejo y el nuevo
-    delta = getdelta.calculate_text_delta(old_text, text)
+            extraction = await get_pdf_extraction_service().extract(pdf_buffer.source)
+            text = extraction["text"]
+            timings["extract"] = extraction["seconds"]
+    except Exception as e:
+        logging.error(f"Error al intentar scrapeo: {e}")
+        # En caso de error, no se detecta cambio
+        return scrape_result(pdf_url, STATUS_ERROR, timings=timings, error=str(e))
 
-    # Actualizar el archivo de texto con el nuevo contenido
-    getdelta.save_pdf_text_to_file(text, filename)
+    # Comparar con la última revisión y guardar el texto solo si cambió, fuera del event loop compartido
+    with get_metrics().span("delta", url=pdf_url, strategy=DELTA_STRATEGY) as span:
+        delta = await asyncio.to_thread(snapshot_store.commit, pdf_url, text, strategy=DELTA_STRATEGY)
+        span.set(delta=delta)
+    timings["delta"] = span.seconds
+    logging.info(f"Snapshot updated for {pdf_url}: delta={delta:.4f}")
+    # Solo con el texto ya guardado: si el commit falla, el próximo intento no debe tomar el PDF como sin cambios
+    metadata_store.save(pdf_url, content_length=size, sha256=content_hash, **validators)
 
-    return delta
+    return scrape_result(pdf_url, STATUS_CHANGED if delta > 0 else STATUS_UNCHANGED, delta=delta, bytes=size,
+                         content_hash=content_hash, fetch_mode=fetch_mode, timings=timings)
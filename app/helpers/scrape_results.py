@@ -0,0 +1,112 @@
+"""
+Resultados de las tareas de scraping y reporte de cambios por ejecución.
+
+Cada tarea de Celery devuelve un resultado compacto (`scrape_result`) por el
+backend de resultados de Celery. El despachador espera los resultados de los
+lotes que envió y el flujo arma con ellos el reporte de la ejecución con los
+documentos que cambiaron, sin recorrer los archivos en disco:
+
+    python -m app.helpers.scrape_results <run_id>
+"""
+import json
+import os
+import sys
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCRAPE_REPORT_DIR = os.getenv('SCRAPE_REPORT_DIR', "app/cache/reports")
+# Un documento cuenta como cambiado si su delta supera este umbral
+SCRAPE_CHANGE_THRESHOLD = float(os.getenv('SCRAPE_CHANGE_THRESHOLD', 0.0))
+# Espera máxima del despachador por los resultados de las tareas que envió
+SCRAPE_RESULTS_TIMEOUT = float(os.getenv('SCRAPE_RESULTS_TIMEOUT', 3600))
+
+# Estados de un resultado
+STATUS_CHANGED = "changed"          # Texto nuevo o distinto de la última revisión
+STATUS_UNCHANGED = "unchanged"      # Mismo SHA-256 o mismo texto
+STATUS_NOT_MODIFIED = "not_modified"  # El servidor respondió 304
+STATUS_SAVED = "saved"              # Página HTML guardada (sin delta)
+STATUS_ERROR = "error"
+
+
+def new_run_id() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+
+
+def scrape_result(url: str, status: str, delta: float = None, bytes: int = 0, content_hash: str = None,
+                  fetch_mode: str = None, timings: dict = None, error: str = None) -> dict:
+    """Resultado compacto de una URL; es lo que devuelven las tareas de Celery."""
+    return {
+        "url": url,
+        "status": status,
+        "delta": delta,
+        "bytes": bytes,
+        "content_hash": content_hash,
+        "fetch_mode": fetch_mode,
+        "timings": timings or {},
+        # Solo la primera línea: algunos errores (p. ej. de Playwright) traen varias
+        "error": error.strip().splitlines()[0][:500] if error else error,
+    }
+
+
+def is_changed(result: dict, threshold: float = SCRAPE_CHANGE_THRESHOLD) -> bool:
+    return result["status"] == STATUS_CHANGED and (result["delta"] or 0.0) > threshold
+
+
+def build_report(run_id: str, results, threshold: float = SCRAPE_CHANGE_THRESHOLD, expected: int = None) -> dict:
+    """
+    Reporte de cambios de la ejecución a partir de los resultados de sus tareas.
+
+    Returns:
+    - dict: Totales por estado, bytes y segundos, la lista `changed` (URL,
+      delta y hash, de mayor a menor delta) y las URLs con error.
+    """
+    statuses = Counter()
+    changed, errors = [], []
+    total_bytes = total_seconds = 0
+    for result in results:
+        statuses[result["status"]] += 1
+        total_bytes += result["bytes"] or 0
+        total_seconds += result.get("seconds") or 0
+        if is_changed(result, threshold):
+            changed.append({"url": result["url"], "delta": result["delta"], "content_hash": result["content_hash"]})
+        elif result["status"] == STATUS_ERROR:
+            errors.append({"url": result["url"], "error": result["error"]})
+    changed.sort(key=lambda item: -item["delta"])
+    total = sum(statuses.values())
+    return {
+        "run_id": run_id,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "threshold": threshold,
+        "total": total,
+        "missing": max(expected - total, 0) if expected is not None else None,
+        "statuses": dict(statuses),
+        "bytes": total_bytes,
+        "task_seconds": total_seconds,
+        "changed": changed,
+        "errors": errors,
+    }
+
+
+def write_report(report: dict, directory: str = SCRAPE_REPORT_DIR) -> str:
+    """Escribe el reporte en `<directory>/<run_id>.json` y devuelve la ruta."""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{report['run_id']}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(report, file, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_report(run_id: str, directory: str = SCRAPE_REPORT_DIR) -> dict:
+    with open(os.path.join(directory, f"{run_id}.json")) as file:
+        return json.load(file)
+
+
+if __name__ == "__main__":
+    print(json.dumps(read_report(sys.argv[1]), indent=2))
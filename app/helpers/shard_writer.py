@@ -0,0 +1,269 @@
+"""
+Salida del scraping de páginas en shards JSONL por sitio.
+
+Estructura de `<SCRAPED_OUTPUT_DIR>/<sitio>/`:
+
+- `part-<worker>-<n>.jsonl`: shards finalizados, un registro JSON por línea.
+  Son inmutables; se pueden leer en paralelo.
+- `.inprogress/`: el shard que cada worker está escribiendo. Al rotar, por
+  cantidad de registros, tamaño o antigüedad, se renombra de forma atómica
+  al directorio del sitio.
+- `manifest.db`: índice SQLite con los shards finalizados y, por URL, el
+  shard, el offset y la longitud de su último registro. Permite leer una URL
+  sin recorrer los shards.
+"""
+import fcntl
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCRAPED_OUTPUT_DIR = os.getenv('SCRAPED_OUTPUT_DIR', "scraped_sites")
+SHARD_MAX_RECORDS = int(os.getenv('SHARD_MAX_RECORDS', 10_000))
+SHARD_MAX_BYTES = int(os.getenv('SHARD_MAX_BYTES', 128 * 1024 * 1024))
+SHARD_MAX_AGE = float(os.getenv('SHARD_MAX_AGE', 300))
+SHARD_BUFFER_SIZE = 1024 * 1024
+
+INPROGRESS_DIR = ".inprogress"
+MANIFEST_NAME = "manifest.db"
+
+
+def site_name(url: str) -> str:
+    return urlparse(url).netloc.replace("www.", "")  # Remove 'www.' if present
+
+
+def open_manifest(site_directory: str) -> sqlite3.Connection:
+    # Un mismo escritor puede usarse desde el hilo del loop y cerrarse desde el hilo principal del worker
+    connection = sqlite3.connect(os.path.join(site_directory, MANIFEST_NAME), timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    connection.executescript("""
+        CREATE TABLE IF NOT EXISTS shards (
+            name TEXT PRIMARY KEY,
+            writer TEXT NOT NULL,
+            records INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            finalized_at TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS records (
+            url TEXT PRIMARY KEY,
+            shard TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            length INTEGER NOT NULL,
+            scraped_at TEXT NOT NULL
+        ) WITHOUT ROWID;
+    """)
+    return connection
+
+
+def register_shard(connection: sqlite3.Connection, name: str, writer: str, entries: list, size: int):
+    """Registra el shard y sus registros (url, offset, longitud, fecha) en una transacción."""
+    with connection:
+        connection.execute(
+            "INSERT OR REPLACE INTO shards (name, writer, records, bytes, finalized_at) VALUES (?, ?, ?, ?, ?)",
+            (name, writer, len(entries), size, datetime.now(timezone.utc).isoformat()),
+        )
+        # La última versión de cada URL reemplaza a las anteriores
+        connection.executemany(
+            "INSERT OR REPLACE INTO records (url, shard, offset, length, scraped_at) VALUES (?, ?, ?, ?, ?)",
+            ((url, name, offset, length, scraped_at) for url, offset, length, scraped_at in entries),
+        )
+
+
+def scan_shard(path: str) -> tuple:
+    """
+    Lee un shard línea por línea y devuelve sus entradas de índice y el tamaño válido.
+
+    Una última línea incompleta (escritura interrumpida) queda fuera del tamaño válido.
+    """
+    entries = []
+    offset = 0
+    with open(path, "rb") as file:
+        for line in file:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            entries.append((record["url"], offset, len(line), record.get("scraped_at", "")))
+            offset += len(line)
+    return entries, offset
+
+
+class ShardWriter:
+    """
+    Escritor con buffer de los shards de un sitio para un único worker.
+
+    Args:
+    - site (str): Nombre del sitio (directorio de salida).
+    - writer_id (str): Identificador único del worker; por defecto host y PID.
+    """
+
+    def __init__(self, site: str, directory: str = SCRAPED_OUTPUT_DIR, writer_id: str = None,
+                 max_records: int = SHARD_MAX_RECORDS, max_bytes: int = SHARD_MAX_BYTES,
+                 max_age: float = SHARD_MAX_AGE):
+        self.site = site
+        self.site_directory = os.path.join(directory, site)
+        self.writer_id = writer_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        os.makedirs(os.path.join(self.site_directory, INPROGRESS_DIR), exist_ok=True)
+        self._manifest = open_manifest(self.site_directory)
+        self._lock = threading.Lock()
+        self._file = None
+        self._sequence = 0
+        self.recover()
+
+    def _open_shard(self):
+        self._sequence += 1
+        self._name = f"part-{self.writer_id}-{int(time.time())}-{self._sequence:05d}.jsonl"
+        self._path = os.path.join(self.site_directory, INPROGRESS_DIR, self._name)
+        # El bloqueo indica a `recover` de otros procesos que este shard sigue activo;
+        # se toma antes de darle el nombre que `recover` busca
+        self._file = open(f"{self._path}.new", "wb", buffering=SHARD_BUFFER_SIZE)
+        fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.replace(f"{self._path}.new", self._path)
+        self._entries = []
+        self._size = 0
+        self._opened_at = time.monotonic()
+
+    def write(self, record: dict):
+        """Agrega un registro (debe incluir "url") y rota el shard si corresponde."""
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            if self._file is None:
+                self._open_shard()
+            self._file.write(line)
+            self._entries.append((record["url"], self._size, len(line), record.get("scraped_at", "")))
+            self._size += len(line)
+            if (len(self._entries) >= self.max_records or self._size >= self.max_bytes
+                    or time.monotonic() - self._opened_at >= self.max_age):
+                self._finalize()
+
+    def _finalize(self):
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        final_path = os.path.join(self.site_directory, self._name)
+        # Renombrar antes de soltar el bloqueo: `recover` nunca ve el shard a medio mover
+        os.replace(self._path, final_path)
+        self._file.close()
+        self._file = None
+        if self._entries:
+            register_shard(self._manifest, self._name, self.writer_id, self._entries, self._size)
+        else:
+            os.remove(final_path)
+        logging.info(f"Shard {self._name} finalizado con {len(self._entries)} registros ({self._size} bytes)")
+
+    def flush(self):
+        """Finaliza el shard actual aunque no haya llegado al límite."""
+        with self._lock:
+            self._finalize()
+
+    def close(self):
+        self.flush()
+        self._manifest.close()
+
+    def recover(self) -> int:
+        """
+        Finaliza los shards en curso de workers que terminaron sin cerrarlos e
+        indexa los shards finalizados que no llegaron al manifiesto.
+
+        Returns:
+        - int: Cantidad de shards recuperados.
+        """
+        recovered = 0
+        inprogress_directory = os.path.join(self.site_directory, INPROGRESS_DIR)
+        for name in sorted(os.listdir(inprogress_directory)):
+            if not name.endswith(".jsonl"):
+                continue
+            path = os.path.join(inprogress_directory, name)
+            with open(path, "r+b") as file:
+                try:
+                    fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # Otro worker lo está escribiendo
+                entries, size = scan_shard(path)
+                file.truncate(size)
+                os.replace(path, os.path.join(self.site_directory, name))
+            register_shard(self._manifest, name, "recovered", entries, size)
+            recovered += 1
+
+        registered = {row[0] for row in self._manifest.execute("SELECT name FROM shards")}
+        for name in sorted(os.listdir(self.site_directory)):
+            if name.startswith("part-") and name.endswith(".jsonl") and name not in registered:
+                entries, size = scan_shard(os.path.join(self.site_directory, name))
+                register_shard(self._manifest, name, "recovered", entries, size)
+                recovered += 1
+
+        if recovered:
+            logging.info(f"Recuperados {recovered} shards de {self.site_directory}")
+        return recovered
+
+
+class ShardReader:
+    """Lectura de los shards finalizados de un sitio a partir del manifiesto."""
+
+    def __init__(self, site: str, directory: str = SCRAPED_OUTPUT_DIR):
+        self.site_directory = os.path.join(directory, site)
+        self._manifest = open_manifest(self.site_directory)
+
+    def shards(self) -> list:
+        """Rutas de los shards finalizados, para repartirlos entre lectores paralelos."""
+        rows = self._manifest.execute("SELECT name FROM shards ORDER BY finalized_at, name")
+        return [os.path.join(self.site_directory, row[0]) for row in rows]
+
+    @staticmethod
+    def iter_shard(path: str):
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                yield json.loads(line)
+
+    def get(self, url: str):
+        """Devuelve el último registro de la URL leyendo solo sus bytes, o None."""
+        row = self._manifest.execute("SELECT shard, offset, length FROM records WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        shard, offset, length = row
+        with open(os.path.join(self.site_directory, shard), "rb") as file:
+            file.seek(offset)
+            return json.loads(file.read(length))
+
+    def close(self):
+        self._manifest.close()
+
+
+_shard_writers = {}
+_shard_writers_lock = threading.Lock()
+
+
+def get_shard_writer(site: str) -> ShardWriter:
+    """Devuelve el escritor del sitio para el proceso actual."""
+    with _shard_writers_lock:
+        if site not in _shard_writers:
+            _shard_writers[site] = ShardWriter(site)
+        return _shard_writers[site]
+
+
+def close_shard_writers():
+    """Finaliza los shards abiertos del proceso (al apagar el worker)."""
+    with _shard_writers_lock:
+        for writer in _shard_writers.values():
+            try:
+                writer.close()
+            except Exception as e:
+                logging.error(f"Error al cerrar el shard de {writer.site}: {e}")
+        _shard_writers.clear()
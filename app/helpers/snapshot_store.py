@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from dotenv import load_dotenv
+
+from app.helpers.delta_engine import SHINGLE_HASH, compute_delta, minhash_signature, minhash_similarity, text_hash
+
+load_dotenv()
+
+SNAPSHOT_MAX_REVISIONS = int(os.getenv('SNAPSHOT_MAX_REVISIONS', 10))
+
+# zstd si el paquete zstandard está instalado, gzip en caso contrario
+try:
+    import zstandard
+    SNAPSHOT_EXTENSION = ".zst"
+except ImportError:
+    zstandard = None
+    SNAPSHOT_EXTENSION = ".gz"
+
+
+def atomic_write(path: str, data: bytes):
+    """Escribe el archivo en un temporal del mismo directorio y lo renombra."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def compress(text: str, extension: str) -> bytes:
+    if extension == ".zst":
+        return zstandard.ZstdCompressor().compress(text.encode())
+    return gzip.compress(text.encode())
+
+
+def decompress(data: bytes, extension: str) -> str:
+    if extension == ".zst":
+        return zstandard.ZstdDecompressor().decompress(data).decode()
+    return gzip.decompress(data).decode()
+
+
+class SnapshotStore:
+    """
+    Revisiones versionadas del texto de cada URL de un subsite.
+
+    Cada URL tiene un directorio `<md5>/` con las revisiones comprimidas y un
+    `index.json` pequeño con el hash y el delta de cada una (y la firma MinHash
+    de la última cuando se usa esa estrategia).
+    Las comparaciones con la última revisión solo leen el índice; el texto
+    anterior se descomprime únicamente si cambió y la estrategia lo necesita.
+    """
+
+    def __init__(self, directory: str, max_revisions: int = SNAPSHOT_MAX_REVISIONS):
+        self.directory = directory
+        self.max_revisions = max_revisions
+
+    def url_directory(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.md5(url.encode()).hexdigest())
+
+    def index_path(self, url: str) -> str:
+        return os.path.join(self.url_directory(url), "index.json")
+
+    def load_index(self, url: str) -> dict:
+        path = self.index_path(url)
+        if not os.path.exists(path):
+            return {"url": url, "revisions": []}
+        with open(path, "r") as file:
+            return json.load(file)
+
+    def latest_revision(self, url: str):
+        """Devuelve los metadatos de la última revisión (sin leer su texto), o None."""
+        revisions = self.load_index(url)["revisions"]
+        return revisions[-1] if revisions else None
+
+    def latest_hash(self, url: str):
+        revision = self.latest_revision(url)
+        return revision["sha256"] if revision else None
+
+    def read_revision(self, url: str, revision: dict) -> str:
+        path = os.path.join(self.url_directory(url), revision["file"])
+        with open(path, "rb") as file:
+            return decompress(file.read(), os.path.splitext(revision["file"])[1])
+
+    def migrate_legacy(self, url: str, legacy_filename: str):
+        """Importa el archivo plano `<md5>.txt` anterior como primera revisión y lo elimina."""
+        if not os.path.exists(legacy_filename) or self.latest_revision(url):
+            return
+        with open(legacy_filename, "r") as file:
+            text = file.read()
+        if text:
+            self.save_revision(url, text, delta=None)
+        os.remove(legacy_filename)
+
+    def save_revision(self, url: str, text: str, delta, signature: list = None) -> dict:
+        """Guarda el texto como nueva revisión comprimida y actualiza el índice de forma atómica."""
+        url_directory = self.url_directory(url)
+        os.makedirs(url_directory, exist_ok=True)
+        index = self.load_index(url)
+        revisions = index["revisions"]
+
+        number = revisions[-1]["revision"] + 1 if revisions else 1
+        content_hash = text_hash(text)
+        revision = {
+            "revision": number,
+            "file": f"{number:06d}_{content_hash[:12]}{SNAPSHOT_EXTENSION}",
+            "sha256": content_hash,
+            "size": len(text),
+            "delta": delta,
+            "signature": signature,
+            "signature_hash": SHINGLE_HASH if signature is not None else None,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        atomic_write(os.path.join(url_directory, revision["file"]), compress(text, SNAPSHOT_EXTENSION))
+
+        revisions.append(revision)
+        # Conservar solo las últimas revisiones; las firmas antiguas no se usan
+        expired, index["revisions"] = revisions[:-self.max_revisions], revisions[-self.max_revisions:]
+        for old_revision in index["revisions"][:-1]:
+            old_revision.pop("signature", None)
+            old_revision.pop("signature_hash", None)
+        atomic_write(self.index_path(url), json.dumps(index).encode())
+
+        for old_revision in expired:
+            old_path = os.path.join(url_directory, old_revision["file"])
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        return revision
+
+    def commit(self, url: str, text: str, strategy: str) -> float:
+        """
+        Compara el texto con la última revisión y lo guarda si cambió.
+
+        Args:
+        - url (str): URL del documento.
+        - text (str): Texto nuevo.
+        - strategy (str): Estrategia de `app.helpers.delta_engine`.
+
+        Returns:
+        - float: Delta respecto a la última revisión (1.0 si no había ninguna).
+        """
+        latest = self.latest_revision(url)
+        if latest is not None and latest["sha256"] == text_hash(text):
+            return 0.0
+
+        # Con MinHash la firma guardada permite estimar el delta sin descomprimir el texto anterior
+        signature = minhash_signature(text) if strategy == "minhash" else None
+        if latest is None:
+            delta = 1.0
+        elif signature is not None and latest.get("signature") is not None \
+                and latest.get("signature_hash") == SHINGLE_HASH:
+            delta = 1 - minhash_similarity(latest["signature"], signature)
+        else:
+            delta = compute_delta(self.read_revision(url, latest), text, strategy=strategy)
+
+        self.save_revision(url, text, delta=delta, signature=signature)
+        return delta
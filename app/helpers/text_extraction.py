@@ -0,0 +1,193 @@
+"""
+Extracción del texto visible de las páginas.
+
+Cada extractor ofrece `extract_page(page)` para una página abierta en
+Playwright y `extract_html(html)` para HTML ya descargado o guardado:
+
+- `browser`: `innerText` calculado por el navegador en una sola evaluación,
+  sin serializar el DOM con `page.content()`. Con HTML fuera del navegador
+  usa el extractor `lxml`.
+- `lxml`: parser en C de lxml.
+- `selectolax`: parser Lexbor de selectolax, si está instalado.
+- `soup`: BeautifulSoup con `html.parser`, el camino anterior; se mantiene
+  como referencia para los benchmarks.
+
+Con `main_content=True` se descarta el contenido repetido del sitio
+(navegación, encabezado, pie, scripts, formularios) y, si existe, se usa
+solo el contenido principal (`main`, `article`, `[role=main]`).
+"""
+import os
+import re
+
+import lxml.html
+from lxml import etree
+from bs4 import BeautifulSoup
+from dotenv import load_dotenv
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+load_dotenv()
+
+TEXT_EXTRACTOR = os.getenv('TEXT_EXTRACTOR', "browser")
+TEXT_MAIN_CONTENT = os.getenv('TEXT_MAIN_CONTENT', "true").lower() == "true"
+
+# Elementos que nunca son texto visible
+NON_TEXT_TAGS = ("script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "head")
+# Contenido repetido en todas las páginas del sitio
+BOILERPLATE_SELECTORS = (
+    "nav", "header", "footer", "aside", "form", "dialog",
+    "[role=navigation]", "[role=banner]", "[role=contentinfo]", "[role=complementary]",
+    "[aria-hidden=true]", "[hidden]",
+)
+MAIN_CONTENT_SELECTORS = ("main", "[role=main]", "article")
+
+# Los mismos selectores en XPath compilado para lxml
+NON_TEXT_XPATH = etree.XPath("descendant::*[" + " or ".join(f"self::{tag}" for tag in NON_TEXT_TAGS) + "]")
+BOILERPLATE_XPATH = etree.XPath(
+    "descendant::*[self::nav or self::header or self::footer or self::aside or self::form or self::dialog"
+    " or @role='navigation' or @role='banner' or @role='contentinfo' or @role='complementary'"
+    " or @aria-hidden='true' or @hidden]"
+)
+MAIN_CONTENT_XPATHS = tuple(etree.XPath(xpath) for xpath in (
+    "descendant-or-self::main[1]", "descendant-or-self::*[@role='main'][1]", "descendant-or-self::article[1]",
+))
+TEXT_XPATH = etree.XPath("descendant::text()")
+
+# En el navegador `innerText` ya respeta el CSS: los elementos con display:none
+# no aparecen. El boilerplate se oculta solo durante la lectura.
+INNER_TEXT_JS = """([mainSelectors, boilerplateSelectors]) => {
+    let root = document.body || document.documentElement;
+    const hidden = [];
+    if (mainSelectors.length) {
+        for (const selector of mainSelectors) {
+            const main = document.querySelector(selector);
+            if (main) { root = main; break; }
+        }
+        for (const element of root.querySelectorAll(boilerplateSelectors.join(","))) {
+            hidden.push([element, element.style.display]);
+            element.style.display = "none";
+        }
+    }
+    const text = root.innerText;
+    for (const [element, display] of hidden) element.style.display = display;
+    return text;
+}"""
+
+BLANK_LINES = re.compile(r"[ \t\r\f\v]*\n\s*")
+
+
+def normalize_lines(text: str) -> str:
+    """Una línea por bloque de texto, sin líneas vacías ni espacios en los extremos."""
+    return BLANK_LINES.sub("\n", text).strip()
+
+
+class TextExtractor:
+    """Interfaz de los extractores de texto."""
+
+    name = "base"
+
+    def __init__(self, main_content: bool = TEXT_MAIN_CONTENT):
+        self.main_content = main_content
+
+    def extract_html(self, html: str) -> str:
+        raise NotImplementedError
+
+    async def extract_page(self, page) -> str:
+        return self.extract_html(await page.content())
+
+
+class LxmlTextExtractor(TextExtractor):
+    name = "lxml"
+
+    def extract_html(self, html: str) -> str:
+        if not html.strip():
+            return ""
+        document = lxml.html.document_fromstring(html)
+        root = document.body if document.find("body") is not None else document
+        if self.main_content:
+            root = next((found[0] for found in (xpath(root) for xpath in MAIN_CONTENT_XPATHS) if found), root)
+        removed = NON_TEXT_XPATH(root) + (BOILERPLATE_XPATH(root) if self.main_content else [])
+        for element in removed:
+            # drop_tree conserva el texto que sigue al elemento (tail)
+            element.drop_tree()
+        texts = (text.strip() for text in TEXT_XPATH(root))
+        return "\n".join(text for text in texts if text)
+
+
+class SelectolaxTextExtractor(TextExtractor):
+    name = "selectolax"
+
+    def __init__(self, main_content: bool = TEXT_MAIN_CONTENT):
+        if LexborHTMLParser is None:
+            raise RuntimeError("selectolax no está instalado: pip install selectolax")
+        super().__init__(main_content)
+
+    def extract_html(self, html: str) -> str:
+        tree = LexborHTMLParser(html)
+        root = tree.body or tree.root
+        if root is None:
+            return ""
+        if self.main_content:
+            for selector in MAIN_CONTENT_SELECTORS:
+                found = root.css_first(selector)
+                if found is not None:
+                    root = found
+                    break
+        removed = NON_TEXT_TAGS + (BOILERPLATE_SELECTORS if self.main_content else ())
+        for element in root.css(",".join(removed)):
+            element.decompose()
+        return root.text(separator="\n", strip=True)
+
+
+class SoupTextExtractor(TextExtractor):
+    name = "soup"
+
+    def extract_html(self, html: str) -> str:
+        soup = BeautifulSoup(html, 'html.parser')
+        root = soup.body or soup
+        if self.main_content:
+            root = next((found for found in map(root.select_one, MAIN_CONTENT_SELECTORS) if found), root)
+        removed = NON_TEXT_TAGS + (BOILERPLATE_SELECTORS if self.main_content else ())
+        for element in root.select(",".join(removed)):
+            element.decompose()
+        return root.get_text(separator="\n", strip=True)
+
+
+class BrowserTextExtractor(TextExtractor):
+    name = "browser"
+
+    def __init__(self, main_content: bool = TEXT_MAIN_CONTENT):
+        super().__init__(main_content)
+        self._offline = LxmlTextExtractor(main_content)
+
+    def extract_html(self, html: str) -> str:
+        return self._offline.extract_html(html)
+
+    async def extract_page(self, page) -> str:
+        selectors = [list(MAIN_CONTENT_SELECTORS), list(BOILERPLATE_SELECTORS)] if self.main_content else [[], []]
+        return normalize_lines(await page.evaluate(INNER_TEXT_JS, selectors))
+
+
+TEXT_EXTRACTORS = {
+    extractor.name: extractor
+    for extractor in (BrowserTextExtractor, LxmlTextExtractor, SelectolaxTextExtractor, SoupTextExtractor)
+    if extractor is not SelectolaxTextExtractor or LexborHTMLParser is not None
+}
+
+
+def create_text_extractor(name: str = TEXT_EXTRACTOR, main_content: bool = TEXT_MAIN_CONTENT) -> TextExtractor:
+    return TEXT_EXTRACTORS[name](main_content)
+
+
+_text_extractor = None
+
+
+def get_text_extractor() -> TextExtractor:
+    """Devuelve el extractor configurado con TEXT_EXTRACTOR para el proceso actual."""
+    global _text_extractor
+    if _text_extractor is None:
+        _text_extractor = create_text_extractor()
+    return _text_extractor
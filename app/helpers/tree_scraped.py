@@ -1,9 +1,21 @@
 import json
+import os
+import sqlite3
+from datetime import datetime, timezone
 from pathlib import Path
 
+REGISTRY_DB_PATH = os.getenv('URL_REGISTRY_DB_PATH', "app/cache/scraped_sites.db")
+
+# Cantidad máxima de parámetros por consulta IN (...) en SQLite
+SQLITE_BATCH_SIZE = 500
+
 
 class TreeScraped:
 
+    def __init__(self, db_path: str = REGISTRY_DB_PATH):
+        self.db_path = db_path
+        self._connection = None
+
     # Función para cargar archivos JSON
     def load_json_file(self, file_path, default_value):
         if Path(file_path).exists():
@@ -28,4 +40,161 @@ class TreeScraped:
                 for subsite in entry["subsites"]:
                     if subsite.get("subsite_value") == subsite_value:
                         return subsite
-        return None
\ No newline at end of file
+        return None
+
+    # Registro de URLs en SQLite (modo WAL) con índice por (site, subsite, url)
+    @property
+    def connection(self) -> sqlite3.Connection:
+        if self._connection is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._connection = sqlite3.connect(self.db_path, timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript("""
+                CREATE TABLE IF NOT EXISTS urls (
+                    site TEXT NOT NULL,
+                    subsite_key TEXT NOT NULL,
+                    subsite_value TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    discovered_at TEXT NOT NULL,
+                    PRIMARY KEY (site, subsite_key, subsite_value, url)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS registry_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+            """)
+        return self._connection
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def filter_new_urls(self, site, subsite_key, subsite_value, urls, bloom_filter=None):
+        """
+        Devuelve, en orden, las URLs que todavía no están registradas para el subsite.
+
+        Con `bloom_filter` solo se consultan en SQLite los positivos del filtro;
+        los negativos son URLs nuevas con certeza.
+        """
+        urls = list(dict.fromkeys(urls))
+        candidates = urls
+        if bloom_filter is not None:
+            bloom_filter.reload()
+            candidates = [url for url in urls if bloom_filter.might_contain(url)]
+
+        existing = set()
+        for start in range(0, len(candidates), SQLITE_BATCH_SIZE):
+            batch = candidates[start:start + SQLITE_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            rows = self.connection.execute(
+                f"SELECT url FROM urls WHERE site = ? AND subsite_key = ? AND subsite_value = ? AND url IN ({placeholders})",
+                (site, subsite_key or "", subsite_value or "", *batch),
+            )
+            existing.update(row[0] for row in rows)
+
+        if bloom_filter is not None:
+            bloom_filter.record_false_positive(len(candidates) - len(existing))
+        return [url for url in urls if url not in existing]
+
+    def has_url(self, site, subsite_key, subsite_value, url) -> bool:
+        return not self.filter_new_urls(site, subsite_key, subsite_value, [url])
+
+    def count_urls(self, site, subsite_key, subsite_value) -> int:
+        return self.connection.execute(
+            "SELECT COUNT(*) FROM urls WHERE site = ? AND subsite_key = ? AND subsite_value = ?",
+            (site, subsite_key or "", subsite_value or ""),
+        ).fetchone()[0]
+
+    def iter_urls(self, site, subsite_key, subsite_value):
+        """Recorre las URLs del subsite sin cargarlas todas en memoria."""
+        rows = self.connection.execute(
+            "SELECT url FROM urls WHERE site = ? AND subsite_key = ? AND subsite_value = ?",
+            (site, subsite_key or "", subsite_value or ""),
+        )
+        for row in rows:
+            yield row[0]
+
+    def get_urls(self, site, subsite_key, subsite_value):
+        return list(self.iter_urls(site, subsite_key, subsite_value))
+
+    def add_urls(self, site, subsite_key, subsite_value, urls, bloom_filter=None) -> int:
+        """Registra las URLs en una sola transacción. Devuelve cuántas eran nuevas."""
+        if bloom_filter is not None:
+            urls = list(urls)
+            bloom_filter.add_many(urls)
+        discovered_at = datetime.now(timezone.utc).isoformat()
+        with self.connection:
+            cursor = self.connection.executemany(
+                "INSERT OR IGNORE INTO urls (site, subsite_key, subsite_value, url, discovered_at) VALUES (?, ?, ?, ?, ?)",
+                ((site, subsite_key or "", subsite_value or "", url, discovered_at) for url in urls),
+            )
+        if bloom_filter is not None:
+            # Las nuevas ya están en el filtro: el watermark sigue al registro y no hace falta resincronizar
+            bloom_filter.advance_watermark(cursor.rowcount)
+        return cursor.rowcount
+
+    def claim_urls(self, site, subsite_key, subsite_value, urls, bloom_filter=None) -> list:
+        """
+        Registra las URLs y devuelve, en orden, solo las que insertó esta llamada.
+
+        Si dos descubrimientos del mismo subsite encuentran la misma URL a la
+        vez, solo uno la obtiene (la clave primaria decide), así que se publica
+        una sola vez. Quien no logra publicar las suyas las devuelve con `release_urls`.
+        """
+        urls = list(dict.fromkeys(urls))
+        if bloom_filter is not None:
+            bloom_filter.add_many(urls)
+        discovered_at = datetime.now(timezone.utc).isoformat()
+        claimed = []
+        with self.connection:
+            for url in urls:
+                cursor = self.connection.execute(
+                    "INSERT OR IGNORE INTO urls (site, subsite_key, subsite_value, url, discovered_at) VALUES (?, ?, ?, ?, ?)",
+                    (site, subsite_key or "", subsite_value or "", url, discovered_at),
+                )
+                if cursor.rowcount:
+                    claimed.append(url)
+        if bloom_filter is not None:
+            bloom_filter.advance_watermark(len(claimed))
+        return claimed
+
+    def release_urls(self, site, subsite_key, subsite_value, urls, bloom_filter=None) -> int:
+        """
+        Quita del registro URLs reclamadas que no se llegaron a publicar, para que otro descubrimiento las tome.
+
+        Con `bloom_filter` descuenta del watermark las filas borradas, para que el
+        filtro siga sincronizado con el registro y no haga falta recargarlo entero.
+        """
+        with self.connection:
+            released = self.connection.executemany(
+                "DELETE FROM urls WHERE site = ? AND subsite_key = ? AND subsite_value = ? AND url = ?",
+                ((site, subsite_key or "", subsite_value or "", url) for url in urls),
+            ).rowcount
+        if bloom_filter is not None and released:
+            bloom_filter.advance_watermark(-released)
+        return released
+
+    def migrate_from_json(self, json_path) -> int:
+        """Importa una única vez el árbol de scraped_sites.json al registro SQLite."""
+        migrated = self.connection.execute(
+            "SELECT value FROM registry_meta WHERE key = 'json_migrated'"
+        ).fetchone()
+        if migrated:
+            return 0
+
+        total = 0
+        for entry in self.load_json_file(json_path, default_value=[]):
+            for subsite in entry.get("subsites", []):
+                # Cada subsite tiene la lista "urls" y un único par clave/valor (p. ej. "query")
+                subsite_key, subsite_value = next(((k, v) for k, v in subsite.items() if k != "urls"), (None, None))
+                total += self.add_urls(entry["site"], subsite_key, subsite_value, subsite.get("urls", []))
+
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO registry_meta (key, value) VALUES ('json_migrated', ?)",
+                (datetime.now(timezone.utc).isoformat(),),
+            )
+        print(f"Migradas {total} URLs de {json_path} a {self.db_path}")
+        return total
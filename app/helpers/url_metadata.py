@@ -0,0 +1,56 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+
+class UrlMetadataStore:
+    """
+    Metadatos HTTP por URL guardados junto a los textos de un subsite.
+
+    Cada URL tiene un archivo `<md5>.meta.json` con ETag, Last-Modified,
+    tamaño y SHA-256 del contenido descargado, usados para GET condicionales
+    y para saltar la extracción cuando el contenido no cambió.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def metadata_path(self, url: str) -> str:
+        return os.path.join(self.directory, hashlib.md5(url.encode()).hexdigest() + ".meta.json")
+
+    def load(self, url: str) -> dict:
+        """Devuelve los metadatos guardados de la URL, o un dict vacío."""
+        path = self.metadata_path(url)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (json.JSONDecodeError, OSError):
+            return {}
+
+    def save(self, url: str, etag: str = None, last_modified: str = None, content_length: int = None, sha256: str = None):
+        metadata = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_length": content_length,
+            "sha256": sha256,
+            "fetched_at": datetime.now(timezone.utc).isoformat(),
+        }
+        path = self.metadata_path(url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(metadata, file)
+        os.replace(tmp_path, path)
+        return metadata
+
+    def conditional_headers(self, metadata: dict) -> dict:
+        """Cabeceras If-None-Match / If-Modified-Since a partir de los metadatos guardados."""
+        headers = {}
+        if metadata.get("etag"):
+            headers["If-None-Match"] = metadata["etag"]
+        if metadata.get("last_modified"):
+            headers["If-Modified-Since"] = metadata["last_modified"]
+        return headers
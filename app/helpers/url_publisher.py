@@ -0,0 +1,299 @@
+import asyncio
+import atexit
+import logging
+import os
+import re
+from collections import Counter, deque
+from itertools import takewhile
+from urllib.parse import urlparse
+
+import pika
+from dotenv import load_dotenv
+from pika.adapters.asyncio_connection import AsyncioConnection
+from pika.exceptions import AMQPConnectionError
+
+load_dotenv()
+
+rabbitmq_host = os.getenv('RABBITMQ_HOST')
+rabbitmq_port = int(os.getenv('RABBITMQ_PORT', 5672))
+rabbitmq_user = os.getenv('RABBITMQ_DEFAULT_USER')
+rabbitmq_password = os.getenv('RABBITMQ_DEFAULT_PASS')
+
+PUBLISH_BATCH_SIZE = int(os.getenv('PUBLISH_BATCH_SIZE', 100))
+PUBLISH_MAX_IN_FLIGHT = int(os.getenv('PUBLISH_MAX_IN_FLIGHT', 1000))
+PUBLISH_CONFIRM_TIMEOUT = float(os.getenv('PUBLISH_CONFIRM_TIMEOUT', 30))
+
+URL_QUEUE = 'url_queue'
+# Las colas por subsite se borran solas tras este tiempo sin uso
+SUBSITE_QUEUE_EXPIRES_MS = int(os.getenv('SUBSITE_QUEUE_EXPIRES_MS', 24 * 3600 * 1000))
+# Prioridades AMQP de las colas por subsite: 0 (por defecto) a URL_QUEUE_MAX_PRIORITY
+URL_QUEUE_MAX_PRIORITY = int(os.getenv('URL_QUEUE_MAX_PRIORITY', 9))
+# Último mensaje que publica el descubrimiento en una cola por subsite
+END_OF_STREAM = "__end_of_stream__"
+
+# Mensajes persistentes, igual que el basic_publish original
+PERSISTENT = pika.BasicProperties(delivery_mode=2)
+
+
+def subsite_queue(base_url: str, subsites: dict) -> str:
+    """
+    Cola propia de un (sitio, subsite), p. ej. `url_queue.arxiv.org.human-mortality`.
+
+    Permite descubrir y despachar varias búsquedas a la vez sin mezclar sus URLs.
+    """
+    parts = [urlparse(base_url).netloc.replace("www.", "")] + [str(value) for value in subsites.values()]
+    return ".".join([URL_QUEUE] + [re.sub(r"[^\w.-]+", "-", part).strip("-").lower() for part in parts if part])
+
+
+def queue_arguments(queue: str):
+    """
+    Argumentos de declaración; publicador y despachador deben declarar la cola con los mismos.
+
+    `url_queue` conserva su declaración original (cambiarla exigiría borrar la
+    cola existente); las colas por subsite admiten prioridades.
+    """
+    if queue.startswith(URL_QUEUE + "."):
+        return {"x-expires": SUBSITE_QUEUE_EXPIRES_MS, "x-max-priority": URL_QUEUE_MAX_PRIORITY}
+    return None
+
+
+def message_properties(priority: int = None) -> pika.BasicProperties:
+    if priority is None:
+        return PERSISTENT
+    return pika.BasicProperties(delivery_mode=2, priority=priority)
+
+
+def default_connection_parameters() -> pika.ConnectionParameters:
+    credentials = pika.PlainCredentials(rabbitmq_user, rabbitmq_password)
+    return pika.ConnectionParameters(host=rabbitmq_host, port=rabbitmq_port, credentials=credentials)
+
+
+class UrlPublisher:
+    """
+    Publicador de URLs a RabbitMQ con confirmaciones del broker (publisher confirms).
+
+    Las URLs se acumulan en un buffer y se publican por lotes sobre una única
+    conexión asíncrona, con como máximo `max_in_flight` mensajes sin confirmar.
+    `flush` solo termina cuando el broker confirmó todo lo publicado; los
+    mensajes rechazados (nack) o pendientes al caerse la conexión se vuelven a
+    publicar tras reconectar.
+    """
+
+    def __init__(self, parameters: pika.ConnectionParameters = None, batch_size: int = PUBLISH_BATCH_SIZE,
+                 max_in_flight: int = PUBLISH_MAX_IN_FLIGHT, confirm_timeout: float = PUBLISH_CONFIRM_TIMEOUT):
+        self.parameters = parameters or default_connection_parameters()
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.confirm_timeout = confirm_timeout
+        self.loop = asyncio.get_running_loop()
+
+        self.buffer = deque()
+        self.stats = Counter()
+        self._connection = None
+        self._channel = None
+        self._declared = set()
+        # delivery_tag -> (routing_key, body, priority) de los mensajes publicados sin confirmar
+        self._pending = {}
+        self._delivery_tag = 0
+        self._window = asyncio.Condition()
+        self._flush_lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._channel is not None and self._channel.is_open
+
+    async def connect(self):
+        if self.is_open:
+            return
+
+        if self._connection is None or not self._connection.is_open:
+            opened = self.loop.create_future()
+            self._connection = AsyncioConnection(
+                self.parameters,
+                on_open_callback=lambda connection: opened.done() or opened.set_result(connection),
+                on_open_error_callback=lambda connection, error: opened.done() or opened.set_exception(AMQPConnectionError(error)),
+                on_close_callback=self._on_connection_closed,
+                custom_ioloop=self.loop,
+            )
+            await opened
+
+        channel_opened = self.loop.create_future()
+        self._connection.channel(on_open_callback=channel_opened.set_result)
+        channel = await channel_opened
+        channel.add_on_close_callback(self._on_channel_closed)
+
+        confirm_selected = self.loop.create_future()
+        channel.confirm_delivery(ack_nack_callback=self._on_delivery_confirmation, callback=confirm_selected.set_result)
+        await confirm_selected
+
+        self._channel = channel
+        self._delivery_tag = 0
+        self._declared = set()
+        logging.info(f"Conectado a RabbitMQ en {self.parameters.host}:{self.parameters.port} con publisher confirms")
+
+    async def declare_queue(self, queue: str):
+        if queue in self._declared and self.is_open:
+            return
+        await self.connect()
+        declared = self.loop.create_future()
+        self._channel.queue_declare(queue=queue, durable=True, arguments=queue_arguments(queue),
+                                    callback=declared.set_result)
+        await declared
+        self._declared.add(queue)
+
+    async def publish(self, body: str, routing_key: str, priority: int = None):
+        """Agrega el mensaje al buffer y publica el lote cuando llega a `batch_size`."""
+        self.buffer.append((routing_key, body, priority))
+        if len(self.buffer) >= self.batch_size:
+            await self.flush()
+
+    async def publish_many(self, bodies, routing_key: str, priority: int = None):
+        for body in bodies:
+            await self.publish(body, routing_key, priority)
+
+    async def flush(self):
+        """Publica todo el buffer y espera a que el broker confirme cada mensaje."""
+        async with self._flush_lock:
+            while self.buffer or self._pending:
+                await self.connect()
+                for queue in {message[0] for message in self.buffer} - self._declared:
+                    await self.declare_queue(queue)
+
+                async with self._window:
+                    while self.buffer and self.is_open:
+                        await self._wait_window(lambda: len(self._pending) < self.max_in_flight or not self.is_open)
+                        if not self.is_open:
+                            break
+                        routing_key, body, priority = message = self.buffer.popleft()
+                        self._channel.basic_publish(exchange='', routing_key=routing_key, body=body,
+                                                    properties=message_properties(priority))
+                        self._delivery_tag += 1
+                        self._pending[self._delivery_tag] = message
+                        self.stats["published"] += 1
+                    await self._wait_window(lambda: not self._pending or not self.is_open)
+
+    async def _wait_window(self, predicate):
+        try:
+            await asyncio.wait_for(self._window.wait_for(predicate), timeout=self.confirm_timeout)
+        except asyncio.TimeoutError:
+            # Sin confirmaciones a tiempo: cerrar la conexión para republicar lo pendiente al reconectar
+            logging.warning(f"RabbitMQ no confirmó {len(self._pending)} mensajes en {self.confirm_timeout}s; reconectando")
+            self._requeue_pending()
+            if self._connection is not None and self._connection.is_open:
+                self._connection.close()
+            self._channel = None
+            raise
+
+    def _on_delivery_confirmation(self, method_frame):
+        method = method_frame.method
+        if method.multiple:
+            # Los tags del diccionario están en orden creciente
+            tags = list(takewhile(lambda tag: tag <= method.delivery_tag, self._pending))
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._pending else []
+
+        confirmed = [self._pending.pop(tag) for tag in tags]
+        if isinstance(method, pika.spec.Basic.Nack):
+            self.stats["nacked"] += len(confirmed)
+            self.stats["republished"] += len(confirmed)
+            self.buffer.extendleft(reversed(confirmed))
+        else:
+            self.stats["confirmed"] += len(confirmed)
+        self.loop.create_task(self._notify_window())
+
+    async def _notify_window(self):
+        async with self._window:
+            self._window.notify_all()
+
+    def _requeue_pending(self):
+        # Lo que quedó sin confirmar se vuelve a publicar (entrega al menos una vez)
+        pending = [self._pending[tag] for tag in sorted(self._pending)]
+        self._pending.clear()
+        self.stats["republished"] += len(pending)
+        self.buffer.extendleft(reversed(pending))
+
+    def discard_pending(self, bodies, routing_key: str) -> int:
+        """
+        Quita del buffer y de los mensajes sin confirmar los `bodies` de `routing_key`.
+
+        Tras un fallo de `flush` los mensajes quedan en el buffer para republicarse;
+        quien los devuelve a otro registro los descarta antes para que un `flush`
+        posterior no los publique. Devuelve cuántos mensajes se quitaron.
+        """
+        bodies = set(bodies)
+        discarded = [message for message in self.buffer if message[0] == routing_key and message[1] in bodies]
+        if discarded:
+            kept = [message for message in self.buffer if not (message[0] == routing_key and message[1] in bodies)]
+            self.buffer.clear()
+            self.buffer.extend(kept)
+
+        tags = [tag for tag, message in self._pending.items() if message[0] == routing_key and message[1] in bodies]
+        for tag in tags:
+            del self._pending[tag]
+        if tags:
+            self.loop.create_task(self._notify_window())
+
+        self.stats["discarded"] += len(discarded) + len(tags)
+        return len(discarded) + len(tags)
+
+    def _on_channel_closed(self, channel, reason):
+        if self._channel is channel:
+            logging.warning(f"Canal de RabbitMQ cerrado: {reason}")
+            self._channel = None
+            self._requeue_pending()
+            self.loop.create_task(self._notify_window())
+
+    def _on_connection_closed(self, connection, reason):
+        if self._connection is connection:
+            self._connection = None
+            self._channel = None
+            self._requeue_pending()
+            self.loop.create_task(self._notify_window())
+
+    def metrics(self) -> dict:
+        return {"buffered": len(self.buffer), "in_flight": len(self._pending), **self.stats}
+
+    async def close(self):
+        """Publica lo pendiente y cierra la conexión."""
+        try:
+            await self.flush()
+        finally:
+            connection = self._connection
+            # Cierre normal: sin republicar ni avisar desde los callbacks de cierre
+            self._channel = None
+            if connection is not None and connection.is_open:
+                closed = self.loop.create_future()
+                connection.add_on_close_callback(lambda *args: closed.done() or closed.set_result(None))
+                connection.close()
+                await closed
+            self._connection = None
+            self._channel = None
+
+
+# Un publicador por event loop: las tareas concurrentes del flujo pueden correr en loops distintos
+url_publishers = {}
+
+
+def get_url_publisher() -> UrlPublisher:
+    """
+    Devuelve el publicador del event loop actual, reutilizando su conexión entre ejecuciones del flujo.
+
+    La conexión está ligada al event loop en el que se abrió.
+    """
+    loop = asyncio.get_running_loop()
+    # Descartar los publicadores de loops ya cerrados
+    for closed_loop in [key for key in url_publishers if key.is_closed()]:
+        del url_publishers[closed_loop]
+    if loop not in url_publishers:
+        url_publishers[loop] = UrlPublisher()
+    return url_publishers[loop]
+
+
+@atexit.register
+def close_url_publisher():
+    # Al terminar el proceso publicar lo que quede en el buffer si el loop sigue disponible
+    for publisher in list(url_publishers.values()):
+        if publisher.loop.is_closed() or publisher.loop.is_running():
+            continue
+        if publisher.buffer or publisher._pending or publisher._connection is not None:
+            publisher.loop.run_until_complete(publisher.close())
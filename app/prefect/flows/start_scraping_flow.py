@@ -1,7 +1,158 @@
+import os
+from collections import deque
+
 from prefect import flow, task
-from app.prefect.tasks.scraping_task import start_scraping_tasks
+from prefect.task_runners import ConcurrentTaskRunner
+from app.helpers.scrape_results import new_run_id
+from app.helpers.url_publisher import subsite_queue
+from app.prefect.tasks.recrawl_task import enqueue_due_urls
+from app.prefect.tasks.scraping_task import collect_scrape_results, start_scraping_tasks
 from app.prefect.tasks.urls_discover import discover_urls
 
+# Máximo de (sitio, búsqueda) descubriéndose y despachándose a la vez
+FLOW_MAX_CONCURRENT_TARGETS = int(os.getenv('FLOW_MAX_CONCURRENT_TARGETS', 8))
+
+
+def arxiv_target(query: str) -> dict:
+    search_url = f'https://arxiv.org/search/?searchtype=all&query={query}&abstracts=show&size=200&order=-announced_date_first'
+    return {"base_url": 'https://arxiv.org/', "search_url": search_url, "subsites": {"query": query},
+            "extract": 'pdf', "pagination": True}
+
+
+def submit_target(target: dict, collect_results: bool = False) -> tuple:
+    """
+    Lanza a la vez el descubrimiento y el despacho de un (sitio, búsqueda).
+
+    Cada uno usa su propia cola: el despachador envía a Celery las URLs a
+    medida que se publican y termina con el END_OF_STREAM del descubrimiento
+    (y, con `collect_results`, cuando llegan los resultados de sus tareas).
+    """
+    queue = subsite_queue(target["base_url"], target.get("subsites", {}))
+    discovered = discover_urls.submit(
+        base_url=target["base_url"], search_url=target["search_url"], subsites=target.get("subsites", {}),
+        extract=target.get("extract", '/'), pagination=target.get("pagination", False),
+        rabbitmq_queue=queue, end_of_stream=True,
+    )
+    dispatched = start_scraping_tasks.submit(
+        base_url=target["base_url"], rabbitmq_queue=queue, extract=target.get("extract", '/'),
+        subsites=target.get("subsites", {}), wait_for_end=True, collect_results=collect_results,
+    )
+    return discovered, dispatched
+
+
+def collect_target(target: dict, discovered, dispatched, results: list) -> dict:
+    # Un (sitio, búsqueda) que falla no detiene a los demás
+    num_discovered_pages = discovered.result(raise_on_failure=False)
+    dispatch_stats = dispatched.result(raise_on_failure=False)
+    result = {"search_url": target["search_url"], "subsites": target.get("subsites", {})}
+    for name, value in (("discovered", num_discovered_pages), ("dispatch", dispatch_stats)):
+        if isinstance(value, BaseException):
+            result.setdefault("errors", {})[name] = repr(value)
+        else:
+            result[name] = value
+    if "dispatch" in result:
+        # Los resultados de las tareas van al reporte de la ejecución, no al resumen por target
+        results.extend(result["dispatch"].pop("results", []))
+    return result
+
+
+@flow(
+    log_prints=True,
+    persist_result=False,
+    task_runner=ConcurrentTaskRunner()
+)
+def scrape_targets_flow(targets: list, max_concurrent_targets: int = FLOW_MAX_CONCURRENT_TARGETS, report: bool = True):
+    """
+    Descubre y despacha muchos (sitio, búsqueda) en paralelo, con a lo sumo
+    `max_concurrent_targets` en curso; al terminar uno se lanza el siguiente.
+
+    Cada target es un dict con base_url, search_url y opcionalmente subsites,
+    extract y pagination (los parámetros de discover_and_scrape_flow). Con
+    `report` espera a las tareas de Celery y devuelve el reporte de cambios de
+    toda la ejecución.
+    """
+    run_id = new_run_id()
+    pending = deque(targets)
+    running = deque()
+    results = []
+    task_results = []
+    while pending or running:
+        while pending and len(running) < max_concurrent_targets:
+            target = pending.popleft()
+            running.append((target, *submit_target(target, collect_results=report)))
+        results.append(collect_target(*running.popleft(), task_results))
+
+    failed = sum(1 for result in results if "errors" in result)
+    print(f"Scraped {len(results)} targets ({failed} with errors).")
+
+    changes = None
+    if report:
+        dispatched = sum(result["dispatch"]["dispatched"] for result in results if "dispatch" in result)
+        changes = collect_scrape_results(run_id=run_id, results=task_results, expected=dispatched)
+    return {"run_id": run_id, "targets": results, "report": changes}
+
+
+@flow(
+    log_prints=True,
+    persist_result=False
+)
+def scraping_arxiv_queries(queries: list, max_concurrent_targets: int = FLOW_MAX_CONCURRENT_TARGETS, report: bool = True):
+    return scrape_targets_flow(targets=[arxiv_target(query) for query in queries],
+                               max_concurrent_targets=max_concurrent_targets, report=report)
+
+
+@flow(
+    log_prints=True,
+    persist_result=False,
+    task_runner=ConcurrentTaskRunner()
+)
+def recrawl_flow(targets: list = [], limit: int = None, max_concurrent_targets: int = FLOW_MAX_CONCURRENT_TARGETS, report: bool = True):
+    """
+    Vuelve a revisar las URLs ya scrapeadas que vencieron según el planificador
+    (ver `app.helpers.recrawl_scheduler`), más urgentes primero y dentro del
+    presupuesto de páginas por hora. Los `targets` (como en
+    scrape_targets_flow) solo sirven para incorporar al planificador las URLs
+    de su registro; se revisan las vencidas de todos los subsites.
+
+    Siempre espera los resultados de las tareas, porque sus deltas ajustan la
+    planificación; `report` solo decide si se escribe el reporte de cambios.
+    """
+    run_id = new_run_id()
+    groups = enqueue_due_urls(targets=targets, limit=limit)
+
+    pending = deque(groups)
+    running = deque()
+    results = []
+    task_results = []
+    while pending or running:
+        while pending and len(running) < max_concurrent_targets:
+            group = pending.popleft()
+            running.append((group, start_scraping_tasks.submit(
+                base_url=group["base_url"], rabbitmq_queue=group["queue"], extract=group["extract"],
+                subsites=group["subsites"], wait_for_end=True, collect_results=True,
+            )))
+        group, dispatched = running.popleft()
+        dispatch_stats = dispatched.result(raise_on_failure=False)
+        if isinstance(dispatch_stats, BaseException):
+            results.append({**group, "errors": {"dispatch": repr(dispatch_stats)}})
+        else:
+            task_results.extend(dispatch_stats.pop("results", []))
+            results.append({**group, "dispatch": dispatch_stats})
+
+    changes = None
+    if report:
+        dispatched = sum(result["dispatch"]["dispatched"] for result in results if "dispatch" in result)
+        changes = collect_scrape_results(run_id=run_id, results=task_results, expected=dispatched)
+    return {"run_id": run_id, "queues": results, "report": changes}
+
+
+@flow(
+    log_prints=True,
+    persist_result=False
+)
+def recrawl_arxiv_queries(queries: list = [], limit: int = None, report: bool = True):
+    return recrawl_flow(targets=[arxiv_target(query) for query in queries], limit=limit, report=report)
+
 
 @flow(
     retries=2,
@@ -10,24 +161,27 @@ from app.prefect.tasks.urls_discover import discover_urls
     persist_result=False
 )
 def scraping_arxiv(query: str):
-    search_url = f'https://arxiv.org/search/?searchtype=all&query={query}&abstracts=show&size=200&order=-announced_date_first'
-    subsites = {"query": query}
-    return discover_and_scrape_flow(base_url='https://arxiv.org/', search_url=search_url, extract='pdf', subsites=subsites, pagination = True)
+    return discover_and_scrape_flow(**arxiv_target(query))
 
 @flow(
     retries=2,
     retry_delay_seconds=10,
     log_prints=True,
-    persist_result=False
+    persist_result=False,
+    task_runner=ConcurrentTaskRunner()
 )
-def discover_and_scrape_flow(base_url: str, search_url: str, subsites: dict = {}, extract: str = '/', pagination: bool=False):
-    # Ejecutar la tarea para descubrir URLs
-    num_discovered_pages = discover_urls(base_url=base_url, search_url=search_url, extract=extract, subsites=subsites, pagination=pagination)
-    
-    # Ejecutar la tarea de scraping
-    start_scraping_tasks(base_url=base_url, extract=extract, subsites=subsites)
-    
-    return {"message": f"Started scraping {num_discovered_pages} pages."}
+def discover_and_scrape_flow(base_url: str, search_url: str, subsites: dict = {}, extract: str = '/', pagination: bool=False, report: bool = True):
+    # Descubrir y despachar a la vez, cada búsqueda en su propia cola
+    target = {"base_url": base_url, "search_url": search_url, "subsites": subsites, "extract": extract, "pagination": pagination}
+    discovered, dispatched = submit_target(target, collect_results=report)
+    num_discovered_pages = discovered.result()
+    dispatch_stats = dispatched.result()
+
+    # Listar los documentos que cambiaron con los resultados de las tareas de Celery
+    task_results = dispatch_stats.pop("results", [])
+    changes = collect_scrape_results(run_id=new_run_id(), results=task_results, expected=dispatch_stats["dispatched"]) if report else None
+
+    return {"message": f"Started scraping {num_discovered_pages} pages.", "dispatch": dispatch_stats, "report": changes}
 
 if __name__ == "__main__":
     # Cambia los parámetros por los valores de prueba que desees usar
@@ -0,0 +1,63 @@
+import logging
+from itertools import groupby
+
+from app.helpers.metrics import get_metrics, timed
+from app.helpers.recrawl_scheduler import get_recrawl_scheduler
+from app.helpers.tree_scraped import TreeScraped
+from app.helpers.url_publisher import END_OF_STREAM, get_url_publisher, subsite_queue
+from prefect import task
+
+
+@task(
+    name="Enqueue due URLs",
+    tags=["Recrawl"],
+    description="Publish the already scraped URLs that are due for a new check, by priority and within the hourly budget"
+)
+@timed("recrawl_enqueue")
+async def enqueue_due_urls(targets: list = [], limit: int = None) -> list:
+    """
+    Publica en la cola de cada subsite las URLs que toca volver a revisar.
+
+    Primero agrega al planificador las URLs del registro de los `targets`
+    que todavía no tienen planificación (las scrapeadas antes de que
+    existiera). Después toma las URLs vencidas de todos los subsites dentro
+    del presupuesto de RECRAWL_PAGES_PER_HOUR y las publica con su prioridad,
+    seguidas de END_OF_STREAM.
+
+    Args:
+    - targets (list): dicts con base_url, subsites y extract, como en scrape_targets_flow.
+    - limit (int): Máximo de URLs de esta ejecución, además del presupuesto.
+
+    Returns:
+    - list: Un dict por cola con base_url, subsites, extract, queue y urls publicadas.
+    """
+    scheduler = get_recrawl_scheduler()
+    tree_scraped = TreeScraped()
+    for target in targets:
+        subsite_key, subsite_value = next(iter(target.get("subsites", {}).items()), (None, None))
+        urls = tree_scraped.iter_urls(target["base_url"], subsite_key, subsite_value)
+        seeded = scheduler.seed(target["base_url"], subsite_key, subsite_value, target.get("extract", '/'), urls)
+        if seeded:
+            logging.info(f"Recrawl: {seeded} URLs of {target['base_url']} {subsite_value} added to the schedule")
+    tree_scraped.close()
+
+    due = scheduler.take_due(limit)
+    publisher = get_url_publisher()
+    metrics = get_metrics()
+    groups = []
+    # Una cola y un despachador por (sitio, subsite)
+    group_key = lambda item: (item["site"], item["subsite_key"], item["subsite_value"], item["extract"])
+    for (site, subsite_key, subsite_value, extract), items in groupby(sorted(due, key=group_key), key=group_key):
+        subsites = {subsite_key: subsite_value} if subsite_key else {}
+        queue = subsite_queue(site, subsites)
+        items = list(items)
+        with metrics.span("publish", urls=len(items)):
+            for item in items:
+                await publisher.publish(item["url"], routing_key=queue, priority=item["priority"])
+            await publisher.publish(END_OF_STREAM, routing_key=queue)
+            await publisher.flush()
+        metrics.inc("scraping_urls_published_total", len(items), queue=queue)
+        groups.append({"base_url": site, "subsites": subsites, "extract": extract, "queue": queue, "urls": len(items)})
+
+    logging.info(f"Recrawl: {len(due)} due URLs in {len(groups)} queues. Scheduler: {scheduler.metrics()}")
+    return groups
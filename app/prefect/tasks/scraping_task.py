@@ -1,46 +1,241 @@
 # services/scraping_service.py
 from app.celery.worker import scrape_page, scrape_pdf
+from app.helpers.metrics import get_metrics, timed
+from app.helpers.recrawl_scheduler import get_recrawl_scheduler
+from app.helpers.scrape_results import SCRAPE_RESULTS_TIMEOUT, STATUS_ERROR, build_report, scrape_result, write_report
+from app.helpers.url_publisher import END_OF_STREAM, URL_QUEUE, queue_arguments
 import os
+import time
+import logging
 import pika
+from celery import group
+from celery.exceptions import TimeoutError as CeleryTimeoutError
 from prefect import task
 
+DISPATCH_BATCH_SIZE = int(os.getenv('DISPATCH_BATCH_SIZE', 100))
+DISPATCH_PREFETCH_COUNT = int(os.getenv('DISPATCH_PREFETCH_COUNT', 500))
+DISPATCH_CHUNK_SIZE = int(os.getenv('DISPATCH_CHUNK_SIZE', 1))
+# Segundos sin mensajes en la cola tras los cuales se da por terminado el despacho
+DISPATCH_INACTIVITY_TIMEOUT = float(os.getenv('DISPATCH_INACTIVITY_TIMEOUT', 5))
+# Esperando END_OF_STREAM: cada cuánto se envía el lote parcial y cuánto se espera como máximo sin mensajes
+DISPATCH_STREAM_POLL_INTERVAL = float(os.getenv('DISPATCH_STREAM_POLL_INTERVAL', 1))
+DISPATCH_STREAM_IDLE_TIMEOUT = float(os.getenv('DISPATCH_STREAM_IDLE_TIMEOUT', 900))
+
+
+def publish_batch(urls: list, base_url: str, extract: str, subsites: dict, chunk_size: int = 1, priorities: list = None):
+    """
+    Publica un lote de URLs en Celery con un único envío.
+
+    Args:
+    - urls (list): URLs del lote.
+    - chunk_size (int): Si es mayor que 1, se agrupan `chunk_size` URLs por mensaje de Celery con `chunks`.
+    - priorities (list): Prioridad AMQP de cada URL (None sin prioridad), la de su mensaje en la cola del subsite.
+
+    Returns:
+    - GroupResult: Un resultado por mensaje, en el orden de `urls`.
+    """
+    # Hora de encolado para medir la latencia de cada tarea hasta que termina
+    enqueued_at = time.time()
+    if extract == 'pdf':
+        task, args = scrape_pdf, [(base_url, url, subsites, enqueued_at) for url in urls]
+    else:
+        task, args = scrape_page, [(url, enqueued_at) for url in urls]
+    priorities = priorities or [None] * len(urls)
+
+    if chunk_size > 1:
+        # Un mensaje por chunk: todos con la prioridad más alta del lote
+        priority = max((priority for priority in priorities if priority is not None), default=None)
+        return task.chunks(args, chunk_size).apply_async(priority=priority)
+    return group(task.s(*task_args).set(priority=priority) if priority is not None else task.s(*task_args)
+                 for task_args, priority in zip(args, priorities)).apply_async()
+
+
+def collect_batch_results(batches: list, chunk_size: int = 1, timeout: float = SCRAPE_RESULTS_TIMEOUT) -> list:
+    """
+    Espera por el backend de resultados de Celery los resultados de los lotes enviados.
+
+    Con el backend `rpc://` solo quien envió las tareas recibe sus
+    resultados, por eso los espera el mismo despachador. Las tareas que fallan
+    cuentan como error y las que no terminan antes de `timeout` no aparecen.
+
+    Args:
+    - batches (list): Tuplas (urls, GroupResult) de `publish_batch`.
+
+    Returns:
+    - list: Resultados de `scrape_result`, en el orden en que terminaron.
+    """
+    deadline = time.monotonic() + timeout
+    step = max(chunk_size, 1)
+    results = []
+    for urls, group_result in batches:
+        # Cada mensaje lleva `step` URLs consecutivas del lote
+        urls_by_task = {task_result.id: urls[index * step:(index + 1) * step]
+                        for index, task_result in enumerate(group_result.results)}
+
+        def on_result(task_id, value):
+            task_urls = urls_by_task[task_id]
+            values = value if step > 1 and isinstance(value, list) else [value] * len(task_urls)
+            for url, task_value in zip(task_urls, values):
+                if isinstance(task_value, dict):
+                    results.append(task_value)
+                else:
+                    results.append(scrape_result(url, STATUS_ERROR, error=repr(task_value)))
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            group_result.get(timeout=remaining, propagate=False, callback=on_result)
+        except CeleryTimeoutError:
+            break
+    return results
+
+
 @task(
     name="Scrape sites",
     tags=["Scraping urls"],
     description="Read the RabbitMQ Queue with Celery and start doing scraping sites with async tasks"
 )
+@timed("dispatch")
 def start_scraping_tasks(
                          base_url:str,
-                         rabbitmq_queue: str = 'url_queue',
+                         rabbitmq_queue: str = URL_QUEUE,
                          extract: str = '/',
-                         subsites: str= {}):
-    
+                         subsites: str= {},
+                         batch_size: int = DISPATCH_BATCH_SIZE,
+                         prefetch_count: int = DISPATCH_PREFETCH_COUNT,
+                         chunk_size: int = DISPATCH_CHUNK_SIZE,
+                         wait_for_end: bool = False,
+                         collect_results: bool = False,
+                         results_timeout: float = SCRAPE_RESULTS_TIMEOUT):
+    """
+    Consume las URLs de `rabbitmq_queue` y las envía a Celery por lotes.
+
+    Por defecto termina tras DISPATCH_INACTIVITY_TIMEOUT segundos sin mensajes.
+    Con `wait_for_end` corre a la vez que el descubrimiento: envía los lotes
+    parciales cuando la cola se vacía y termina al recibir END_OF_STREAM.
+    Con `collect_results` espera además los resultados de las tareas (hasta
+    `results_timeout`), los registra en el planificador de re-scraping y los
+    devuelve en `results` para `collect_scrape_results`.
+    """
+
     rabbitmq_host = os.getenv('RABBITMQ_HOST')
+    rabbitmq_port = int(os.getenv('RABBITMQ_PORT', 5672))
     rabbitmq_user = os.getenv('RABBITMQ_DEFAULT_USER')
     rabbitmq_password = os.getenv('RABBITMQ_DEFAULT_PASS')
 
     # Configurar la conexión a RabbitMQ
     credentials = pika.PlainCredentials(rabbitmq_user, rabbitmq_password)
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host=rabbitmq_host, credentials=credentials))
+    connection = pika.BlockingConnection(pika.ConnectionParameters(host=rabbitmq_host, port=rabbitmq_port, credentials=credentials))
     channel = connection.channel()
-    count = 1
+    # El despachador puede arrancar antes que el descubrimiento: declarar la cola con los mismos argumentos
+    channel.queue_declare(queue=rabbitmq_queue, durable=True, arguments=queue_arguments(rabbitmq_queue))
+
+    # La ventana de prefetch debe admitir al menos un lote completo sin confirmar
+    channel.basic_qos(prefetch_count=max(prefetch_count, batch_size))
+
+    batch = []
+    priorities = []
+    last_delivery_tag = None
+    dispatched = 0
+    sent_batches = []
+    # El throughput se mide desde el primer mensaje, sin contar la espera final por inactividad
+    started_at = busy_until = None
+
+    metrics = get_metrics()
+
+    def flush():
+        nonlocal batch, priorities, dispatched, busy_until
+        if not batch:
+            return
+        try:
+            with metrics.span("dispatch_batch", urls=len(batch)):
+                group_result = publish_batch(batch, base_url=base_url, extract=extract, subsites=subsites,
+                                             chunk_size=chunk_size, priorities=priorities)
+        except Exception:
+            # Devolver el lote a la cola si Celery no pudo publicarlo
+            channel.basic_nack(last_delivery_tag, multiple=True, requeue=True)
+            raise
+        # Confirmar el lote completo solo después de publicarlo en Celery
+        channel.basic_ack(last_delivery_tag, multiple=True)
+        if collect_results:
+            sent_batches.append((batch, group_result))
+        dispatched += len(batch)
+        metrics.inc("scraping_tasks_dispatched_total", len(batch), extract=extract)
+        # Mensajes que siguen en la cola después de cada lote
+        pending = channel.queue_declare(queue=rabbitmq_queue, passive=True).method.message_count
+        metrics.set_gauge("scraping_queue_depth", pending, queue=rabbitmq_queue)
+        batch, priorities = [], []
+        busy_until = time.perf_counter()
+
+    inactivity_timeout = DISPATCH_STREAM_POLL_INTERVAL if wait_for_end else DISPATCH_INACTIVITY_TIMEOUT
+    idle_since = time.monotonic()
     try:
-        for method_frame, properties, body in channel.consume(rabbitmq_queue, inactivity_timeout=5):
+        for method_frame, properties, body in channel.consume(rabbitmq_queue, inactivity_timeout=inactivity_timeout):
             if body is None:
-                # Si no hay más mensajes después del tiempo de inactividad, salir del bucle
-                break
-
-            url = body.decode('utf-8')
-            #TODO: BORRAR COUNT == 1 -> DEBUGGING
-            if count == 1:
-                if extract == 'pdf':
-                    scrape_pdf.delay(base_url=base_url, url=url, subsites=subsites)
-                else:
-                    scrape_page.delay(url)
-                channel.basic_ack(method_frame.delivery_tag)  # Confirmar el mensaje
-            else:
-                break
-            count += 1
+                # Sin mensajes por ahora: enviar lo acumulado mientras el descubrimiento sigue
+                flush()
+                if not wait_for_end or time.monotonic() - idle_since >= DISPATCH_STREAM_IDLE_TIMEOUT:
+                    # Si no hay más mensajes después del tiempo de inactividad, salir del bucle
+                    break
+                continue
+            idle_since = time.monotonic()
+
+            if body.decode('utf-8') == END_OF_STREAM:
+                flush()
+                channel.basic_ack(method_frame.delivery_tag)
+                if wait_for_end:
+                    break
+                continue
+
+            if started_at is None:
+                started_at = time.perf_counter()
+            batch.append(body.decode('utf-8'))
+            # La prioridad del mensaje (URL nueva o urgencia del planificador) sigue hasta la cola de Celery
+            priorities.append(properties.priority)
+            last_delivery_tag = method_frame.delivery_tag
+            busy_until = time.perf_counter()
+            if len(batch) >= batch_size:
+                flush()
+
+        flush()
+        channel.cancel()
 
     finally:
         connection.close()
+
+    elapsed = busy_until - started_at if started_at is not None else 0.0
+    urls_per_second = dispatched / elapsed if elapsed > 0 else 0.0
+    logging.info(f"Dispatched {dispatched} URLs in {elapsed:.2f}s ({urls_per_second:.1f} URLs/s)")
+
+    stats = {"dispatched": dispatched, "seconds": elapsed, "urls_per_second": urls_per_second}
+    if collect_results:
+        stats["results"] = collect_batch_results(sent_batches, chunk_size=chunk_size, timeout=results_timeout)
+        if len(stats["results"]) < dispatched:
+            logging.warning(f"{len(stats['results'])} of {dispatched} results from {rabbitmq_queue} "
+                            f"after {results_timeout:.0f}s")
+        # Los deltas observados ajustan la próxima revisión de cada URL
+        scheduler = get_recrawl_scheduler()
+        subsite_key, subsite_value = next(iter(subsites.items()), (None, None))
+        for result in stats["results"]:
+            scheduler.observe(base_url, subsite_key, subsite_value, extract, result)
+    return stats
+
+
+@task(
+    name="Collect scrape results",
+    tags=["Scraping urls"],
+    description="Write the report of changed documents from the results of the Celery tasks of a run"
+)
+def collect_scrape_results(run_id: str, results: list, expected: int):
+    """
+    Arma y escribe el reporte de cambios de la ejecución con los resultados
+    que devolvieron los despachadores (ver `app.helpers.scrape_results`).
+
+    Returns:
+    - dict: El reporte, con `path` del archivo escrito.
+    """
+    report = build_report(run_id, results, expected=expected)
+    path = write_report(report)
+    logging.info(f"Run {run_id}: {len(report['changed'])} changed documents of {report['total']} ({path})")
+    return {**report, "path": path}
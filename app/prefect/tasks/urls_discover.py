@@ -1,126 +1,104 @@
+import logging
 import os
-import pika
 from dotenv import load_dotenv
 from playwright.async_api import async_playwright
 from app.helpers.tree_scraped import TreeScraped
-from app.helpers.get_content import check_and_click_pagination
+from app.helpers.bloom_filter import subsite_bloom_filter
+from app.helpers.metrics import get_metrics, timed
+from app.helpers.pagination import get_pagination_strategy
+from app.helpers.recrawl_scheduler import NEW_URL_PRIORITY
+from app.helpers.url_publisher import END_OF_STREAM, URL_QUEUE, get_url_publisher
 from prefect import task
 
 
 load_dotenv()
-rabbitmq_host = os.getenv('RABBITMQ_HOST')
-rabbitmq_user = os.getenv('RABBITMQ_DEFAULT_USER')
-rabbitmq_password = os.getenv('RABBITMQ_DEFAULT_PASS')
-
 JSON_FILE_PATH = "app/cache/scraped_sites.json"
+DISCOVERY_BLOOM_FILTER = os.getenv('DISCOVERY_BLOOM_FILTER', 'false').lower() == 'true'
 
 @task(
     name="Discover urls of web site",
     tags=["getting urls"],
     description="From a base url of site scrape all the urls and put them on a RabbitMQ Queue"
 )
-async def discover_urls(base_url: str, search_url: str, subsites: dict, extract: str, pagination: bool = False, rabbitmq_queue: str = 'url_queue'):
-    
+@timed("discover")
+async def discover_urls(base_url: str, search_url: str, subsites: dict, extract: str, pagination: bool = False, rabbitmq_queue: str = URL_QUEUE, use_bloom_filter: bool = DISCOVERY_BLOOM_FILTER, end_of_stream: bool = False):
+    """
+    Descubre las URLs de la búsqueda y publica las nuevas en `rabbitmq_queue`.
+
+    Con `end_of_stream` publica al terminar el marcador END_OF_STREAM, para que
+    el despachador de esa cola (que corre a la vez) sepa cuándo parar.
+    """
     tree_scraped = TreeScraped()
-    # Cargar el archivo JSON de sitios scrapeados
-    scraped_sites = tree_scraped.load_json_file(JSON_FILE_PATH, default_value=[])
+    # Migrar una única vez el archivo JSON de sitios scrapeados al registro SQLite
+    tree_scraped.migrate_from_json(JSON_FILE_PATH)
     
     # Extraer el valor del subsite si existe una palabra reservada en el diccionario subsites
     subsite_key, subsite_value = next(iter(subsites.items()), (None, None))
-    
-    # Verificar si ya existe el sitio y el subsite correspondiente al valor extraído
-    site_entry = next((entry for entry in scraped_sites if entry["site"] == base_url), None)
-    
-    subsite_entry = None
-    if site_entry and "subsites" in site_entry:
-        subsite_entry = next((sub for sub in site_entry["subsites"] if sub.get(subsite_key) == subsite_value), None)
-    
-    # Si existe, obtenemos las URLs previas
-    existing_urls = set(subsite_entry["urls"]) if subsite_entry else set()
 
-    # Configurar la conexión a RabbitMQ
-    credentials = pika.PlainCredentials(rabbitmq_user, rabbitmq_password)
-    connection = pika.BlockingConnection(pika.ConnectionParameters(host=rabbitmq_host, credentials=credentials))
-    channel = connection.channel()
+    # Filtro de Bloom opcional: evita consultar el registro para las URLs que seguro son nuevas
+    bloom_filter = subsite_bloom_filter(base_url, subsite_key, subsite_value, tree_scraped) if use_bloom_filter else None
+
+    # Publicador con confirmaciones del broker; la conexión se reutiliza entre ejecuciones
+    publisher = get_url_publisher()
 
     # Crear la cola si no existe
-    channel.queue_declare(queue=rabbitmq_queue, durable=True)
+    await publisher.declare_queue(rabbitmq_queue)
 
     visited_pages = set()
-    new_urls = []
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-
-        # Navegar a la URL de búsqueda
-        await page.goto(search_url, wait_until='networkidle')
-
-        while True:
-            # Espera a que se cargue el cuerpo de la página
-            await page.wait_for_selector("body")
-
-            # Buscar todos los links que coincidan con el valor de 'extract'
-            links = await page.query_selector_all(f"a[href*='{extract}']")
-
-            for link in links:
-                href = await link.get_attribute("href")
-                if href and href not in visited_pages:
-                    full_url = base_url + href if href.startswith("/") else href
-                    
-                    # Verificar si la URL ya existe
-                    if full_url not in existing_urls:
-                        visited_pages.add(full_url)
-                        new_urls.append(full_url)  # Agregar a las nuevas URLs
-                        channel.basic_publish(
-                            exchange='',
-                            routing_key=rabbitmq_queue,
-                            body=full_url,
-                            properties=pika.BasicProperties(
-                                delivery_mode=2,  # Hacer que el mensaje sea persistente
-                            )
-                        )
-
-            # Si la paginación está habilitada, verificar y hacer clic en el botón de "Next"
-            if pagination:
-                if base_url == "https://arxiv.org/":
-                    has_next_page = await check_and_click_pagination(page, next_selector="a.pagination-next")
-                if not has_next_page:
-                    break  # Si no hay más páginas, salimos del bucle
-            else:
-                break  # Si no hay paginación o no es el caso específico de arxiv.org, salimos del bucle
-
-        await browser.close()
-
-    # Cerrar la conexión con RabbitMQ
-    connection.close()
-
-    # Si hay nuevas URLs, actualizar el archivo JSON
-    if new_urls:
-        if subsite_entry:
-            # Si ya existe el subsite, actualizamos las URLs
-            subsite_entry["urls"].extend(new_urls)
-        else:
-            # Si no existe el subsite, lo creamos
-            new_subsite = {
-                subsite_key: subsite_value,
-                "urls": new_urls
-            }
-
-            if site_entry:
-                # Añadimos el nuevo subsite al sitio existente
-                if "subsites" not in site_entry:
-                    site_entry["subsites"] = []
-                site_entry["subsites"].append(new_subsite)
-            else:
-                # Si no existe el sitio, lo creamos con el nuevo subsite
-                new_site_entry = {
-                    "site": base_url,
-                    "subsites": [new_subsite]
-                }
-                scraped_sites.append(new_site_entry)
-        
-        # Guardar el archivo JSON actualizado
-        tree_scraped.save_json_file(JSON_FILE_PATH, scraped_sites)
-
-    return len(new_urls)
+    num_new_urls = 0
+    metrics = get_metrics()
+
+    try:
+        async with async_playwright() as p:
+            browser = await p.chromium.launch(headless=True)
+            page = await browser.new_page()
+
+            with metrics.span("search_page", url=search_url):
+                # Navegar a la URL de búsqueda
+                await page.goto(search_url, wait_until='networkidle')
+
+                # Espera a que se cargue el cuerpo de la página
+                await page.wait_for_selector("body")
+
+            # Recorrer las páginas de resultados con la estrategia de paginación del sitio
+            pagination_strategy = get_pagination_strategy(base_url, pagination)
+            async for urls in pagination_strategy.iter_page_links(page, search_url, selector=f"a[href*='{extract}']"):
+                # Las URLs ya llegan absolutas y normalizadas; descartar las vistas en páginas anteriores
+                page_urls = [url for url in urls if url not in visited_pages]
+                visited_pages.update(page_urls)
+
+                # Verificar en el registro, con una sola consulta por página, qué URLs son nuevas
+                new_urls = tree_scraped.filter_new_urls(base_url, subsite_key, subsite_value, page_urls, bloom_filter=bloom_filter)
+                # Reclamarlas en el registro antes de publicar: con descubrimientos simultáneos cada URL se publica una vez
+                new_urls = tree_scraped.claim_urls(base_url, subsite_key, subsite_value, new_urls, bloom_filter=bloom_filter)
+                try:
+                    with metrics.span("publish", urls=len(new_urls)):
+                        # En las colas por subsite las URLs nuevas pasan antes que las revisiones del planificador
+                        await publisher.publish_many(new_urls, routing_key=rabbitmq_queue, priority=NEW_URL_PRIORITY)
+                        # Al final de cada página esperar la confirmación del broker
+                        await publisher.flush()
+                except BaseException:
+                    # Sin confirmación del broker las URLs vuelven a quedar libres para la próxima ejecución;
+                    # se sacan antes del buffer para que el flush de END_OF_STREAM no las publique igual
+                    publisher.discard_pending(new_urls, routing_key=rabbitmq_queue)
+                    tree_scraped.release_urls(base_url, subsite_key, subsite_value, new_urls, bloom_filter=bloom_filter)
+                    raise
+                metrics.inc("scraping_urls_published_total", len(new_urls), queue=rabbitmq_queue)
+                num_new_urls += len(new_urls)
+
+            await browser.close()
+    finally:
+        try:
+            if end_of_stream:
+                # Avisar al despachador de esta cola que no llegarán más URLs, también si el descubrimiento falló
+                await publisher.publish(END_OF_STREAM, routing_key=rabbitmq_queue)
+                await publisher.flush()
+        finally:
+            # Cerrar el registro y el filtro también si el descubrimiento o la publicación fallaron
+            logging.info(f"Publisher metrics: {publisher.metrics()}")
+            tree_scraped.close()
+            if bloom_filter is not None:
+                logging.info(f"Bloom filter metrics: {bloom_filter.metrics()}")
+                bloom_filter.close()
+
+    return num_new_urls
@@ -0,0 +1,202 @@
+"""
+Broker AMQP 0-9-1 mínimo en memoria para los benchmarks.
+
+Implementa solo lo que usan los publicadores y el despachador del proyecto:
+apertura de conexión y canal, `queue.declare` (también pasivo, con la
+cantidad de mensajes), `confirm.select`, `basic.publish`, y para consumir
+`basic.qos`, `basic.consume`, `basic.ack`, `basic.nack` y `basic.cancel`.
+Los mensajes pendientes quedan en `broker.queues`. Con confirmaciones
+activas responde un único `basic.ack` (multiple) por cada lectura del
+socket, como RabbitMQ, tras esperar `confirm_latency` segundos (simula el
+fsync de mensajes persistentes). Uso:
+
+    with AmqpStub(confirm_latency=0.001) as broker:
+        parameters = pika.ConnectionParameters(host=broker.host, port=broker.port)
+"""
+import socket
+import socketserver
+import threading
+import time
+from collections import defaultdict, deque
+
+from pika import frame, spec
+
+SERVER_PROPERTIES = {
+    "product": "amqp-stub",
+    "capabilities": {"publisher_confirms": True, "basic.nack": True, "consumer_cancel_notify": True},
+}
+
+
+class AmqpStubHandler(socketserver.BaseRequestHandler):
+    broker = None
+
+    def send(self, channel: int, method):
+        self.request.sendall(frame.Method(channel, method).marshal())
+
+    def deliver(self, channel: int, consumer: dict):
+        """Entrega mensajes de la cola del consumidor hasta llenar su ventana de prefetch."""
+        frames = []
+        while not consumer["prefetch"] or len(consumer["unacked"]) < consumer["prefetch"]:
+            body = self.broker.pop(consumer["queue"])
+            if body is None:
+                break
+            consumer["delivery_tag"] += 1
+            consumer["unacked"][consumer["delivery_tag"]] = body
+            frames.append(frame.Method(channel, spec.Basic.Deliver(
+                consumer_tag=consumer["tag"], delivery_tag=consumer["delivery_tag"],
+                exchange="", routing_key=consumer["queue"])).marshal())
+            frames.append(frame.Header(channel, len(body), spec.BasicProperties()).marshal())
+            frames.append(frame.Body(channel, body).marshal())
+        if frames:
+            self.request.sendall(b"".join(frames))
+
+    def settle(self, consumer: dict, delivery_tag: int, multiple: bool, requeue: bool):
+        tags = [tag for tag in consumer["unacked"] if tag <= delivery_tag] if multiple else [delivery_tag]
+        bodies = [consumer["unacked"].pop(tag) for tag in sorted(tags) if tag in consumer["unacked"]]
+        if requeue:
+            self.broker.requeue(consumer["queue"], bodies)
+
+    def handle(self):
+        # RabbitMQ desactiva Nagle; sin esto cada ack espera al ACK retardado de TCP
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Sin mensajes del cliente se revisa igual la cola para entregar lo publicado por otras conexiones
+        self.request.settimeout(0.05)
+        # Consumidor por canal: cola, consumer_tag, prefetch y mensajes sin confirmar
+        consumers = {}
+        try:
+            self.serve(consumers)
+        finally:
+            # Los mensajes no confirmados vuelven a la cola al cerrarse la conexión
+            for consumer in consumers.values():
+                self.broker.requeue(consumer["queue"], list(consumer["unacked"].values()))
+
+    def serve(self, consumers: dict):
+        data = b""
+        # Publicaciones en curso por canal: [routing_key, tamaño, partes del cuerpo]
+        publishing = {}
+        confirming = {}
+        delivery_tags = defaultdict(int)
+        prefetch = defaultdict(int)
+
+        while True:
+            try:
+                chunk = self.request.recv(65536)
+            except socket.timeout:
+                chunk = None
+            if chunk == b"":
+                return
+            data += chunk or b""
+            acks = {}
+
+            while data:
+                consumed, received = frame.decode_frame(data)
+                if received is None:
+                    break
+                data = data[consumed:]
+                channel = getattr(received, "channel_number", 0)
+
+                if isinstance(received, frame.ProtocolHeader):
+                    self.send(0, spec.Connection.Start(server_properties=SERVER_PROPERTIES, mechanisms="PLAIN", locales="en_US"))
+                elif isinstance(received, frame.Method):
+                    method = received.method
+                    if isinstance(method, spec.Connection.StartOk):
+                        self.send(0, spec.Connection.Tune(channel_max=2047, frame_max=131072, heartbeat=0))
+                    elif isinstance(method, spec.Connection.Open):
+                        self.send(0, spec.Connection.OpenOk())
+                    elif isinstance(method, spec.Connection.Close):
+                        self.send(0, spec.Connection.CloseOk())
+                        return
+                    elif isinstance(method, spec.Channel.Open):
+                        self.send(channel, spec.Channel.OpenOk())
+                    elif isinstance(method, spec.Channel.Close):
+                        consumer = consumers.pop(channel, None)
+                        if consumer is not None:
+                            self.broker.requeue(consumer["queue"], list(consumer["unacked"].values()))
+                        self.send(channel, spec.Channel.CloseOk())
+                    elif isinstance(method, spec.Confirm.Select):
+                        confirming[channel] = True
+                        self.send(channel, spec.Confirm.SelectOk())
+                    elif isinstance(method, spec.Queue.Declare):
+                        messages = self.broker.declare(method.queue)
+                        self.send(channel, spec.Queue.DeclareOk(queue=method.queue, message_count=len(messages), consumer_count=0))
+                    elif isinstance(method, spec.Basic.Publish):
+                        publishing[channel] = [method.routing_key, None, []]
+                    elif isinstance(method, spec.Basic.Qos):
+                        prefetch[channel] = method.prefetch_count
+                        self.send(channel, spec.Basic.QosOk())
+                    elif isinstance(method, spec.Basic.Consume):
+                        tag = method.consumer_tag or f"ctag-{channel}"
+                        consumers[channel] = {"queue": method.queue, "tag": tag, "prefetch": prefetch[channel],
+                                              "delivery_tag": 0, "unacked": {}}
+                        self.send(channel, spec.Basic.ConsumeOk(consumer_tag=tag))
+                    elif isinstance(method, spec.Basic.Ack) and channel in consumers:
+                        self.settle(consumers[channel], method.delivery_tag, method.multiple, requeue=False)
+                    elif isinstance(method, spec.Basic.Nack) and channel in consumers:
+                        self.settle(consumers[channel], method.delivery_tag, method.multiple, method.requeue)
+                    elif isinstance(method, spec.Basic.Cancel):
+                        consumer = consumers.pop(channel, None)
+                        if consumer is not None:
+                            self.broker.requeue(consumer["queue"], list(consumer["unacked"].values()))
+                        self.send(channel, spec.Basic.CancelOk(consumer_tag=method.consumer_tag))
+                elif isinstance(received, frame.Header):
+                    publishing[channel][1] = received.body_size
+                elif isinstance(received, frame.Body):
+                    publishing[channel][2].append(received.fragment)
+
+                message = publishing.get(channel)
+                if message is not None and message[1] is not None and sum(map(len, message[2])) >= message[1]:
+                    del publishing[channel]
+                    self.broker.store(message[0], b"".join(message[2]))
+                    if confirming.get(channel):
+                        delivery_tags[channel] += 1
+                        acks[channel] = delivery_tags[channel]
+
+            if acks and self.broker.confirm_latency:
+                time.sleep(self.broker.confirm_latency)
+            for channel, delivery_tag in acks.items():
+                self.send(channel, spec.Basic.Ack(delivery_tag=delivery_tag, multiple=True))
+            for channel, consumer in consumers.items():
+                self.deliver(channel, consumer)
+
+
+class AmqpStub:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, confirm_latency: float = 0.0):
+        self.confirm_latency = confirm_latency
+        self.queues = {}
+        self._lock = threading.Lock()
+        handler = type("Handler", (AmqpStubHandler,), {"broker": self})
+        self.server = socketserver.ThreadingTCPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return self.server.server_address[0]
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def declare(self, queue: str) -> deque:
+        with self._lock:
+            return self.queues.setdefault(queue, deque())
+
+    def store(self, queue: str, body: bytes):
+        self.declare(queue).append(body)
+
+    def pop(self, queue: str):
+        with self._lock:
+            messages = self.queues.get(queue)
+            return messages.popleft() if messages else None
+
+    def requeue(self, queue: str, bodies: list):
+        # Como RabbitMQ, los mensajes devueltos quedan al frente de la cola
+        self.declare(queue).extendleft(reversed(bodies))
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,51 @@
+"""
+Tasa de falsos positivos, tamaño y memoria del filtro de Bloom escalable.
+
+    python -m benchmarks.bench_bloom_filter --urls 1000000
+"""
+import argparse
+import tempfile
+import time
+
+import psutil
+
+from app.helpers.bloom_filter import ScalableBloomFilter
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=1_000_000)
+    parser.add_argument("--initial-capacity", type=int, default=250_000)
+    parser.add_argument("--error-rate", type=float, default=0.001)
+    args = parser.parse_args()
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    with tempfile.TemporaryDirectory() as directory:
+        bloom_filter = ScalableBloomFilter(directory, initial_capacity=args.initial_capacity, error_rate=args.error_rate)
+
+        start = time.perf_counter()
+        bloom_filter.add_many(f"https://arxiv.org/pdf/{i:08d}" for i in range(args.urls))
+        insert_seconds = time.perf_counter() - start
+
+        # Consultar URLs que nunca se insertaron: todo positivo es un falso positivo
+        start = time.perf_counter()
+        false_positives = sum(bloom_filter.might_contain(f"https://arxiv.org/abs/{i:08d}") for i in range(args.urls))
+        query_seconds = time.perf_counter() - start
+
+        metrics = bloom_filter.metrics()
+        rss_after = process.memory_info().rss
+        bloom_filter.close()
+
+    print(f"urls={args.urls} layers={metrics['layers']}")
+    print(f"insert: {args.urls / insert_seconds:,.0f} urls/s  query: {args.urls / query_seconds:,.0f} urls/s")
+    print(f"false positive rate: observed={false_positives / args.urls:.5f} "
+          f"estimated={metrics['estimated_false_positive_rate']:.5f} target={args.error_rate}")
+    print(f"file size: {metrics['size_bytes'] / 2**20:.1f} MiB "
+          f"({metrics['bytes_per_million_urls'] / 2**20:.2f} MiB per million URLs of capacity)")
+    print(f"RSS growth: {(rss_after - rss_before) / 2**20:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
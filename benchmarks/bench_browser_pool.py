@@ -0,0 +1,106 @@
+"""
+Latencia por URL: un Chromium nuevo por tarea vs. el pool de navegadores.
+
+    python -m benchmarks.bench_browser_pool --urls 50
+
+Con `--cold-start N` comprueba el arranque en frío concurrente: N tareas
+piden su primera página a la vez a un pool sin iniciar (como con el pool
+`threads` de Celery) y debe lanzarse un único Chromium sin errores.
+
+    python -m benchmarks.bench_browser_pool --cold-start 8
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from playwright.async_api import async_playwright
+
+from app.helpers.browser_pool import BrowserPool
+from benchmarks.fixture_server import FixtureServer
+
+
+async def fetch_with_fresh_browser(url: str):
+    # Comportamiento anterior: lanzar y cerrar Chromium por cada URL
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        await page.goto(url)
+        await page.content()
+        await browser.close()
+
+
+async def fetch_with_pool(pool: BrowserPool, url: str):
+    async with pool.page() as page:
+        await page.goto(url)
+        await page.content()
+
+
+def summarize(name: str, latencies: list):
+    latencies = sorted(latencies)
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:<14} n={len(latencies):<4} mean={statistics.mean(latencies) * 1000:8.1f} ms  "
+          f"p50={statistics.median(latencies) * 1000:8.1f} ms  p95={p95 * 1000:8.1f} ms")
+
+
+async def run(urls: list):
+    before = []
+    for url in urls:
+        start = time.perf_counter()
+        await fetch_with_fresh_browser(url)
+        before.append(time.perf_counter() - start)
+
+    pool = BrowserPool(max_contexts=1)
+    await pool.start()
+    after = []
+    try:
+        for url in urls:
+            start = time.perf_counter()
+            await fetch_with_pool(pool, url)
+            after.append(time.perf_counter() - start)
+    finally:
+        await pool.close()
+
+    summarize("fresh browser", before)
+    summarize("browser pool", after)
+
+
+async def run_cold_start(url: str, tasks: int) -> bool:
+    pool = BrowserPool(max_contexts=tasks)
+    launches = []
+    launch = pool._launch
+
+    async def counted_launch(playwright):
+        browser = await launch(playwright)
+        launches.append(browser)
+        return browser
+
+    pool._launch = counted_launch
+    try:
+        results = await asyncio.gather(*(fetch_with_pool(pool, url) for _ in range(tasks)), return_exceptions=True)
+    finally:
+        await pool.close()
+    errors = [result for result in results if isinstance(result, BaseException)]
+    print(f"cold start     tasks={tasks:<4} launches={len(launches)}  errors={len(errors)}")
+    for error in errors[:3]:
+        print(f"  {error!r}")
+    return len(launches) == 1 and not errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--urls", type=int, default=20)
+    parser.add_argument("--cold-start", type=int, default=0, help="Tareas simultáneas sobre un pool sin iniciar")
+    args = parser.parse_args()
+
+    with FixtureServer() as server:
+        if args.cold_start:
+            if not asyncio.run(run_cold_start(server.url("/page/0"), args.cold_start)):
+                raise SystemExit(1)
+            return
+        urls = [server.url(f"/page/{i}") for i in range(args.urls)]
+        asyncio.run(run(urls))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Tiempo total para resolver N CAPTCHAs: consulta bloqueante en serie vs. el solucionador asíncrono.
+
+Un servidor local imita la API de 2Captcha (`in.php` / `res.php`): cada
+CAPTCHA está listo `--solve-seconds` después de enviarse. La versión anterior
+(`requests` + `time.sleep`) los resuelve uno tras otro y bloquea el event
+loop; `CaptchaSolver` con `TwoCaptchaProvider` los resuelve en paralelo.
+
+    python -m benchmarks.bench_captcha --captchas 16 --solve-seconds 2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+from app.captcha.captcha_solver import CaptchaSolver
+from app.captcha.providers import TwoCaptchaProvider
+from app.helpers.http_client import close_http_client
+
+
+class FakeTwoCaptchaHandler(BaseHTTPRequestHandler):
+    solve_seconds = 2.0
+    submitted = {}
+    ids = itertools.count(1)
+
+    def reply(self, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        captcha_id = str(next(self.ids))
+        self.submitted[captcha_id] = time.monotonic()
+        self.reply({"status": 1, "request": captcha_id})
+
+    def do_GET(self):
+        captcha_id = parse_qs(urlsplit(self.path).query)["id"][0]
+        if time.monotonic() - self.submitted[captcha_id] < self.solve_seconds:
+            self.reply({"status": 0, "request": "CAPCHA_NOT_READY"})
+        else:
+            self.reply({"status": 1, "request": f"token-{captcha_id}"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+def solve_blocking(api_url: str, poll_interval: float) -> str:
+    # Comportamiento anterior de solve_recaptcha
+    response = requests.post(f"{api_url}/in.php", data={"key": "test", "method": "userrecaptcha", "json": 1})
+    captcha_id = response.json().get("request")
+    while True:
+        result = requests.get(f"{api_url}/res.php?key=test&action=get&id={captcha_id}&json=1").json()
+        if result.get("status") == 1:
+            return result.get("request")
+        time.sleep(poll_interval)
+
+
+async def solve_concurrently(api_url: str, captchas: int, poll_interval: float, max_concurrent: int) -> list:
+    provider = TwoCaptchaProvider(api_key="test", api_url=api_url, poll_interval=poll_interval)
+    solver = CaptchaSolver(provider=provider, max_concurrent_solves=max_concurrent)
+    try:
+        return await asyncio.gather(*(solver.solve_token("site-key", f"https://example.org/{i}") for i in range(captchas)))
+    finally:
+        await close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--captchas", type=int, default=16)
+    parser.add_argument("--solve-seconds", type=float, default=2.0)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    parser.add_argument("--max-concurrent", type=int, default=8)
+    args = parser.parse_args()
+
+    handler = type("Handler", (FakeTwoCaptchaHandler,), {"solve_seconds": args.solve_seconds, "submitted": {}})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    api_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+
+    start = time.perf_counter()
+    for _ in range(args.captchas):
+        solve_blocking(api_url, args.poll_interval)
+    blocking_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    tokens = asyncio.run(solve_concurrently(api_url, args.captchas, args.poll_interval, args.max_concurrent))
+    async_seconds = time.perf_counter() - start
+    httpd.shutdown()
+
+    print(f"{'modo':<28} {'captchas':>8} {'segundos':>9}")
+    print(f"{'bloqueante en serie':<28} {args.captchas:>8} {blocking_seconds:9.2f}")
+    print(f"{f'asíncrono (máx. {args.max_concurrent})':<28} {len(tokens):>8} {async_seconds:9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Páginas/s del crawler de sitio según la concurrencia, sobre un sitio local de varias páginas.
+
+El sitio es un árbol binario de páginas (`/site/<n>` enlaza a sus dos hijas
+y a la raíz) con enlaces relativos, fragmentos y parámetros de seguimiento
+que el crawler debe deduplicar.
+
+    python -m benchmarks.bench_crawler --pages 200 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from app.helpers.browser_pool import get_browser_pool
+from app.helpers.crawler import SiteCrawler
+from benchmarks.fixture_server import FixtureServer
+
+
+def site_page(index: int, pages: int) -> bytes:
+    children = [child for child in (2 * index + 1, 2 * index + 2) if child < pages]
+    links = "".join(f'<li><a href="/site/{child}">Page {child}</a> <a href="/site/{child}?utm_source=x#top">#</a></li>'
+                    for child in children)
+    paragraphs = "".join(f"<p>Paragraph {i} of page {index}.</p>" for i in range(20))
+    return (f'<html><head><title>Page {index}</title></head><body><h1>Page {index}</h1>'
+            f'<a href="/site/0">Home</a><ul>{links}</ul>{paragraphs}</body></html>').encode()
+
+
+async def run(start_url: str, pages: int, concurrency_levels: list, politeness_delay: float):
+    try:
+        for concurrency in concurrency_levels:
+            with tempfile.TemporaryDirectory() as directory:
+                output_path = os.path.join(directory, "crawl.jsonl")
+                crawler = SiteCrawler(start_url, output_path, concurrency=concurrency, max_pages=pages,
+                                      max_depth=pages, politeness_delay=politeness_delay)
+                stats = await crawler.run()
+                print(f"concurrency={concurrency:<3} pages={stats['pages']:<5} errors={stats['errors']:<3} "
+                      f"seconds={stats['seconds']:7.2f}  pages/s={stats['pages_per_second']:6.1f}")
+    finally:
+        await get_browser_pool().close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--politeness-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    routes = {f"/site/{i}": (200, "text/html; charset=utf-8", site_page(i, args.pages)) for i in range(args.pages)}
+    with FixtureServer(routes=routes) as server:
+        asyncio.run(run(server.url("/site/0"), args.pages, args.concurrency, args.politeness_delay))
+
+
+if __name__ == "__main__":
+    main()
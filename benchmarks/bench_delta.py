@@ -0,0 +1,101 @@
+"""
+Tiempo y valor del delta por estrategia sobre documentos sintéticos de 10 KB a 10 MB.
+
+Los documentos imitan la salida de `page.get_text()` de PyMuPDF: líneas de
+8-14 palabras agrupadas en párrafos. La versión nueva reemplaza una fracción de
+las palabras (0.1% y 1% por defecto), dispersas por todo el documento
+(`scattered`) o en un único tramo contiguo (`localized`), sin tocar los saltos
+de línea.
+
+Cada fila mide el camino completo desde el texto extraído:
+
+- `legacy`: el camino anterior, `clean_text` + `SequenceMatcher` sobre
+  `splitlines()` (el antiguo `GetDelta.calculate_text_delta`). Como
+  `clean_text` deja el texto en una sola línea, el delta sólo vale 0 o 1.
+- `lines`: `SequenceMatcher` sobre las líneas del texto extraído sin limpiar,
+  es decir, lo que costaría el diff por líneas si se conservaran los saltos.
+- el resto: `clean_text` + `compute_delta` con cada estrategia de
+  `delta_engine` (la ruta actual de `snapshot_store.commit`).
+
+    python -m benchmarks.bench_delta --sizes 10000 100000 1000000 10000000
+"""
+import argparse
+import difflib
+import random
+import time
+
+from app.helpers.delta_engine import STRATEGIES, compute_delta
+from app.helpers.get_content import clean_text
+
+VOCABULARY = [f"word{i}" for i in range(5000)]
+
+
+def synthetic_document(size: int, rng: random.Random) -> str:
+    paragraphs = []
+    length = 0
+    while length < size:
+        lines = []
+        for _ in range(rng.randint(3, 12)):
+            line = " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(8, 14)))
+            lines.append(line)
+            length += len(line) + 1
+        paragraphs.append("\n".join(lines))
+        length += 1
+    return "\n\n".join(paragraphs) + "\n"
+
+
+def mutate(text: str, ratio: float, rng: random.Random, localized: bool) -> str:
+    # Separa palabras de separadores para reemplazar palabras sin mover los saltos de línea
+    tokens = text.replace("\n", " \n ").split(" ")
+    positions = [index for index, token in enumerate(tokens) if token and token != "\n"]
+    count = max(1, int(len(positions) * ratio))
+    if localized:
+        start = rng.randrange(len(positions) - count + 1)
+        indexes = positions[start:start + count]
+    else:
+        indexes = rng.sample(positions, count)
+    for index in indexes:
+        tokens[index] = rng.choice(VOCABULARY)
+    return " ".join(tokens).replace(" \n ", "\n")
+
+
+def legacy_delta(old_text: str, new_text: str) -> float:
+    diff = difflib.SequenceMatcher(None, clean_text(old_text).splitlines(), clean_text(new_text).splitlines())
+    return 1 - diff.ratio()
+
+
+def lines_delta(old_text: str, new_text: str) -> float:
+    diff = difflib.SequenceMatcher(None, old_text.splitlines(), new_text.splitlines())
+    return 1 - diff.ratio()
+
+
+def strategy_delta(strategy: str):
+    return lambda old_text, new_text: compute_delta(clean_text(old_text), clean_text(new_text), strategy=strategy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000, 10_000_000])
+    parser.add_argument("--change-ratios", type=float, nargs="+", default=[0.001, 0.01])
+    args = parser.parse_args()
+
+    # `sequence` sobre texto limpio es el mismo caso degenerado que `legacy`
+    rows = [("legacy", legacy_delta), ("lines", lines_delta)]
+    rows += [(strategy, strategy_delta(strategy)) for strategy in STRATEGIES if strategy != "sequence"]
+
+    rng = random.Random(42)
+    print(f"{'size':>10}  {'ratio':>6}  {'edits':<9}  {'strategy':<9} {'seconds':>9}  delta")
+    for size in args.sizes:
+        old_text = synthetic_document(size, rng)
+        for ratio in args.change_ratios:
+            for edits in ("scattered", "localized"):
+                new_text = mutate(old_text, ratio, rng, localized=edits == "localized")
+                for name, delta_fn in rows:
+                    start = time.perf_counter()
+                    delta = delta_fn(old_text, new_text)
+                    seconds = time.perf_counter() - start
+                    print(f"{size:>10}  {ratio:>6}  {edits:<9}  {name:<9} {seconds:9.4f}  {delta:.4f}")
+
+
+if __name__ == "__main__":
+    main()
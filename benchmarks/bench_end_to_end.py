@@ -0,0 +1,311 @@
+"""
+Benchmark de punta a punta del flujo de arXiv sin servicios externos.
+
+Levanta un servidor local que imita la búsqueda de arXiv (con paginación
+`start=`/`size=`) y los PDFs de cada resultado, y un broker AMQP en memoria
+(`AmqpStub`) en lugar de RabbitMQ. Ejecuta las funciones reales del flujo:
+`discover_urls` (Playwright + paginación HTTP + publicación en `url_queue`),
+`start_scraping_tasks` (consumo de la cola y envío a Celery) y las tareas
+`scrape_pdf` (descarga, extracción y delta).
+
+Celery corre en modo eager (cada tarea se ejecuta al enviarla, en serie) o,
+con `--celery worker`, en un worker del mismo proceso con el pool `threads`
+sobre un broker `memory://`, como en producción.
+
+Informa URLs/s, latencia por URL (p50/p95 desde que se encola en Celery
+hasta que termina), RSS máximo del árbol de procesos, CPU por fase y tiempo
+por etapa (traza de `app.helpers.metrics`). El resultado se guarda en
+`benchmarks/results/end_to_end-<commit>.json`; con `--compare` se muestra la
+diferencia con otra ejecución.
+
+Requiere Prefect y Chromium de Playwright (`playwright install chromium`).
+
+    python -m benchmarks.bench_end_to_end --results 400 --page-size 100 --celery worker
+    python -m benchmarks.bench_end_to_end --compare benchmarks/results/end_to_end-abc1234.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+import psutil
+
+from benchmarks.amqp_stub import AmqpStub
+from benchmarks.fixture_server import FixtureServer, render_pdf, render_search_results
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = REPO_DIR / "benchmarks" / "results"
+QUERY = "human mortality"
+
+
+class ProcessTreeSampler:
+    """Muestrea RSS y tiempo de CPU del proceso y de todos sus descendientes (navegador, pool de PDFs)."""
+
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.peak_rss = 0
+        # pid -> último tiempo de CPU visto; los procesos que terminan conservan su último valor
+        self._cpu = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def sample(self):
+        rss = 0
+        for process in [self.process] + self.process.children(recursive=True):
+            try:
+                rss += process.memory_info().rss
+                times = process.cpu_times()
+            except psutil.Error:
+                continue
+            with self._lock:
+                self._cpu[process.pid] = times.user + times.system
+        self.peak_rss = max(self.peak_rss, rss)
+
+    def cpu_seconds(self) -> dict:
+        self.sample()
+        with self._lock:
+            own = self._cpu.get(self.process.pid, 0.0)
+            return {"self": own, "children": sum(self._cpu.values()) - own}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def cpu_delta(before: dict, after: dict) -> dict:
+    return {key: round(after[key] - before[key], 3) for key in before}
+
+
+def git_revision() -> dict:
+    def git(*args):
+        return subprocess.run(["git", *args], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    return {"commit": git("rev-parse", "--short", "HEAD") or "unknown", "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def search_route(total: int, origin: str):
+    def route(path: str):
+        query = {key: values[0] for key, values in parse_qs(urlsplit(path).query).items()}
+        body = render_search_results(query.get("query", QUERY), total, start=int(query.get("start", 0)),
+                                     size=int(query.get("size", 50)), origin=origin)
+        return 200, "text/html; charset=utf-8", body
+    return route
+
+
+def configure_environment(workdir: str, broker: AmqpStub, args):
+    """Variables que leen los módulos de `app` al importarse; deben fijarse antes de importarlos."""
+    os.environ.update({
+        "RABBITMQ_HOST": broker.host,
+        "RABBITMQ_PORT": str(broker.port),
+        "RABBITMQ_DEFAULT_USER": "guest",
+        "RABBITMQ_DEFAULT_PASS": "guest",
+        "CELERY_BROKER_URL": "memory://",
+        "CELERY_RESULT_BACKEND": "cache+memory://",
+        "CELERY_WORKER_CONCURRENCY": str(args.concurrency),
+        "WORKER_ASYNC_CONCURRENCY": str(args.concurrency),
+        "DISPATCH_INACTIVITY_TIMEOUT": "1",
+        "METRICS_TRACE_DIR": os.path.join(workdir, "traces"),
+        # El servidor local no limita la tasa: el limitador parte del máximo
+        "RATE_LIMIT_INITIAL_RATE": str(args.rate_limit),
+        "RATE_LIMIT_MAX_RATE": str(args.rate_limit),
+        "RATE_LIMIT_BURST": str(args.rate_limit),
+        "RATE_LIMIT_INITIAL_CONCURRENCY": str(args.concurrency),
+        "RATE_LIMIT_MAX_CONCURRENCY": str(max(args.concurrency, 32)),
+    })
+
+
+def compare(current: dict, previous: dict):
+    rows = [
+        ("URLs/s (scraping)", ("scrape", "urls_per_second")),
+        ("URLs/s (punta a punta)", ("urls_per_second",)),
+        ("latencia p50 s", ("latency", "p50")),
+        ("latencia p95 s", ("latency", "p95")),
+        ("RSS máximo MB", ("peak_rss_mb",)),
+        ("CPU discover s", ("discover", "cpu", "self")),
+        ("CPU scraping s", ("scrape", "cpu", "self")),
+        ("CPU scraping hijos s", ("scrape", "cpu", "children")),
+    ]
+
+    def lookup(result, keys):
+        for key in keys:
+            result = result.get(key, {}) if isinstance(result, dict) else {}
+        return result if isinstance(result, (int, float)) else None
+
+    print(f"\n{'métrica':<26} {previous['revision']['commit']:>12} {current['revision']['commit']:>12} {'cambio':>8}")
+    for name, keys in rows:
+        old, new = lookup(previous, keys), lookup(current, keys)
+        if old is None or new is None:
+            continue
+        change = f"{(new - old) / old:+.0%}" if old else ""
+        print(f"{name:<26} {old:12.3f} {new:12.3f} {change:>8}")
+
+
+def run(args, workdir: str) -> dict:
+    results = args.results
+    with FixtureServer(delay=args.server_delay) as server, AmqpStub(confirm_latency=args.confirm_latency) as broker:
+        origin = server.base_url
+        server.httpd.RequestHandlerClass.routes.update({
+            "/search/": search_route(results, origin),
+            **{f"/pdf/2401.{i:05d}": (200, "application/pdf", render_pdf(f"Paper 2401.{i:05d}", args.pdf_pages))
+               for i in range(results)},
+        })
+        configure_environment(workdir, broker, args)
+
+        from celery.signals import task_postrun, worker_ready
+
+        from app.celery.worker import celery, run_async, stop_async_resources
+        from app.helpers.metrics import get_metrics, summarize_trace
+        from app.helpers.pagination import PAGINATION_STRATEGIES
+        from app.prefect.tasks.scraping_task import start_scraping_tasks
+        from app.helpers.url_publisher import get_url_publisher
+        from app.prefect.tasks.urls_discover import discover_urls
+
+        base_url = f"{origin}/"
+        search_url = f"{origin}/search/?searchtype=all&query={quote_plus(QUERY)}&abstracts=show&size={args.page_size}&order=-announced_date_first"
+        subsites = {"query": QUERY}
+        # El servidor local se pagina igual que arXiv
+        PAGINATION_STRATEGIES[base_url] = PAGINATION_STRATEGIES["https://arxiv.org/"]
+
+        completed = []
+        completed_lock = threading.Lock()
+
+        @task_postrun.connect(weak=False)
+        def count_completed(**kwargs):
+            with completed_lock:
+                completed.append(time.perf_counter())
+
+        worker = None
+        if args.celery == "eager":
+            celery.conf.task_always_eager = True
+        else:
+            ready = threading.Event()
+            worker_ready.connect(lambda **kwargs: ready.set(), weak=False)
+            # El transporte en memoria consulta la cola cada segundo por defecto
+            celery.conf.broker_transport_options = {"polling_interval": 0.01}
+            worker = celery.Worker(pool="threads", concurrency=args.concurrency, loglevel="WARNING", quiet=True,
+                                   redirect_stdouts=False, without_heartbeat=True, without_mingle=True,
+                                   without_gossip=True)
+            threading.Thread(target=worker.start, daemon=True).start()
+            ready.wait(30)
+
+        async def discover():
+            try:
+                return await discover_urls.fn(base_url=base_url, search_url=search_url, subsites=subsites,
+                                              extract="pdf", pagination=True)
+            finally:
+                await get_url_publisher().close()
+
+        with ProcessTreeSampler() as sampler:
+            # Descubrimiento en el mismo loop que usarán las tareas, como en un worker
+            cpu_start = sampler.cpu_seconds()
+            discover_start = time.perf_counter()
+            discovered = run_async(discover())
+            discover_seconds = time.perf_counter() - discover_start
+            cpu_discovered = sampler.cpu_seconds()
+
+            scrape_start = time.perf_counter()
+            dispatch = start_scraping_tasks.fn(base_url=base_url, extract="pdf", subsites=subsites)
+            deadline = time.monotonic() + args.timeout
+            while len(completed) < dispatch["dispatched"] and time.monotonic() < deadline:
+                time.sleep(0.05)
+            scrape_seconds = (max(completed) if completed else time.perf_counter()) - scrape_start
+
+            if worker is not None:
+                worker.stop()
+            # Cierra el navegador, el cliente HTTP, el pool de PDFs y la traza
+            stop_async_resources()
+            cpu_end = sampler.cpu_seconds()
+            peak_rss = sampler.peak_rss
+
+        trace = summarize_trace([get_metrics().trace_path]) if get_metrics().trace_path else {"stages": {}, "tasks": {}}
+
+    latency = trace["tasks"].get("scrape_pdf", {})
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "urls": {"discovered": discovered, "dispatched": dispatch["dispatched"], "completed": len(completed)},
+        "discover": {"seconds": round(discover_seconds, 3), "cpu": cpu_delta(cpu_start, cpu_discovered)},
+        "scrape": {
+            "seconds": round(scrape_seconds, 3),
+            "urls_per_second": round(len(completed) / scrape_seconds, 2) if scrape_seconds else 0.0,
+            "dispatch_urls_per_second": round(dispatch["urls_per_second"], 2),
+            "cpu": cpu_delta(cpu_discovered, cpu_end),
+        },
+        "urls_per_second": round(len(completed) / (discover_seconds + scrape_seconds), 2),
+        "latency": {key: round(latency[key], 4) for key in ("p50", "p95", "max") if key in latency},
+        "peak_rss_mb": round(peak_rss / 2 ** 20, 1),
+        "stages": {
+            name: {key: round(value, 4) if isinstance(value, float) else value for key, value in stage.items()}
+            for name, stage in trace["stages"].items()
+        },
+        "max_queue_depth": trace.get("max_queue_depth", {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--results", type=int, default=400, help="Resultados de la búsqueda (= PDFs)")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--pdf-pages", type=int, default=5)
+    parser.add_argument("--server-delay", type=float, default=0.0, help="Latencia simulada del servidor en segundos")
+    parser.add_argument("--confirm-latency", type=float, default=0.0005)
+    parser.add_argument("--celery", choices=("eager", "worker"), default="eager")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate-limit", type=float, default=1000)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--compare", type=Path, help="Resultado anterior para comparar")
+    args = parser.parse_args()
+
+    output = args.output or RESULTS_DIR / f"end_to_end-{git_revision()['commit']}.json"
+    output = output.resolve()
+    previous = json.loads(args.compare.read_text()) if args.compare else None
+
+    # Los módulos de `app` usan rutas relativas (app/cache/...): se ejecuta en un directorio temporal
+    cwd = os.getcwd()
+    sys.path.insert(0, str(REPO_DIR))
+    with tempfile.TemporaryDirectory() as workdir:
+        os.makedirs(os.path.join(workdir, "app", "cache"))
+        os.chdir(workdir)
+        try:
+            result = run(args, workdir)
+        finally:
+            os.chdir(cwd)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, indent=2, ensure_ascii=False))
+
+    urls = result["urls"]
+    print(f"URLs: {urls['discovered']} descubiertas, {urls['dispatched']} despachadas, {urls['completed']} terminadas")
+    print(f"discover: {result['discover']['seconds']:.2f}s  scraping: {result['scrape']['seconds']:.2f}s "
+          f"({result['scrape']['urls_per_second']:.1f} URLs/s)  punta a punta: {result['urls_per_second']:.1f} URLs/s")
+    print(f"latencia por URL: {result['latency']}  RSS máximo: {result['peak_rss_mb']} MB")
+    print(f"CPU discover: {result['discover']['cpu']}  CPU scraping: {result['scrape']['cpu']}")
+    print(f"{'etapa':<20} {'n':>6} {'total s':>9} {'p50 s':>8} {'p95 s':>8} {'errores':>8}")
+    for name, stage in sorted(result["stages"].items(), key=lambda item: -item[1]["total"]):
+        print(f"{name:<20} {stage['count']:>6} {stage['total']:9.2f} {stage['p50']:8.3f} {stage['p95']:8.3f} {stage['errors']:>8}")
+    print(f"Resultado guardado en {output}")
+    if previous is not None:
+        compare(result, previous)
+
+
+if __name__ == "__main__":
+    main()
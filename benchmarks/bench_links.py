@@ -0,0 +1,79 @@
+"""
+Micro-benchmark de la extracción de links sobre una página de resultados guardada.
+
+Compara en el navegador la lectura de href elemento a elemento
+(`query_selector_all` + `get_attribute`, una ida y vuelta por link) con
+`extract_links` (una sola evaluación), y mide la extracción sobre HTML
+descargado y la normalización. Sin Chromium instalado solo se miden las dos
+últimas.
+
+    python -m benchmarks.bench_links --html benchmarks/fixtures/arxiv_search.html --repeat 20
+"""
+import argparse
+import asyncio
+import time
+from pathlib import Path
+
+from app.helpers.links import extract_links, extract_links_from_html, normalize_urls
+
+FIXTURE = Path(__file__).parent / "fixtures" / "arxiv_search.html"
+BASE_URL = "https://arxiv.org/search/?searchtype=all&query=human+mortality"
+SELECTOR = "a[href*='pdf']"
+
+
+def timed(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - start) / repeat, result
+
+
+async def bench_browser(html: str, repeat: int) -> list:
+    from playwright.async_api import async_playwright
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page(base_url=BASE_URL)
+        await page.set_content(html)
+
+        async def per_element():
+            links = await page.query_selector_all(SELECTOR)
+            return [await link.get_attribute("href") for link in links]
+
+        results = []
+        for name, function in (("browser, un await por link", per_element),
+                               ("browser, extract_links", lambda: extract_links(page, SELECTOR, base_url=BASE_URL))):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                links = await function()
+            results.append((name, (time.perf_counter() - start) / repeat, len(links)))
+        await browser.close()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--html", type=Path, default=FIXTURE)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    html = args.html.read_text()
+    results = []
+    try:
+        results.extend(asyncio.run(bench_browser(html, args.repeat)))
+    except Exception as e:
+        print(f"Benchmark en navegador omitido: {e.__class__.__name__}: {str(e).splitlines()[0]}")
+
+    seconds, links = timed(lambda: extract_links_from_html(html, SELECTOR, BASE_URL), args.repeat)
+    results.append(("HTML, extract_links_from_html", seconds, len(links)))
+    hrefs = [f"/format/{url.rsplit('/', 1)[1]}?utm_source=search#formats" for url in links] + links
+    seconds, urls = timed(lambda: normalize_urls(hrefs, BASE_URL), args.repeat)
+    results.append((f"normalize_urls ({len(hrefs)} hrefs)", seconds, len(urls)))
+
+    print(f"{'modo':<36} {'ms':>8} {'links':>6}")
+    for name, seconds, count in results:
+        print(f"{name:<36} {seconds * 1000:8.2f} {count:>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Tiempo, peticiones y bytes por perfil de carga sobre una página con recursos pesados.
+
+La página de prueba enlaza imágenes, una hoja de estilos, una fuente y un
+script que agrega resultados al hacer scroll (carga diferida). Se compara la
+carga original (`networkidle` + scroll + espera fija de 2 s) con los perfiles
+de `app.helpers.load_profiles`.
+
+    python -m benchmarks.bench_load_profiles --pages 10
+"""
+import argparse
+import asyncio
+import time
+
+from app.helpers.browser_pool import BrowserPool
+from app.helpers.load_profiles import LOAD_PROFILES, load_profile_report
+from benchmarks.fixture_server import FixtureServer
+
+IMAGES = 20
+IMAGE_BYTES = 50_000
+
+LAZY_SCRIPT = b"""
+let loaded = 0;
+window.addEventListener("scroll", () => {
+    if (loaded >= 5 || window.scrollY + window.innerHeight < document.body.scrollHeight - 10) return;
+    loaded += 1;
+    const section = document.createElement("section");
+    section.style.height = "1500px";
+    section.textContent = "Lazy section " + loaded;
+    document.body.appendChild(section);
+});
+"""
+
+
+def heavy_page(index: int) -> bytes:
+    images = "".join(f'<img src="/static/img/{i}.png" width="200" height="200">' for i in range(IMAGES))
+    return (
+        f'<html><head><title>Page {index}</title><link rel="stylesheet" href="/static/site.css">'
+        f'<script src="/static/lazy.js" defer></script></head>'
+        f'<body><h1>Page {index}</h1><p style="height: 1500px">Contenido {index}</p>{images}</body></html>'
+    ).encode()
+
+
+def fixture_routes(pages: int) -> dict:
+    routes = {f"/page/{i}": (200, "text/html; charset=utf-8", heavy_page(i)) for i in range(pages)}
+    routes.update({f"/static/img/{i}.png": (200, "image/png", b"\x89PNG" + b"\0" * IMAGE_BYTES) for i in range(IMAGES)})
+    routes["/static/site.css"] = (200, "text/css", b"@font-face { font-family: F; src: url(/static/font.woff2); } body { font-family: F; }")
+    routes["/static/font.woff2"] = (200, "font/woff2", b"\0" * 100_000)
+    routes["/static/lazy.js"] = (200, "application/javascript", LAZY_SCRIPT)
+    return routes
+
+
+async def load_original(page, url: str):
+    # Comportamiento anterior de scrape_page_async
+    await page.goto(url, wait_until='networkidle')
+    await page.wait_for_selector("body")
+    await page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
+    await page.wait_for_timeout(2000)
+
+
+async def run(urls: list):
+    pool = BrowserPool(max_contexts=1)
+    await pool.start()
+    try:
+        start = time.perf_counter()
+        for url in urls:
+            async with pool.page() as page:
+                await load_original(page, url)
+        print(f"{'original':<10} avg={(time.perf_counter() - start) / len(urls) * 1000:8.1f} ms")
+
+        for profile in LOAD_PROFILES.values():
+            for url in urls:
+                async with pool.page() as page:
+                    await profile.load(page, url)
+    finally:
+        await pool.close()
+
+    for row in load_profile_report():
+        print(f"{row['profile']:<10} avg={row['avg_seconds'] * 1000:8.1f} ms  requests={row['avg_requests']:5.1f}  "
+              f"blocked={row['avg_blocked']:5.1f}  bytes={row['avg_bytes']:10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+
+    with FixtureServer(routes=fixture_routes(args.pages)) as server:
+        asyncio.run(run([server.url(f"/page/{i}") for i in range(args.pages)]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Throughput de extracción de PDFs según el número de procesos del pool.
+
+    python -m benchmarks.bench_pdf_extraction --docs 500 --pages 10
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import fitz
+
+from app.helpers.pdf_extraction import PdfExtractionService
+
+
+def build_corpus(directory: str, docs: int, pages: int) -> list:
+    paths = []
+    for i in range(docs):
+        pdf = fitz.open()
+        for page_number in range(pages):
+            page = pdf.new_page()
+            text = f"Document {i} page {page_number}. " + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 12
+            page.insert_textbox(fitz.Rect(50, 50, 550, 800), text)
+        path = os.path.join(directory, f"doc_{i}.pdf")
+        pdf.save(path)
+        pdf.close()
+        paths.append(path)
+    return paths
+
+
+async def run(paths: list, max_workers: int) -> float:
+    service = PdfExtractionService(max_workers=max_workers)
+    try:
+        # Calentar el pool para no medir el arranque de los procesos
+        await asyncio.gather(*(service.extract(paths[0]) for _ in range(max_workers)))
+        start = time.perf_counter()
+        await asyncio.gather(*(service.extract(path) for path in paths))
+        return time.perf_counter() - start
+    finally:
+        service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--pages", type=int, default=10)
+    args = parser.parse_args()
+
+    cpu_count = os.cpu_count() or 1
+    worker_counts = sorted({1, 2, 4, cpu_count} & set(range(1, cpu_count + 1)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = build_corpus(directory, args.docs, args.pages)
+        baseline = None
+        for workers in worker_counts:
+            seconds = asyncio.run(run(paths, workers))
+            docs_per_second = len(paths) / seconds
+            baseline = baseline or docs_per_second
+            print(f"workers={workers:<3} {seconds:7.2f}s  {docs_per_second:8.1f} docs/s  speedup x{docs_per_second / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
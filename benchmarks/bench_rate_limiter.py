@@ -0,0 +1,110 @@
+"""
+Peticiones bloqueadas (429) con y sin el limitador por dominio compartido.
+
+Un servidor local acepta como máximo `--server-rate` peticiones por segundo y
+responde 429 al resto. Varios procesos, como workers de Celery, piden URLs en
+paralelo. Sin limitador gran parte de las peticiones se rechaza; con el
+limitador (un archivo SQLite compartido) la tasa converge por AIMD a la que
+tolera el servidor.
+
+    python -m benchmarks.bench_rate_limiter --workers 4 --requests 100 --server-rate 20
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.helpers.rate_limiter import DomainRateLimiter
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    rate = 20.0
+    lock = threading.Lock()
+    window = []
+
+    def do_GET(self):
+        now = time.monotonic()
+        with self.lock:
+            # Ventana deslizante de un segundo
+            self.window[:] = [t for t in self.window if now - t < 1.0]
+            allowed = len(self.window) < self.rate
+            if allowed:
+                self.window.append(now)
+        body = b"ok" if allowed else b"slow down"
+        self.send_response(200 if allowed else 429)
+        if not allowed:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def worker_requests(url: str, requests: int, db_path: str, concurrency: int) -> dict:
+    limiter = DomainRateLimiter(db_path) if db_path else None
+    counts = {"ok": 0, "throttled": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(client):
+        async with semaphore:
+            if limiter is None:
+                response = await client.get(url)
+            else:
+                async with limiter.limit(url) as lease:
+                    response = await client.get(url)
+                    lease.report_status(response.status_code, response.headers.get("retry-after"))
+        counts["ok" if response.status_code == 200 else "throttled"] += 1
+
+    async with httpx.AsyncClient() as client:
+        await asyncio.gather(*(fetch(client) for _ in range(requests)))
+    return counts
+
+
+def run_worker(args):
+    return asyncio.run(worker_requests(*args))
+
+
+def run(url: str, workers: int, requests: int, db_path, concurrency: int):
+    start = time.perf_counter()
+    with multiprocessing.get_context("spawn").Pool(workers) as pool:
+        results = pool.map(run_worker, [(url, requests, db_path, concurrency)] * workers)
+    seconds = time.perf_counter() - start
+    ok = sum(result["ok"] for result in results)
+    throttled = sum(result["throttled"] for result in results)
+    return ok, throttled, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="Peticiones por worker")
+    parser.add_argument("--concurrency", type=int, default=8, help="Peticiones simultáneas por worker")
+    parser.add_argument("--server-rate", type=float, default=20.0)
+    args = parser.parse_args()
+
+    handler = type("Handler", (ThrottlingHandler,), {"rate": args.server_rate, "window": []})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/resource"
+
+    print(f"{'modo':<16} {'ok':>6} {'429':>6} {'segundos':>9} {'ok/s':>7}")
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "rate_limits.db")
+        for name, path in (("sin limitador", None), ("con limitador", db_path)):
+            ok, throttled, seconds = run(url, args.workers, args.requests, path, args.concurrency)
+            print(f"{name:<16} {ok:>6} {throttled:>6} {seconds:9.2f} {ok / seconds:7.1f}")
+        for domain, metrics in DomainRateLimiter(db_path).metrics().items():
+            print(f"{domain}: {metrics}")
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Escritura y lectura de la salida del scraping: archivo de texto por sitio vs. shards JSONL.
+
+La versión anterior de `save_scraped_content` abría el archivo de texto del
+sitio en cada página y le agregaba el contenido con un separador; para leer
+una URL había que recorrer el archivo entero. `ShardWriter` escribe con
+buffer, rota los shards y los indexa en el manifiesto, así que un lector
+puede repartir los shards entre procesos o ir directo a los bytes de una URL.
+
+    python -m benchmarks.bench_shard_writer --pages 20000 --page-kb 4 --shard-records 2000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from app.helpers.shard_writer import ShardReader, ShardWriter
+
+SITE = "example.org"
+
+
+def make_pages(count: int, size: int) -> list:
+    words = ["scraping", "workflow", "celery", "prefect", "shard", "manifest", "página", "contenido"]
+    rng = random.Random(0)
+    text = " ".join(rng.choice(words) for _ in range(size // 8))
+    return [(f"https://{SITE}/page/{i}", f"{i} {text}") for i in range(count)]
+
+
+def write_text_file(directory: str, pages: list) -> float:
+    # Comportamiento anterior de save_scraped_content
+    start = time.perf_counter()
+    for url, content in pages:
+        path = os.path.join(directory, f"{SITE}_scraped_content.txt")
+        with open(path, "a", encoding="utf-8") as file:
+            file.write(f"URL: {url}\n")
+            file.write(content)
+            file.write("\n" + "=" * 80 + "\n")
+    return time.perf_counter() - start
+
+
+def find_in_text_file(directory: str, url: str):
+    with open(os.path.join(directory, f"{SITE}_scraped_content.txt"), "r", encoding="utf-8") as file:
+        for line in file:
+            if line == f"URL: {url}\n":
+                return next(file)
+    return None
+
+
+def write_shards(directory: str, pages: list, max_records: int) -> float:
+    start = time.perf_counter()
+    writer = ShardWriter(SITE, directory=directory, writer_id="bench", max_records=max_records)
+    for url, content in pages:
+        writer.write({"url": url, "scraped_at": datetime.now(timezone.utc).isoformat(), "content": content})
+    writer.close()
+    return time.perf_counter() - start
+
+
+def count_shard_records(path: str) -> int:
+    return sum(1 for _ in ShardReader.iter_shard(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=20_000)
+    parser.add_argument("--page-kb", type=float, default=4)
+    parser.add_argument("--shard-records", type=int, default=2_000)
+    parser.add_argument("--lookups", type=int, default=100)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages, int(args.page_kb * 1024))
+    lookups = random.Random(1).sample([url for url, _ in pages], min(args.lookups, len(pages)))
+
+    with tempfile.TemporaryDirectory() as directory:
+        text_directory = os.path.join(directory, "text")
+        os.makedirs(text_directory)
+        text_write = write_text_file(text_directory, pages)
+        start = time.perf_counter()
+        for url in lookups:
+            assert find_in_text_file(text_directory, url) is not None
+        text_lookup = (time.perf_counter() - start) / len(lookups)
+
+        shard_write = write_shards(directory, pages, args.shard_records)
+        reader = ShardReader(SITE, directory=directory)
+        shards = reader.shards()
+        start = time.perf_counter()
+        for url in lookups:
+            assert reader.get(url)["url"] == url
+        shard_lookup = (time.perf_counter() - start) / len(lookups)
+
+        start = time.perf_counter()
+        serial_records = sum(count_shard_records(path) for path in shards)
+        serial_read = time.perf_counter() - start
+        start = time.perf_counter()
+        with ProcessPoolExecutor(args.readers) as pool:
+            parallel_records = sum(pool.map(count_shard_records, shards))
+        parallel_read = time.perf_counter() - start
+        reader.close()
+        assert serial_records == parallel_records == len(pages)
+
+    print(f"{len(pages)} páginas de {args.page_kb} KB, {len(shards)} shards de hasta {args.shard_records} registros")
+    print(f"{'salida':<30} {'páginas/s':>10} {'búsqueda de URL':>16}")
+    print(f"{'texto por sitio (anterior)':<30} {len(pages) / text_write:10.0f} {text_lookup * 1000:13.2f} ms")
+    print(f"{'shards JSONL + manifiesto':<30} {len(pages) / shard_write:10.0f} {shard_lookup * 1000:13.2f} ms")
+    print(f"lectura de todos los shards: {serial_read:.2f}s en serie, "
+          f"{parallel_read:.2f}s con {args.readers} procesos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Tiempo de CPU y calidad de la extracción de texto con cada extractor.
+
+El corpus son artículos generados con el contenido repetido de un sitio
+(menú, scripts, barra lateral, pie), cuyo texto principal se conoce, más las
+páginas guardadas en `benchmarks/fixtures` y las de `--corpus`. La calidad se
+mide sobre los artículos: cobertura (palabras del contenido principal que
+aparecen) y precisión (palabras extraídas que pertenecen al contenido
+principal). La referencia es el camino anterior:
+`BeautifulSoup(html, 'html.parser').get_text`.
+
+Con Chromium instalado también se mide `innerText` en el navegador frente a
+`page.content()` + BeautifulSoup.
+
+    python -m benchmarks.bench_text_extraction --articles 200 --repeat 3
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+from app.helpers.text_extraction import TEXT_EXTRACTORS, create_text_extractor
+from benchmarks.fixture_server import render_article
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def extract_with_soup(html: str) -> str:
+    # Camino anterior de scrape_page_async y del crawler
+    return BeautifulSoup(html, 'html.parser').get_text(separator="\n", strip=True)
+
+
+def quality(text: str, reference: str) -> tuple:
+    extracted, expected = Counter(text.split()), Counter(reference.split())
+    common = sum((extracted & expected).values())
+    return common / max(sum(expected.values()), 1), common / max(sum(extracted.values()), 1)
+
+
+def bench_offline(name: str, extract, articles: list, saved: list, repeat: int) -> tuple:
+    pages = [html for html, _ in articles] + saved
+    start = time.process_time()
+    for _ in range(repeat):
+        for html in pages:
+            extract(html)
+    cpu_ms = (time.process_time() - start) / (repeat * len(pages)) * 1000
+    scores = [quality(extract(html), reference) for html, reference in articles]
+    recall = sum(score[0] for score in scores) / len(scores)
+    precision = sum(score[1] for score in scores) / len(scores)
+    return name, cpu_ms, recall, precision
+
+
+async def bench_browser(articles: list, repeat: int) -> list:
+    from playwright.async_api import async_playwright
+
+    extractor = create_text_extractor("browser", main_content=True)
+
+    async def from_content(page):
+        return extract_with_soup(await page.content())
+
+    results = []
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        page = await browser.new_page()
+        for name, extract in (("browser, content() + soup", from_content), ("browser, innerText", extractor.extract_page)):
+            elapsed = 0.0
+            scores = []
+            for html, reference in articles:
+                await page.set_content(html)
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    text = await extract(page)
+                elapsed += time.perf_counter() - start
+                scores.append(quality(text, reference))
+            results.append((name, elapsed / (repeat * len(articles)) * 1000,
+                            sum(s[0] for s in scores) / len(scores), sum(s[1] for s in scores) / len(scores)))
+        await browser.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--paragraphs", type=int, default=30)
+    parser.add_argument("--corpus", type=Path, help="Directorio con más páginas .html guardadas")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    articles = [render_article(f"/news/{i}", args.paragraphs) for i in range(args.articles)]
+    saved_paths = sorted(FIXTURES.glob("*.html")) + (sorted(args.corpus.glob("*.html")) if args.corpus else [])
+    saved = [path.read_text() for path in saved_paths]
+
+    results = [bench_offline("soup (anterior)", extract_with_soup, articles, saved, args.repeat)]
+    for name in TEXT_EXTRACTORS:
+        if name == "browser":
+            continue  # Fuera del navegador usa lxml
+        for main_content in (False, True):
+            extractor = create_text_extractor(name, main_content=main_content)
+            label = f"{name}{', contenido principal' if main_content else ''}"
+            results.append(bench_offline(label, extractor.extract_html, articles, saved, args.repeat))
+    try:
+        results += asyncio.run(bench_browser(articles[:20], args.repeat))
+    except Exception as e:
+        print(f"Sin navegador, se omite la extracción en el navegador: {e.__class__.__name__}")
+
+    print(f"{len(articles)} artículos + {len(saved)} páginas guardadas")
+    print(f"{'extractor':<34} {'ms CPU/página':>14} {'cobertura':>10} {'precisión':>10}")
+    for name, cpu_ms, recall, precision in results:
+        print(f"{name:<34} {cpu_ms:14.3f} {recall:10.1%} {precision:10.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Mensajes/s al publicar URLs descubiertas contra un broker AMQP local (`AmqpStub`).
+
+Compara el `basic_publish` por mensaje sobre `BlockingConnection` (sin
+confirmaciones, como antes, y con `confirm_delivery`) con `UrlPublisher`
+a distintos tamaños de lote. `--confirm-latency` simula el tiempo que tarda
+el broker en confirmar mensajes persistentes.
+
+    python -m benchmarks.bench_url_publisher --messages 20000 --batch-sizes 1 10 100 1000
+"""
+import argparse
+import asyncio
+import time
+
+import pika
+
+from app.helpers.url_publisher import PERSISTENT, UrlPublisher
+from benchmarks.amqp_stub import AmqpStub
+
+QUEUE = "bench_url_queue"
+
+
+def urls(count: int) -> list:
+    return [f"https://arxiv.org/pdf/2401.{i:05d}" for i in range(count)]
+
+
+def bench_blocking(parameters, messages: list, confirm: bool) -> float:
+    connection = pika.BlockingConnection(parameters)
+    channel = connection.channel()
+    channel.queue_declare(queue=QUEUE, durable=True)
+    if confirm:
+        channel.confirm_delivery()
+    start = time.perf_counter()
+    for body in messages:
+        channel.basic_publish(exchange='', routing_key=QUEUE, body=body, properties=PERSISTENT)
+    seconds = time.perf_counter() - start
+    connection.close()
+    return seconds
+
+
+async def bench_publisher(parameters, messages: list, batch_size: int) -> float:
+    publisher = UrlPublisher(parameters, batch_size=batch_size, max_in_flight=max(batch_size, 1))
+    await publisher.declare_queue(QUEUE)
+    start = time.perf_counter()
+    await publisher.publish_many(messages, routing_key=QUEUE)
+    await publisher.flush()
+    seconds = time.perf_counter() - start
+    assert publisher.stats["confirmed"] == len(messages), publisher.metrics()
+    await publisher.close()
+    return seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=20_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000])
+    parser.add_argument("--confirm-latency", type=float, default=0.0005)
+    args = parser.parse_args()
+
+    messages = urls(args.messages)
+    with AmqpStub(confirm_latency=args.confirm_latency) as broker:
+        parameters = pika.ConnectionParameters(host=broker.host, port=broker.port)
+        results = [
+            ("blocking, sin confirms", bench_blocking(parameters, messages, confirm=False)),
+            ("blocking, confirm por mensaje", bench_blocking(parameters, messages, confirm=True)),
+        ]
+        for batch_size in args.batch_sizes:
+            results.append((f"UrlPublisher lote={batch_size}", asyncio.run(bench_publisher(parameters, messages, batch_size))))
+
+    print(f"{'modo':<32} {'segundos':>9} {'mensajes/s':>11}")
+    for name, seconds in results:
+        print(f"{name:<32} {seconds:9.3f} {len(messages) / seconds:11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+URLs/s de un proceso de worker: `asyncio.run` por tarea vs. el event loop persistente.
+
+Cada tarea simula un scraping limitado por E/S: un GET a un servidor local con
+latencia `--latency`. Antes, un proceso del pool prefork ejecutaba una tarea a
+la vez y creaba un loop nuevo para cada una; ahora los hilos del pool
+`threads` envían sus corrutinas a un único loop (`AsyncRunner`), que reutiliza
+el cliente HTTP entre tareas.
+
+    python -m benchmarks.bench_worker_concurrency --tasks 200 --latency 0.1 --threads 32
+"""
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.helpers.async_runner import AsyncRunner
+from app.helpers.http_client import HttpClient
+from benchmarks.fixture_server import FixtureServer
+
+
+async def fetch_with_new_client(url: str):
+    # Sin loop persistente tampoco se puede reutilizar el cliente entre tareas
+    client = HttpClient()
+    try:
+        response = await client.get(url)
+        response.raise_for_status()
+    finally:
+        await client.close()
+
+
+async def fetch_with_shared_client(client: HttpClient, url: str):
+    response = await client.get(url)
+    response.raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--threads", type=int, default=32, help="Hilos del pool de Celery")
+    parser.add_argument("--async-concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    with FixtureServer(delay=args.latency) as server:
+        urls = [server.url(f"/page/{i}") for i in range(args.tasks)]
+
+        start = time.perf_counter()
+        for url in urls:
+            asyncio.run(fetch_with_new_client(url))
+        before = time.perf_counter() - start
+
+        runner = AsyncRunner(concurrency=args.async_concurrency)
+        client = HttpClient(max_connections_per_host=args.async_concurrency)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.threads) as executor:
+            list(executor.map(lambda url: runner.run(fetch_with_shared_client(client, url)), urls))
+        after = time.perf_counter() - start
+        runner.stop(client.close)
+
+    print(f"{'modo':<34} {'segundos':>9} {'URLs/s':>8}")
+    print(f"{'asyncio.run por tarea (1 slot)':<34} {before:9.2f} {args.tasks / before:8.1f}")
+    print(f"{f'loop persistente ({args.threads} hilos)':<34} {after:9.2f} {args.tasks / after:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
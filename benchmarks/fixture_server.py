@@ -0,0 +1,141 @@
+"""
+Servidor HTTP local para los benchmarks.
+
+Sirve páginas HTML generadas en memoria para medir el scraping sin depender
+de sitios externos. Uso:
+
+    with FixtureServer() as server:
+        urls = [server.url(f"/page/{i}") for i in range(10)]
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import fitz
+
+
+def render_page(path: str, paragraphs: int = 20) -> bytes:
+    body = "".join(
+        f"<p>Paragraph {i} of {path}. Lorem ipsum dolor sit amet, consectetur adipiscing elit.</p>"
+        for i in range(paragraphs)
+    )
+    return f"<html><head><title>{path}</title></head><body><h1>{path}</h1>{body}</body></html>".encode()
+
+
+def render_article(path: str, paragraphs: int = 20) -> tuple:
+    """
+    Artículo con el contenido repetido de un sitio real: encabezado, menú,
+    scripts, estilos, barra lateral, formulario y pie.
+
+    Returns:
+    - tuple: (HTML, texto del contenido principal) para medir la calidad de la extracción.
+    """
+    lines = [f"Article {path}"] + [
+        f"Paragraph {i} of {path}: the mortality rate in cohort {i} changed by {i * 0.7:.1f} points."
+        for i in range(paragraphs)
+    ]
+    menu = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(30))
+    related = "".join(f'<li><a href="/related/{i}">Related story {i}</a></li>' for i in range(10))
+    body = "".join(f"<p>{line}</p>" for line in lines[1:])
+    html = (
+        f'<html><head><title>{path}</title><style>body {{ font-family: sans-serif; }} .ad {{ width: 300px; }}</style>'
+        f'<script>window.dataLayer = [{{"event": "pageview", "path": "{path}"}}];</script></head><body>'
+        f'<header><div class="logo">Example News</div><nav><ul>{menu}</ul></nav></header>'
+        f'<div class="layout"><main><article><h1>{lines[0]}</h1>{body}</article></main>'
+        f'<aside><h2>Related</h2><ul>{related}</ul></aside></div>'
+        f'<form action="/subscribe"><label>Subscribe to the newsletter</label><input name="email"></form>'
+        f'<footer><p>Copyright Example News. All rights reserved.</p><a href="/privacy">Privacy</a></footer>'
+        f'<script src="/static/app.js"></script><script>trackPage("{path}");</script>'
+        f'<noscript>Enable JavaScript to see comments.</noscript></body></html>'
+    )
+    return html, "\n".join(lines)
+
+
+def render_search_results(query: str, total: int, start: int = 0, size: int = 200,
+                          origin: str = "https://arxiv.org") -> bytes:
+    """
+    Página de resultados con la estructura de la búsqueda de arXiv.
+
+    Cada resultado tiene links absolutos a `<origin>/abs` y `<origin>/pdf`, y
+    un link relativo con fragmento y parámetros de seguimiento para ejercitar
+    la normalización.
+    """
+    results = "".join(
+        f'<li class="arxiv-result"><p class="list-title">'
+        f'<a href="{origin}/abs/2401.{i:05d}">arXiv:2401.{i:05d}</a> '
+        f'<span>[<a href="{origin}/pdf/2401.{i:05d}">pdf</a>, '
+        f'<a href="/format/2401.{i:05d}?utm_source=search#formats">other</a>]</span></p>'
+        f'<p class="title is-5 mathjax">Result {i} for {query}</p></li>'
+        for i in range(start, min(start + size, total))
+    )
+    return (
+        f'<html><head><title>Search | arXiv</title></head><body>'
+        f'<h1 class="title is-clearfix">Showing {start + 1}&ndash;{min(start + size, total)} of {total:,} results for all: {query}</h1>'
+        f'<ol class="breathe-horizontal">{results}</ol>'
+        f'<a class="pagination-next" href="?start={start + size}">Next</a></body></html>'
+    ).encode()
+
+
+def render_pdf(title: str, pages: int = 5) -> bytes:
+    """PDF con `pages` páginas de texto, como los artículos que descarga el flujo de arXiv."""
+    pdf = fitz.open()
+    for page_number in range(pages):
+        page = pdf.new_page()
+        text = f"{title}, page {page_number}. " + "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 12
+        page.insert_textbox(fitz.Rect(50, 50, 550, 800), text)
+    data = pdf.tobytes()
+    pdf.close()
+    return data
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # Rutas extra registradas por cada benchmark: path -> (status, content_type, body).
+    # Se busca primero la ruta con la query y después sin ella; el valor puede ser
+    # una función que recibe la ruta completa y devuelve la tupla.
+    routes = {}
+    # Latencia simulada del servidor en segundos
+    delay = 0.0
+
+    def do_GET(self):
+        if self.delay:
+            time.sleep(self.delay)
+        route = self.routes.get(self.path) or self.routes.get(urlsplit(self.path).path)
+        if callable(route):
+            route = route(self.path)
+        status, content_type, body = route or (200, "text/html; charset=utf-8", None)
+        if body is None:
+            body = render_page(self.path)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    def __init__(self, routes: dict = None, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0):
+        handler = type("Handler", (FixtureHandler,), {"routes": dict(routes or {}), "delay": delay})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        # Cola de conexiones amplia para los benchmarks con mucha concurrencia
+        self.httpd.socket.listen(128)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url(self, path: str) -> str:
+        return self.base_url + path
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()